@@ -0,0 +1,62 @@
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, "src")
+
+from hello_api.responses import FastJSONResponse, page_content
+from hello_api.schemas import NoteListResponse, NoteOut
+
+def make_rows(count: int, body_size: int):
+    """Stand-ins for SQLAlchemy rows: only `_mapping` is used by either path."""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        mapping = {
+            "id": uuid.uuid4(),
+            "title": f"Note {i}",
+            "body": ("lorem ipsum dolor sit amet " * (body_size // 27 + 1))[:body_size],
+            "collection": "default",
+            "created_at": now - timedelta(days=i),
+            "updated_at": now - timedelta(hours=i),
+        }
+        rows.append(SimpleNamespace(_mapping=mapping))
+    return rows
+
+def pydantic_path(rows, total, limit, offset) -> bytes:
+    """What list_notes used to do: build models, then FastAPI dumps, re-validates and serializes them."""
+    response = NoteListResponse(
+        items=[NoteOut(**dict(row._mapping)) for row in rows],
+        total=total,
+        limit=limit,
+        offset=offset,
+    )
+    content = response.model_dump()
+    return NoteListResponse.model_validate(content).model_dump_json().encode()
+
+def fast_path(rows, total, limit, offset) -> bytes:
+    return FastJSONResponse(page_content(rows, total, limit, offset)).body
+
+def bench(fn, rows, repeat: int) -> float:
+    fn(rows, len(rows), len(rows), 0)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(rows, len(rows), len(rows), 0)
+    elapsed = time.perf_counter() - start
+    return len(rows) * repeat / elapsed
+
+def run_benchmark():
+    print(f"{'rows':>6} {'body':>7} {'pydantic rows/s':>16} {'fast rows/s':>12} {'speedup':>8}")
+    for count, body_size in [(20, 1_000), (500, 1_000), (500, 20_000), (500, 100_000)]:
+        rows = make_rows(count, body_size)
+        assert json.loads(pydantic_path(rows, count, count, 0)) == json.loads(fast_path(rows, count, count, 0))
+        repeat = max(1, 20_000 // count)
+        before = bench(pydantic_path, rows, repeat)
+        after = bench(fast_path, rows, repeat)
+        print(f"{count:>6} {body_size:>7} {before:>16,.0f} {after:>12,.0f} {after / before:>7.1f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Compares EMBEDDING_STORAGE modes on the live notes_index: on-disk index size,
+# chunk-search latency, and recall@k against an exact scan. Query vectors are
+# sampled from stored chunks, so no embedding model is needed. Build the compact
+# indexes first with `python -m hello_api.migrations --compact halfvec binary`.
+#   python bench_vector_storage.py --queries 200 --k 10 --candidates 40,100,200 --output storage.json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from hello_api.timing import percentile
+
+STORAGE_INDEXES = {
+    "full": "notes_index_embedding_idx",
+    "halfvec": "notes_index_embedding_halfvec_idx",
+    "binary": "notes_index_embedding_binary_idx",
+}
+
+
+async def relation_sizes(session) -> Dict[str, Optional[int]]:
+    from sqlalchemy import text
+    # A partitioned notes_index and its indexes have no storage of their own;
+    # pg_partition_tree lists the partitions (or just the relation itself).
+    result = await session.execute(text("""
+        SELECT indexname, (
+            SELECT SUM(pg_relation_size(relid))::bigint
+            FROM pg_partition_tree(format('%I', indexname)::regclass)
+        ) AS bytes
+        FROM pg_indexes WHERE tablename = 'notes_index'
+    """))
+    indexes = {row.indexname: row.bytes for row in result}
+    table = await session.execute(text("SELECT SUM(pg_table_size(relid))::bigint FROM pg_partition_tree('notes_index')"))
+    sizes = {"table": table.scalar()}
+    sizes.update({storage: indexes.get(name) for storage, name in STORAGE_INDEXES.items()})
+    return sizes
+
+
+async def sample_queries(session, count: int) -> List[str]:
+    from sqlalchemy import text
+    result = await session.execute(
+        text("SELECT embedding::text AS vector FROM notes_index ORDER BY random() LIMIT :count"),
+        {"count": count},
+    )
+    return [row.vector for row in result]
+
+
+async def exact_top_k(session, vector: str, k: int) -> List[Any]:
+    from sqlalchemy import text
+    # Force a sequential scan so the approximate ivfflat index cannot be used.
+    await session.execute(text("SET LOCAL enable_indexscan = off"))
+    await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+    result = await session.execute(
+        text("SELECT id FROM notes_index ORDER BY embedding <=> CAST(:vector AS vector) LIMIT :k"),
+        {"vector": vector, "k": k},
+    )
+    return [row.id for row in result]
+
+
+async def storage_top_k(session, storage: str, vector: str, k: int, candidates: int) -> List[Any]:
+    """The production candidate query for `storage`, re-ranked at full precision."""
+    from sqlalchemy import text
+    from hello_api.embeddings import candidate_query, use_candidate_limit
+    await use_candidate_limit(session, storage, candidates)
+    query = text(f"""
+        WITH candidates AS ({candidate_query(storage)})
+        SELECT id FROM candidates
+        ORDER BY embedding <=> CAST(:vector AS vector)
+        LIMIT :k
+    """)
+    params = {"vector": vector, "k": k}
+    if storage != "full":
+        params["candidates"] = candidates
+    result = await session.execute(query, params)
+    return [row.id for row in result]
+
+
+async def run(args) -> Dict[str, Any]:
+    from hello_api.db import async_session
+
+    async with async_session() as session:
+        sizes = await relation_sizes(session)
+        queries = await sample_queries(session, args.queries)
+    if not queries:
+        raise SystemExit("notes_index is empty; index some notes first")
+
+    truth = []
+    for vector in queries:
+        async with async_session() as session:
+            truth.append(set(await exact_top_k(session, vector, args.k)))
+
+    runs = []
+    configs = [("full", None)] + [(storage, candidates) for storage in ("halfvec", "binary")
+                                  for candidates in args.candidates]
+    for storage, candidates in configs:
+        if sizes.get(storage) is None:
+            print(f"Skipping {storage}: index {STORAGE_INDEXES[storage]} does not exist")
+            continue
+        latencies, hits = [], 0
+        for vector, expected in zip(queries, truth):
+            async with async_session() as session:
+                start = time.perf_counter()
+                found = await storage_top_k(session, storage, vector, args.k, candidates or 0)
+                latencies.append(time.perf_counter() - start)
+            hits += len(expected.intersection(found))
+        run = {
+            "storage": storage,
+            "candidates": candidates,
+            "index_bytes": sizes[storage],
+            f"recall@{args.k}": round(hits / sum(len(expected) for expected in truth), 4),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        }
+        print(f"{storage:<8} candidates={str(candidates):<5} index={run['index_bytes'] / 1e6:8.2f}MB "
+              f"recall@{args.k}={run[f'recall@{args.k}']:.3f} p50={run['p50_ms']}ms p95={run['p95_ms']}ms")
+        runs.append(run)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "queries": len(queries),
+        "k": args.k,
+        "table_bytes": sizes["table"],
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark full, halfvec and binary-quantized vector search")
+    parser.add_argument("--queries", type=int, default=100, help="chunk embeddings sampled as queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=lambda v: [int(c) for c in v.split(",")], default=[100],
+                        help="comma-separated re-rank candidate counts for the compact modes")
+    parser.add_argument("--db-host", default="localhost", help="overrides DB_HOST from .env")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    os.environ["DB_HOST"] = args.db_host
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
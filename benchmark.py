@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from hello_api.timing import percentile
+
+# Load test for the running API. Start the service with OLLAMA_HOST pointing at
+# the fake Ollama (or pass --fake-ollama to launch it here), then e.g.
+#   python benchmark.py --concurrency 32 --duration 30 --output run.json
+#   python benchmark.py --concurrency 32 --duration 30 --compare run.json
+
+SCENARIOS = ("ask", "put", "get", "list")
+
+# Gauge of notes queued for background indexing (see hello_api.metrics).
+INDEXING_BACKLOG_METRIC = "hello_api_indexing_backlog"
+
+WORDS = (
+    "reactor voyager spacecraft periodic element table radiation probe launch golden record "
+    "atomic number group metal noble gas orbit planet instrument disaster safety cooling "
+    "mission saturn jupiter electron proton nucleus exclusion zone contamination energy"
+).split()
+
+
+def indexing_backlog(exposition: str) -> float:
+    """Sum of the indexing backlog gauge in Prometheus text (one series per worker in multiprocess mode)."""
+    total = 0.0
+    for line in exposition.splitlines():
+        if line.startswith(INDEXING_BACKLOG_METRIC) and line[len(INDEXING_BACKLOG_METRIC)] in " {":
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+def make_body(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def load_questions(path: str = "testset.yaml") -> List[str]:
+    with open(path, "r") as f:
+        test_set = yaml.safe_load(f)
+    return [question for questions in test_set.values() for question in questions]
+
+
+class LoadTest:
+    def __init__(self, base_url: str, mix: Dict[str, int], body_words: int, seed: int, index_timeout: float = 300.0):
+        self.base_url = base_url
+        self.index_timeout = index_timeout
+        self.mix = mix
+        self.body_words = body_words
+        self.rng = random.Random(seed)
+        self.questions = load_questions()
+        self.note_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = {name: [] for name in mix}
+        self.errors: Dict[str, int] = {name: 0 for name in mix}
+
+    async def seed(self, client: httpx.AsyncClient, count: int) -> None:
+        """Bulk-load and index notes so GET and ask have data to hit."""
+        if count <= 0:
+            return
+        lines = "".join(
+            json.dumps({"title": f"Load test note {i}", "body": make_body(self.rng, self.body_words)}) + "\n"
+            for i in range(count)
+        )
+        response = await client.post("/notes/bulk", params={"index": "true"}, content=lines,
+                                     headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        print(f"Seeded {response.json()['imported']} notes")
+        await self.wait_for_indexing(client)
+
+    async def wait_for_indexing(self, client: httpx.AsyncClient) -> None:
+        """Poll /metrics until the background indexing backlog drains, so asks hit a full index."""
+        deadline = time.perf_counter() + self.index_timeout
+        while True:
+            response = await client.get("/metrics")
+            response.raise_for_status()
+            backlog = indexing_backlog(response.text)
+            if backlog <= 0:
+                return
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"{backlog:.0f} notes still waiting to be indexed after {self.index_timeout}s")
+            await asyncio.sleep(0.5)
+
+    async def refresh_ids(self, client: httpx.AsyncClient) -> None:
+        response = await client.get("/notes", params={"limit": 500, "fields": "id"})
+        response.raise_for_status()
+        self.note_ids = [item["id"] for item in response.json()["items"]]
+
+    def resolve(self, scenario: str) -> str:
+        """The scenario actually run: "get" needs note ids and lists instead when there are none."""
+        if scenario == "get" and not self.note_ids:
+            return "list"
+        return scenario
+
+    async def call(self, client: httpx.AsyncClient, scenario: str) -> httpx.Response:
+        if scenario == "ask":
+            return await client.post("/api/ask", json={"question": self.rng.choice(self.questions)})
+        if scenario == "put":
+            note = {"title": "Load test note", "body": make_body(self.rng, self.body_words)}
+            if self.note_ids and self.rng.random() < 0.5:
+                note["id"] = self.rng.choice(self.note_ids)
+            return await client.put("/notes", json=note)
+        if scenario == "get":
+            return await client.get(f"/notes/{self.rng.choice(self.note_ids)}")
+        return await client.get("/notes", params={"limit": 20, "offset": self.rng.randrange(0, 100)})
+
+    async def worker(self, client: httpx.AsyncClient, deadline: float, remaining: List[int]) -> None:
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.perf_counter() < deadline and remaining[0] != 0:
+            remaining[0] -= 1
+            scenario = self.resolve(self.rng.choices(names, weights)[0])
+            start = time.perf_counter()
+            try:
+                response = await self.call(client, scenario)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            self.latencies.setdefault(scenario, []).append(time.perf_counter() - start)
+            if not ok:
+                self.errors[scenario] = self.errors.get(scenario, 0) + 1
+
+    async def run(self, concurrency: int, duration: float, requests: int, warmup: float, seed_notes: int) -> Dict[str, Any]:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=120.0) as client:
+            await self.seed(client, seed_notes)
+            await self.refresh_ids(client)
+            if warmup > 0:
+                await asyncio.gather(*(self.worker(client, time.perf_counter() + warmup, [-1])
+                                       for _ in range(concurrency)))
+                self.latencies = {name: [] for name in self.mix}
+                self.errors = {name: 0 for name in self.mix}
+
+            remaining = [requests if requests > 0 else -1]
+            started = time.perf_counter()
+            await asyncio.gather(*(self.worker(client, started + duration, remaining)
+                                   for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return self.report(concurrency, elapsed)
+
+    def report(self, concurrency: int, elapsed: float) -> Dict[str, Any]:
+        def summarize(latencies: List[float], errors: int) -> Dict[str, Any]:
+            count = len(latencies)
+            return {
+                "requests": count,
+                "errors": errors,
+                "error_rate": round(errors / count, 4) if count else 0.0,
+                "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+            }
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "base_url": self.base_url,
+            "concurrency": concurrency,
+            "duration_seconds": round(elapsed, 3),
+            "mix": self.mix,
+            "overall": summarize(all_latencies, sum(self.errors.values())),
+            "scenarios": {
+                name: summarize(latencies, self.errors.get(name, 0))
+                for name, latencies in self.latencies.items()
+                if latencies
+            },
+        }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Print per-scenario deltas against a previous run; False if any p95/p99/throughput regressed too far."""
+    ok = True
+    print(f"\n{'scenario':<10} {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, stats in {"overall": current["overall"], **current["scenarios"]}.items():
+        before = baseline["overall"] if name == "overall" else baseline["scenarios"].get(name)
+        if not before:
+            continue
+        for metric, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True),
+                                        ("throughput_rps", False), ("error_rate", True)):
+            old, new = before[metric], stats[metric]
+            if old:
+                change = (new - old) / old
+            else:
+                change = float("inf") if new > old else 0.0
+            regressed = change > max_regression if higher_is_worse else change < -max_regression
+            if regressed and metric != "p50_ms":
+                ok = False
+            flag = " ❌" if regressed else ""
+            print(f"{name:<10} {metric:<15} {old:>10} {new:>10} {change:>+7.1%}{flag}")
+    return ok
+
+
+def start_fake_ollama(
+    port: int,
+    embed_latency: float,
+    chat_latency: float,
+    token_latency: float = 0.0,
+    failure_rate: float = 0.0,
+) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "hello_api.fake_ollama",
+            "--port", str(port),
+            "--embed-latency", str(embed_latency),
+            "--chat-latency", str(chat_latency),
+            "--token-latency", str(token_latency),
+            "--failure-rate", str(failure_rate),
+        ],
+        env=env,
+    )
+    for _ in range(50):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/tags", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Fake Ollama did not start")
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the notes QA API")
+    parser.add_argument("--base-url", default=os.getenv("API_BASE_URL", "http://localhost:2005"))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no limit)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unrecorded warmup")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("ask=1,put=1,get=2,list=2"))
+    parser.add_argument("--seed-notes", type=int, default=0, help="bulk-import and index this many notes first")
+    parser.add_argument("--index-timeout", type=float, default=300.0,
+                        help="seconds to wait for seeded notes to be indexed")
+    parser.add_argument("--body-words", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0, help="random seed for reproducible request mixes")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="allowed fractional regression")
+    parser.add_argument("--fake-ollama", action="store_true", help="start the fake Ollama server on --ollama-port")
+    parser.add_argument("--ollama-port", type=int, default=11434)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--ollama-failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    fake_ollama = None
+    if args.fake_ollama:
+        fake_ollama = start_fake_ollama(args.ollama_port, args.embed_latency, args.chat_latency,
+                                        args.token_latency, args.ollama_failure_rate)
+    try:
+        test = LoadTest(args.base_url, args.mix, args.body_words, args.seed, args.index_timeout)
+        report = asyncio.run(test.run(args.concurrency, args.duration, args.requests, args.warmup, args.seed_notes))
+    finally:
+        if fake_ollama:
+            fake_ollama.terminate()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
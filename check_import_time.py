@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Cold-import budget for the API entry point, in milliseconds. Nearly all of
+# it is fastapi and SQLAlchemy; the app measures under 600 ms.
+DEFAULT_BUDGET_MS = 800
+
+# Modules that must stay off the import path of hello_api.main. pgvector
+# (which loads numpy) and prometheus_client are imported on first use.
+FORBIDDEN_MODULES = ["langchain", "langchain_text_splitters", "ollama", "pgvector", "numpy", "prometheus_client"]
+
+def measure_import(module: str = "hello_api.main") -> List[Tuple[str, int, int]]:
+    """Import `module` in a fresh interpreter with -X importtime and parse the report.
+
+    Returns (module, self_us, cumulative_us) tuples in import order.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+    # No .env or database is needed just to import the app.
+    for key in ("DB_HOST", "DB_PORT", "DB_USERNAME", "DB_PASSWORD", "DB_DATABASE"):
+        env.pop(key, None)
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd="/",
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+def check_import_time(module: str = "hello_api.main", budget_ms: int = DEFAULT_BUDGET_MS) -> bool:
+    entries = measure_import(module)
+    total_ms = sum(self_us for _, self_us, _ in entries) / 1000
+    imported = {name for name, _, _ in entries}
+
+    print(f"Cold import of {module}: {total_ms:.1f} ms (budget {budget_ms} ms)")
+    print("Slowest modules (self time):")
+    for name, self_us, _ in sorted(entries, key=lambda e: e[1], reverse=True)[:10]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    leaked = [name for name in FORBIDDEN_MODULES if name in imported]
+    if leaked:
+        print(f"❌ Heavy modules imported eagerly: {', '.join(leaked)}")
+        ok = False
+    if total_ms > budget_ms:
+        print(f"❌ Import time {total_ms:.1f} ms exceeds budget of {budget_ms} ms")
+        ok = False
+    if ok:
+        print("✅ Import time within budget")
+    return ok
+
+if __name__ == "__main__":
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    sys.exit(0 if check_import_time(budget_ms=budget) else 1)
@@ -109,10 +109,8 @@ while all noble gases are inert and rarely form compounds.
     ]
     
     async with async_session() as session:
-        for note_data in sample_notes:
-            stmt = insert(notes).values(**note_data)
-            await session.execute(stmt)
-        
+        # One multi-row INSERT instead of a round trip per note
+        await session.execute(insert(notes), sample_notes)
         await session.commit()
         print(f"Created {len(sample_notes)} sample notes")
 
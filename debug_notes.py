@@ -3,6 +3,7 @@ import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select, text
+from src.hello_api.embeddings import chunk_content
 from src.hello_api.notes.models import notes, notes_index
 
 # Override environment for local connection
@@ -34,7 +35,9 @@ async def debug_notes():
             print()
         
         # Check what's in the notes_index
-        stmt = select(notes_index.c.note_id, notes_index.c.chunk_index, notes_index.c.content)
+        stmt = select(notes_index.c.note_id, notes_index.c.chunk_index, chunk_content()).join(
+            notes, notes.c.id == notes_index.c.note_id
+        )
         result = await session.execute(stmt)
         all_chunks = result.fetchall()
         
@@ -42,7 +45,7 @@ async def debug_notes():
         for chunk in all_chunks[:5]:  # Show first 5 chunks
             print(f"  Note ID: {chunk.note_id}")
             print(f"  Chunk Index: {chunk.chunk_index}")
-            print(f"  Content preview: {chunk.content[:100]}...")
+            print(f"  Content preview: {(chunk.content or '<body changed since indexing>')[:100]}...")
             print()
         
         # Test a simple vector similarity query
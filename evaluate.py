@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+# Retrieval evaluation over testset.yaml. Replaces the per-script engine setup of
+# test_qa_fast.py / test_qa_local.py / test_qa_complete.py with one CLI that
+# sweeps retrieval settings and records accuracy and per-stage latency, e.g.
+#   python evaluate.py --k 5,15 --threshold 0.8,1.0 --candidates 40,200 --output eval.yaml
+#   python evaluate.py --storage full,halfvec,binary --output storage.yaml
+#   python evaluate.py --note-candidates 0,20,50 --output two_stage.yaml
+#   python evaluate.py --compare eval.yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from hello_api.timing import percentile
+
+
+def load_test_set(path: str) -> List[Dict[str, str]]:
+    with open(path, "r") as f:
+        test_set = yaml.safe_load(f)
+    return [
+        {"question": question, "expected_note": subject}
+        for subject, questions in test_set.items()
+        for question in questions
+    ]
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+class Evaluation:
+    def __init__(self, cases: List[Dict[str, str]], concurrency: int, generate: bool):
+        from hello_api.db import async_session
+        self.async_session = async_session
+        self.cases = cases
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.generate = generate
+        self.vectors: Dict[str, List[float]] = {}
+        self.embed_ms: Dict[str, float] = {}
+        self.titles: Dict[Any, str] = {}
+
+    async def embed_all(self) -> None:
+        """Embed each question once; every configuration reuses the vector."""
+        from hello_api.embeddings import embed_question
+
+        async def embed(question: str) -> None:
+            async with self.semaphore:
+                start = time.perf_counter()
+                self.vectors[question] = await embed_question(question)
+                self.embed_ms[question] = (time.perf_counter() - start) * 1000
+
+        await asyncio.gather(*(embed(case["question"]) for case in self.cases))
+
+    async def load_titles(self) -> None:
+        from sqlalchemy import select
+        from hello_api.notes.models import notes
+        async with self.async_session() as session:
+            result = await session.execute(select(notes.c.id, notes.c.title))
+            self.titles = {row.id: row.title for row in result}
+
+    async def run_case(self, case: Dict[str, str], k: int, threshold: float, candidates: Optional[int],
+                       storage: Optional[str], note_candidates: Optional[int]) -> Dict[str, Any]:
+        from hello_api.embeddings import get_note_content, rank_similar_notes
+        from hello_api.qa_simple import generate_answer
+
+        question = case["question"]
+        expected = case["expected_note"].lower()
+        async with self.semaphore, self.async_session() as session:
+            start = time.perf_counter()
+            rows = await rank_similar_notes(session, self.vectors[question], k, threshold, storage,
+                                           candidates=candidates, note_candidates=note_candidates)
+            search_ms = (time.perf_counter() - start) * 1000
+
+            ranked = [self.titles.get(row.note_id, "Unknown") for row in rows]
+            rank = next((i + 1 for i, title in enumerate(ranked) if expected in title.lower()), None)
+
+            generate_ms = None
+            answer = None
+            if self.generate and rows:
+                start = time.perf_counter()
+                try:
+                    note_content = await get_note_content(session, rows[0].note_id)
+                    answer = await generate_answer(question, note_content)
+                except Exception as e:
+                    answer = f"Error: {e}"
+                generate_ms = (time.perf_counter() - start) * 1000
+
+        result = {
+            "question": question,
+            "expected_note": case["expected_note"],
+            "retrieved": ranked,
+            "rank": rank,
+            "embed_ms": round(self.embed_ms[question], 2),
+            "search_ms": round(search_ms, 2),
+        }
+        if self.generate:
+            result["generate_ms"] = round(generate_ms, 2) if generate_ms is not None else None
+            result["answer"] = answer
+        return result
+
+    async def run_config(self, k: int, threshold: float, candidates: Optional[int], storage: Optional[str],
+                         note_candidates: Optional[int]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.run_case(case, k, threshold, candidates, storage, note_candidates)
+                                         for case in self.cases))
+        wall_seconds = time.perf_counter() - start
+        total = len(results)
+        ranks = [result["rank"] for result in results]
+
+        def latency(stage: str) -> Dict[str, float]:
+            values = [result[stage] for result in results if result.get(stage) is not None]
+            return {
+                "mean": round(sum(values) / len(values), 2) if values else 0.0,
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+            }
+
+        metrics = {
+            "recall@1": round(sum(1 for rank in ranks if rank == 1) / total, 4),
+            f"recall@{k}": round(sum(1 for rank in ranks if rank) / total, 4),
+            "mrr": round(sum(1 / rank for rank in ranks if rank) / total, 4),
+            "no_results": sum(1 for result in results if not result["retrieved"]),
+            "wall_seconds": round(wall_seconds, 3),
+            "latency_ms": {stage: latency(stage) for stage in ("embed_ms", "search_ms", "generate_ms")
+                           if any(result.get(stage) is not None for result in results)},
+        }
+        return {
+            "config": {"k": k, "threshold": threshold, "candidates": candidates, "storage": storage,
+                       "note_candidates": note_candidates},
+            "metrics": metrics,
+            "results": results,
+        }
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    key = f"k={config['k']} threshold={config['threshold']}"
+    if config.get("candidates") is not None:
+        key += f" candidates={config['candidates']}"
+    if config.get("storage"):
+        key += f" storage={config['storage']}"
+    if config.get("note_candidates") is not None:
+        key += f" notes={config['note_candidates']}"
+    return key
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print accuracy and search-latency deltas for configurations present in both reports."""
+    previous = {config_key(run["config"]): run["metrics"] for run in baseline["runs"]}
+    print(f"\n{'configuration':<40} {'metric':<12} {'baseline':>10} {'current':>10}")
+    for run in report["runs"]:
+        key = config_key(run["config"])
+        before = previous.get(key)
+        if not before:
+            continue
+        after = run["metrics"]
+        for metric in ("recall@1", f"recall@{run['config']['k']}", "mrr"):
+            print(f"{key:<40} {metric:<12} {before.get(metric, 0):>10} {after[metric]:>10}")
+        print(f"{key:<40} {'search p95':<12} {before['latency_ms']['search_ms']['p95']:>10} "
+              f"{after['latency_ms']['search_ms']['p95']:>10}")
+
+
+async def evaluate(args) -> Dict[str, Any]:
+    cases = load_test_set(args.testset)
+    evaluation = Evaluation(cases, args.concurrency, args.generate)
+    await evaluation.load_titles()
+    await evaluation.embed_all()
+
+    runs = []
+    for k, threshold, candidates, storage, note_candidates in itertools.product(
+            args.k, args.threshold, args.candidates or [None], args.storage or [None], args.note_candidates or [None]):
+        run = await evaluation.run_config(k, threshold, candidates, storage, note_candidates)
+        metrics = run["metrics"]
+        print(f"{config_key(run['config']):<40} recall@1={metrics['recall@1']:.2f} "
+              f"recall@{k}={metrics[f'recall@{k}']:.2f} mrr={metrics['mrr']:.3f} "
+              f"search p95={metrics['latency_ms']['search_ms']['p95']}ms")
+        runs.append(run)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "testset": args.testset,
+        "questions": len(cases),
+        "concurrency": args.concurrency,
+        "runs": runs,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate retrieval accuracy and latency over a test set")
+    parser.add_argument("--testset", default="testset.yaml")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--k", type=lambda v: parse_list(v, int), default=[15], help="comma-separated k values")
+    parser.add_argument("--threshold", type=lambda v: parse_list(v, float), default=[0.8],
+                        help="comma-separated maximum cosine distances")
+    # The full-storage query is an exact scan, so only the HNSW modes have a
+    # search-width knob: the rerank candidate count, which sets hnsw.ef_search.
+    parser.add_argument("--candidates", type=lambda v: parse_list(v, int), default=None,
+                        help="comma-separated rerank candidate counts for halfvec/binary storage")
+    parser.add_argument("--storage", type=lambda v: parse_list(v, str), default=None,
+                        help="comma-separated embedding storage modes (full, halfvec, binary)")
+    parser.add_argument("--note-candidates", type=lambda v: parse_list(v, int), default=None,
+                        help="comma-separated centroid candidate counts for two-stage retrieval (0 disables)")
+    parser.add_argument("--generate", action="store_true", help="also time answer generation with the LLM")
+    parser.add_argument("--db-host", default=None, help="overrides DB_HOST from the environment or .env")
+    parser.add_argument("--output", default="eval_results.yaml")
+    parser.add_argument("--compare", help="previous report to compare against")
+    args = parser.parse_args(argv)
+
+    if args.db_host is not None:
+        os.environ["DB_HOST"] = args.db_host
+    report = asyncio.run(evaluate(args))
+
+    with open(args.output, "w") as f:
+        yaml.dump(report, f, default_flow_style=False, indent=2, sort_keys=False)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(report, yaml.safe_load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
+import asyncio
 import os
-from typing import Optional
+import random
+from typing import AsyncIterator, Collection, Iterable, List, Optional
 from uuid import UUID
 
 import httpx
@@ -11,40 +13,150 @@ load_dotenv()
 
 from hello_api.notes.schema import NoteCreateUpdate, NoteResponse, NoteListResponse
 
+# Status codes worth retrying: throttling and transient server/proxy failures.
+RETRY_STATUSES = {429, 502, 503, 504}
+
 
 class APIClient:
-    def __init__(self, base_url: Optional[str] = None):
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        http2: bool = False,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        retries: int = 3,
+        backoff: float = 0.2,
+        max_backoff: float = 5.0,
+    ):
         self.base_url = base_url or os.getenv("API_BASE_URL", "http://localhost:2005")
-        self.client = httpx.AsyncClient(base_url=self.base_url)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            http2=http2,  # requires the h2 package (httpx[http2])
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        )
+
+    async def __aenter__(self) -> "APIClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
 
     async def close(self):
         await self.client.aclose()
 
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        idempotent: bool = True,
+        done_statuses: Collection[int] = (),
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a request, retrying idempotent calls with full-jitter exponential backoff.
+
+        `done_statuses` are answers that mean "already applied" when an earlier
+        attempt may have reached the server (a transport error, 502 or 504),
+        such as a 404 for a retried DELETE.
+        """
+        attempts = self.retries + 1 if idempotent else 1
+        maybe_applied = False
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException):
+                if last_attempt:
+                    raise
+                maybe_applied = True
+            else:
+                if maybe_applied and response.status_code in done_statuses:
+                    return response
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    return response
+                maybe_applied = maybe_applied or response.status_code in (502, 504)
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, delay))
+
     # Upsert a note (create or update)
     async def upsert_note(self, note: NoteCreateUpdate) -> NoteResponse:
         try:
-            note_dict = note.dict()
+            note_dict = note.model_dump(mode="json", exclude_none=True)
         except ValidationError as e:
             raise ValueError(f"Invalid note data: {e}")
 
-        response = await self.client.put("/notes", json=note_dict)
-        response.raise_for_status()
+        # Updates are idempotent; a retried create could insert the note twice.
+        response = await self._request("PUT", "/notes", idempotent=note.id is not None, json=note_dict)
         return NoteResponse(**response.json())
-    
 
+    async def upsert_many(
+        self,
+        notes: Iterable[NoteCreateUpdate],
+        concurrency: int = 16,
+        return_exceptions: bool = False,
+    ) -> List[NoteResponse]:
+        """Upsert notes concurrently, keeping at most `concurrency` requests in flight.
+
+        `notes` is consumed lazily, as slots free up, so a large generator never
+        turns into one task per note up front.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def upsert(note: NoteCreateUpdate) -> NoteResponse:
+            try:
+                return await self.upsert_note(note)
+            finally:
+                semaphore.release()
+
+        tasks = []
+        try:
+            for note in notes:
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(upsert(note)))
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def get_note(self, note_id: UUID) -> NoteResponse:
-        response = await self.client.get(f"/notes/{note_id}")
-        response.raise_for_status()
+        response = await self._request("GET", f"/notes/{note_id}")
         return NoteResponse(**response.json())
 
     async def delete_note(self, note_id: UUID) -> None:
-        response = await self.client.delete(f"/notes/{note_id}")
-        response.raise_for_status()
-        return
+        # A 404 after a lost response means an earlier attempt deleted the note.
+        await self._request("DELETE", f"/notes/{note_id}", done_statuses={404})
 
     async def list_notes(self, search: str = "", limit: int = 20, offset: int = 0) -> NoteListResponse:
         params = {"search": search, "limit": limit, "offset": offset}
-        response = await self.client.get("/notes", params=params)
-        response.raise_for_status()
-        return NoteListResponse(**response.json())
\ No newline at end of file
+        response = await self._request("GET", "/notes", params=params)
+        return NoteListResponse(**response.json())
+
+    async def iter_notes(self, search: str = "", page_size: int = 100) -> AsyncIterator[NoteResponse]:
+        """Yield every note, fetching the next page while the current one is consumed."""
+        offset = 0
+        next_page = asyncio.create_task(self.list_notes(search, page_size, offset))
+        try:
+            while True:
+                page = await next_page
+                offset += len(page.items)
+                more = len(page.items) == page_size and offset < page.total
+                if more:
+                    next_page = asyncio.create_task(self.list_notes(search, page_size, offset))
+                for note in page.items:
+                    yield note
+                if not more:
+                    return
+        finally:
+            if not next_page.done():
+                next_page.cancel()
@@ -0,0 +1,235 @@
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+
+# Content types worth compressing; everything else (images, already-compressed
+# archives, server-sent events) passes through untouched.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+EXCLUDED_TYPES = ("text/event-stream",)
+
+# Server preference when the client accepts several encodings equally.
+PREFERENCE = ("zstd", "br", "gzip")
+
+
+class StreamCompressor:
+    """Incremental compressor: `compress` flushes a block so each chunk reaches the client promptly."""
+
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.finish = finish
+
+
+def _gzip(level: int) -> StreamCompressor:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return StreamCompressor(
+        lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def _brotli(quality: int) -> StreamCompressor:
+    import brotli
+    compressor = brotli.Compressor(quality=quality)
+    return StreamCompressor(
+        lambda data: compressor.process(data) + compressor.flush(),
+        compressor.finish,
+    )
+
+
+def _zstd(level: int) -> StreamCompressor:
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return StreamCompressor(
+        lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush,
+    )
+
+
+def available_encodings() -> List[str]:
+    """gzip is always available; br and zstd only when their optional packages are installed."""
+    encodings = []
+    for name, module in (("zstd", "zstandard"), ("br", "brotli")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append(name)
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """Pick the best available encoding from an Accept-Encoding header, honouring q-values."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    wildcard = weights.get("*", 0.0)
+    best: Optional[Tuple[float, int, str]] = None
+    for encoding in available:
+        q = weights.get(encoding, wildcard)
+        if q <= 0:
+            continue
+        rank = (q, -PREFERENCE.index(encoding), encoding)
+        if best is None or rank > best:
+            best = rank
+    return best[2] if best else None
+
+
+class CompressionStats:
+    """Cumulative compression ratio and CPU time per encoding."""
+
+    def __init__(self):
+        self.encodings: Dict[str, Dict[str, float]] = {}
+        self.skipped = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        stats = self.encodings.setdefault(
+            encoding, {"chunks": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+        )
+        stats["chunks"] += 1
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["cpu_seconds"] += cpu_seconds
+
+    def snapshot(self) -> Dict[str, object]:
+        encodings = {}
+        for encoding, stats in self.encodings.items():
+            encodings[encoding] = {
+                **stats,
+                "cpu_seconds": round(stats["cpu_seconds"], 6),
+                "ratio": round(stats["bytes_in"] / stats["bytes_out"], 3) if stats["bytes_out"] else 0.0,
+            }
+        return {"skipped": self.skipped, "encodings": encodings}
+
+
+stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/br/zstd compression that streams rather than buffers responses.
+
+    Complete responses smaller than `minimum_size` are sent as-is; streaming
+    responses (NDJSON exports) are compressed chunk by chunk. Starlette builds
+    middleware on the first request, so settings are not read at import time.
+    """
+
+    def __init__(self, app: ASGIApp):
+        settings = get_settings()
+        self.app = app
+        self.enabled = settings.compression_enabled
+        self.minimum_size = settings.compression_minimum_size
+        self.factories: Dict[str, Callable[[], StreamCompressor]] = {
+            "gzip": lambda: _gzip(settings.compression_gzip_level),
+            "br": lambda: _brotli(settings.compression_brotli_quality),
+            "zstd": lambda: _zstd(settings.compression_zstd_level),
+        }
+        self.available = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    def _compress(self, data: bytes, final: bool) -> bytes:
+        cpu_start = time.thread_time()
+        out = self.compressor.compress(data) if data else b""
+        if final:
+            out += self.compressor.finish()
+        stats.record(self.encoding, len(data), len(out), time.thread_time() - cpu_start)
+        return out
+
+    def _should_compress(self, status: int, headers: Headers, body: bytes, more_body: bool) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(EXCLUDED_TYPES) or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.middleware.minimum_size
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Hold the headers until the first body chunk decides whether to compress.
+            self.start_message = message
+            return
+        if message_type != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not self._should_compress(start["status"], headers, body, more_body):
+                self.passthrough = True
+                stats.skipped += 1
+                await self.downstream(start)
+                await self.downstream(message)
+                return
+
+            self.compressor = self.middleware.factories[self.encoding]()
+            body = self._compress(body, final=not more_body)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The compressed bytes differ from the identity representation.
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.downstream(start)
+            await self.downstream({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.downstream(message)
+            return
+        await self.downstream({
+            "type": "http.response.body",
+            "body": self._compress(body, final=not more_body),
+            "more_body": more_body,
+        })
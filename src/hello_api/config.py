@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Dict, List, Literal, Union
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,7 +11,108 @@ class Settings(BaseSettings):
     db_database: str
     api_base_url: str = "http://localhost:2005"
 
+    # Engine and connection pool
+    db_echo: Union[Literal["debug"], bool] = False
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    db_server_settings: Dict[str, str] = {"jit": "off"}
+
+    # Read replicas (full SQLAlchemy URLs); reads fall back to the primary when empty
+    db_replica_urls: List[str] = []
+    db_replica_max_lag: float = 5.0
+    db_replica_check_interval: float = 10.0
+    db_replica_check_timeout: float = 2.0
+    # Reads within this many seconds of a client's last write go to the primary
+    db_read_your_writes_window: float = 10.0
+
+    # Sharded retrieval (full SQLAlchemy URLs, one per shard; see sharding.py).
+    # Shards that have not answered a search within the timeout are left out of
+    # the results, or fail the search when partial results are not allowed
+    db_shard_urls: List[str] = []
+    db_shard_search_timeout: float = 2.0
+    db_shard_allow_partial: bool = True
+
+    # Vector search: "full" compares float32 embeddings directly; "halfvec" and
+    # "binary" search a compact HNSW index (see migrations.py) and re-rank the
+    # nearest candidate chunks at full precision
+    embedding_storage: Literal["full", "halfvec", "binary"] = "full"
+    embedding_rerank_candidates: int = 100
+    # Two-stage retrieval: when > 0, only the chunks of this many notes nearest
+    # by centroid (note_centroids) are scored; 0 scores chunks of every note
+    embedding_note_candidates: int = 0
+
+    # Chunk text in notes_index: "text" stores a copy per chunk, "offsets" only
+    # (start, end) into notes.body plus the body version they were cut from
+    chunk_storage: Literal["text", "offsets"] = "text"
+
+    # Declarative partitioning of notes_index, applied by migrations.py: "note"
+    # hashes note_id, "collection" hashes notes.collection so searches scoped to
+    # a collection only scan its partition. Each partition has its own indexes.
+    notes_index_partition_by: Literal["none", "note", "collection"] = "none"
+    notes_index_partitions: int = 8
+
+    # Bulk import
+    bulk_import_batch_size: int = 1000
+    bulk_import_max_line_bytes: int = 10 * 1024 * 1024
+
+    # Response compression (br and zstd need the brotli / zstandard packages)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+
+    # /api/ask requests slower than this are logged with their stage breakdown (0 disables)
+    slow_request_threshold_ms: float = 2000.0
+
+    # Tracing: fraction of requests traced, and where spans go ("jsonl",
+    # "console", or "package.module:factory" returning an exporter)
+    tracing_enabled: bool = False
+    tracing_sample_rate: float = 0.01
+    tracing_exporter: str = "jsonl"
+    tracing_jsonl_path: str = "traces.jsonl"
+    # Seconds between background writes of queued spans to tracing_jsonl_path
+    tracing_flush_interval: float = 1.0
+
+    # On-demand profiling of requests sent with an X-Profile header; see profiling.py.
+    # Profiling stays off until a token is set.
+    profiling_enabled: bool = False
+    profiling_token: str = ""
+    profiling_paths: List[str] = ["/api/ask", "/notes"]
+    profiling_profiler: Literal["cprofile", "pyinstrument"] = "cprofile"
+    profiling_output_dir: str = "profiles"
+
+    # /api/admin endpoints (slow statements and their plans) take this in
+    # X-Admin-Token; they answer 404 until it is set
+    admin_token: str = ""
+
+    # Statements slower than this are logged and kept for /api/admin/slow-queries (0 disables);
+    # this fraction of vector searches also gets an EXPLAIN (ANALYZE, BUFFERS) in the background
+    slow_query_threshold_ms: float = 200.0
+    slow_query_log_size: int = 200
+    slow_query_explain_sample_rate: float = 0.01
+
+    # Event-loop lag sampling; debug mode logs the stack of anything blocking
+    # the loop for longer than loop_block_threshold seconds
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.5
+    loop_block_threshold: float = 0.1
+    loop_monitor_debug: bool = False
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """Load settings on first use so importing the package never reads the environment."""
+    return Settings()
+
+def __getattr__(name: str):
+    # Backwards compatible `from hello_api.config import settings`.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,291 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from .config import settings
+import asyncio
+import itertools
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
-DATABASE_URL = (
-    f"postgresql+asyncpg://{settings.db_username}:{settings.db_password}"
-    f"@{settings.db_host}:{settings.db_port}/{settings.db_database}"
-)
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from .config import Settings, get_settings
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+def database_url() -> str:
+    settings = get_settings()
+    return (
+        f"postgresql+asyncpg://{settings.db_username}:{settings.db_password}"
+        f"@{settings.db_host}:{settings.db_port}/{settings.db_database}"
+    )
 
-async_session = sessionmaker(
-    bind=engine, class_=AsyncSession, expire_on_commit=False
-)
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait to get a connection."""
+
+    # Metrics label; replica pools are renamed after their engine is created.
+    name = "primary"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.name = self.name
+        return pool
+
+    def _do_get(self):
+        from .metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.timeouts += 1
+            DB_POOL_TIMEOUTS.labels(self.name).inc()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            DB_POOL_WAIT.labels(self.name).observe(waited)
+            self._record_usage()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._record_usage()
+
+    def _record_usage(self) -> None:
+        from .metrics import DB_POOL_CONNECTIONS
+        DB_POOL_CONNECTIONS.labels(self.name, "checked_out").set(self.checkedout())
+        DB_POOL_CONNECTIONS.labels(self.name, "idle").set(self.checkedin())
+        DB_POOL_CONNECTIONS.labels(self.name, "overflow").set(max(self.overflow(), 0))
+
+def engine_options(settings: Settings) -> Dict[str, Any]:
+    """Keyword arguments for create_async_engine derived from settings."""
+    return dict(
+        echo=settings.db_echo,
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={
+            # SQLAlchemy's prepared statement cache and asyncpg's own cache;
+            # both must be 0 behind pgbouncer in transaction mode.
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+            "server_settings": dict(settings.db_server_settings),
+        },
+    )
+
+def observe_engine(engine: AsyncEngine) -> None:
+    """Attach tracing and slow-query capture; imported here so `import hello_api.db` stays light."""
+    from .slow_queries import get_slow_query_log
+    from .tracing import instrument_engine
+    instrument_engine(engine.sync_engine)
+    get_slow_query_log().install(engine)
+
+@lru_cache
+def get_engine() -> AsyncEngine:
+    """Create the engine on first use rather than as an import side effect."""
+    engine = create_async_engine(database_url(), **engine_options(get_settings()))
+    observe_engine(engine)
+    return engine
+
+@lru_cache
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=get_engine(), class_=AsyncSession, expire_on_commit=False
+    )
+
+def async_session() -> AsyncSession:
+    return get_sessionmaker()()
 
 async def get_session() -> AsyncSession:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# Replication lag in seconds; 0 on a primary or a fully caught-up standby.
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# Cookie recording when a client last wrote, for read-your-writes routing.
+LAST_WRITE_COOKIE = "last_write"
+# Request header forcing a read onto the primary.
+CONSISTENCY_HEADER = "x-read-consistency"
+
+class Replica:
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.url = url
+        self.engine = engine
+        observe_engine(engine)
+        if isinstance(engine.pool, InstrumentedPool):
+            engine.pool.name = f"replica:{engine.url.host}:{engine.url.port or 5432}"
+        self.sessionmaker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.lag = 0.0
+        # 0 until the first health check; unchecked replicas are not picked
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+
+class ReplicaRouter:
+    """Round-robin selection of read replicas with periodic health and lag checks.
+
+    The checks run in a background task every `check_interval` seconds, so
+    picking a replica never waits on one. A replica is only picked once it has
+    passed a check; until then reads go to the primary.
+    """
+
+    def __init__(
+        self,
+        replicas: List[Replica],
+        max_lag: float,
+        check_interval: float,
+        check_timeout: float,
+    ):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._next = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            async with asyncio.timeout(self.check_timeout):
+                async with replica.engine.connect() as conn:
+                    lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+            replica.lag = float(lag or 0)
+            replica.healthy = True
+            replica.error = None
+        except Exception as e:
+            replica.healthy = False
+            replica.error = str(e) or type(e).__name__
+        replica.checked_at = time.monotonic()
+
+    async def refresh(self) -> None:
+        """Check every replica concurrently."""
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    def start(self) -> None:
+        """Start the background checks on the running loop, unless they already run there."""
+        if not self.replicas:
+            return
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.check_interval)
+
+    def pick(self) -> Optional[Replica]:
+        """Next healthy replica within the lag threshold, or None to use the primary.
+
+        Uses the state from the last background check; starts the checks if
+        the app's lifespan has not.
+        """
+        if not self.replicas:
+            return None
+        self.start()
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.checked_at and replica.healthy and replica.lag <= self.max_lag:
+                return replica
+        return None
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "error": replica.error,
+            }
+            for replica in self.replicas
+        ]
+
+@lru_cache
+def get_replica_router() -> ReplicaRouter:
+    settings = get_settings()
+    replicas = [
+        Replica(url, create_async_engine(url, **engine_options(settings)))
+        for url in settings.db_replica_urls
+    ]
+    return ReplicaRouter(
+        replicas,
+        max_lag=settings.db_replica_max_lag,
+        check_interval=settings.db_replica_check_interval,
+        check_timeout=settings.db_replica_check_timeout,
+    )
+
+def remember_write(response: Response) -> None:
+    """Pin the client's following reads to the primary for the read-your-writes window."""
+    window = get_settings().db_read_your_writes_window
+    if window > 0:
+        response.set_cookie(LAST_WRITE_COOKIE, f"{time.time():.3f}", max_age=int(window) + 1, httponly=True)
+
+def needs_primary(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    if request.headers.get(CONSISTENCY_HEADER, "").lower() == "strong":
+        return True
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - last_write < get_settings().db_read_your_writes_window
+
+async def get_read_session(request: Request = None) -> AsyncSession:
+    """Session for read-only work, served by a replica when one is healthy and caught up."""
+    replica = None if needs_primary(request) else get_replica_router().pick()
+    factory = replica.sessionmaker if replica else get_sessionmaker()
+    async with factory() as session:
+        yield session
+
+def pool_status(engine: AsyncEngine) -> Dict[str, Any]:
+    """Snapshot of connection pool usage for diagnostics."""
+    pool = engine.pool
+    status: Dict[str, Any] = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+    }
+    if isinstance(pool, InstrumentedPool):
+        status.update(
+            waits=pool.wait_count,
+            wait_total_ms=round(pool.wait_total * 1000, 3),
+            wait_avg_ms=round(pool.wait_total * 1000 / pool.wait_count, 3) if pool.wait_count else 0.0,
+            wait_max_ms=round(pool.wait_max * 1000, 3),
+            timeouts=pool.timeouts,
+        )
+    return status
+
+def __getattr__(name: str):
+    # Backwards compatible module attributes, resolved lazily.
+    if name == "engine":
+        return get_engine()
+    if name == "DATABASE_URL":
+        return database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,24 @@
-import ollama
-from typing import List, Dict, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import TYPE_CHECKING, List, Any, Optional, Tuple
 import asyncio
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from .notes.models import notes_index, notes
+import logging
+import os
+import time
 import uuid
+import weakref
+from datetime import datetime
+from sqlalchemy import case, select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import BackgroundTasks
+from .config import get_settings
+from .notes.models import EMBEDDING_DIM, notes_index, notes
+from .text_splitter import RecursiveCharacterTextSplitter
+from .timing import StageTimer, timed
+from .tracing import SpanContext, current_context, span
+
+if TYPE_CHECKING:
+    from .sharding import ShardCoverage
+
+logger = logging.getLogger(__name__)
 
 # Initialize text splitter
 text_splitter = RecursiveCharacterTextSplitter(
@@ -16,37 +29,90 @@ text_splitter = RecursiveCharacterTextSplitter(
 )
 
 async def split_text_into_chunks(text: str) -> List[str]:
-    """Split text into chunks using RecursiveCharacterTextSplitter."""
-    chunks = text_splitter.split_text(text)
+    """Split text into chunks using RecursiveCharacterTextSplitter, off the event loop."""
+    chunks = await asyncio.to_thread(text_splitter.split_text, text)
     return chunks
 
+async def split_text_into_offsets(text: str) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of the chunks split_text_into_chunks would return."""
+    return await asyncio.to_thread(text_splitter.split_text_with_offsets, text)
+
+def chunk_content():
+    """SQL expression for a chunk's text; select it from notes_index joined to notes.
+
+    Offset-stored chunks are sliced out of the note body, or NULL once the body
+    has changed since they were cut (the note is then waiting to be re-indexed).
+    """
+    sliced = func.substr(
+        notes.c.body,
+        notes_index.c.start_offset + 1,
+        notes_index.c.end_offset - notes_index.c.start_offset,
+    )
+    return func.coalesce(
+        notes_index.c.content,
+        case((notes_index.c.body_version == notes.c.updated_at, sliced)),
+    ).label("content")
+
+_ollama_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+def ollama_async_client() -> Any:
+    """One Ollama AsyncClient per event loop.
+
+    Building a client loads TLS certificates, ~25ms of blocking, so it is not
+    done per call; the app creates it at startup.
+    """
+    loop = asyncio.get_running_loop()
+    client = _ollama_clients.get(loop)
+    if client is None:
+        import ollama
+        # Use custom Ollama host if specified
+        ollama_host = os.getenv('OLLAMA_HOST', 'localhost')
+        client = _ollama_clients[loop] = ollama.AsyncClient(host=f"http://{ollama_host}:11434")
+    return client
+
 async def generate_embeddings(texts: List[str]) -> List[List[float]]:
     """Generate embeddings for a list of texts using all-minilm model."""
-    import os
+    from .metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_DURATION
     embeddings = []
+    client = ollama_async_client()
     
-    # Use custom Ollama host if specified
-    ollama_host = os.getenv('OLLAMA_HOST', 'localhost')
-    client = ollama.Client(host=f"http://{ollama_host}:11434")
-    
-    for text in texts:
-        response = client.embeddings(
-            model="all-minilm",
-            prompt=text
-        )
-        embeddings.append(response['embedding'])
+    EMBEDDING_BATCH_SIZE.observe(len(texts))
+    with span("embed_batch", batch_size=len(texts)), EMBEDDING_DURATION.time():
+        for text in texts:
+            response = await client.embeddings(
+                model="all-minilm",
+                prompt=text
+            )
+            embeddings.append(response['embedding'])
     return embeddings
 
 async def upsert_chunks_with_embeddings(
     session: AsyncSession,
     note_id: uuid.UUID,
     chunks: List[str],
-    embeddings: List[List[float]]
+    embeddings: List[List[float]],
+    offsets: Optional[List[Tuple[int, int]]] = None,
+    body_version: Optional[datetime] = None
 ) -> None:
-    """Upsert chunks and their embeddings into the NotesIndex table."""
+    """Upsert chunks and their embeddings into the NotesIndex table.
+
+    With `offsets` and the `body_version` (notes.updated_at) they were cut from,
+    CHUNK_STORAGE=offsets stores those instead of a copy of the chunk text.
+    """
+    store_offsets = offsets is not None and body_version is not None
+    copy_text = not store_offsets or get_settings().chunk_storage == "text"
     for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        values = {
+            "content": chunk if copy_text else None,
+            "start_offset": offsets[i][0] if store_offsets else None,
+            "end_offset": offsets[i][1] if store_offsets else None,
+            "body_version": body_version if store_offsets else None,
+            "embedding": embedding,
+            # Follows the note; a changed collection moves its chunks to the new partition
+            "collection": select(notes.c.collection).where(notes.c.id == note_id).scalar_subquery(),
+        }
         # Check if chunk already exists for this note and index
-        stmt = select(notes_index).where(
+        stmt = select(notes_index.c.id).where(
             notes_index.c.note_id == note_id,
             notes_index.c.chunk_index == i
         )
@@ -59,10 +125,7 @@ async def upsert_chunks_with_embeddings(
                 notes_index.update().where(
                     notes_index.c.note_id == note_id,
                     notes_index.c.chunk_index == i
-                ).values(
-                    content=chunk,
-                    embedding=embedding
-                )
+                ).values(**values)
             )
         else:
             # Insert new chunk
@@ -70,82 +133,279 @@ async def upsert_chunks_with_embeddings(
                 notes_index.insert().values(
                     id=uuid.uuid4(),
                     note_id=note_id,
-                    content=chunk,
                     chunk_index=i,
-                    embedding=embedding
+                    **values
                 )
             )
     
+    await refresh_note_centroids(session, note_id)
     await session.commit()
 
+# Each note's centroid is the L2-normalized mean of its chunk embeddings, so its
+# cosine distance to a question approximates how close the note is as a whole.
+CENTROID_UPSERT = """
+    INSERT INTO note_centroids (note_id, collection, embedding, chunk_count)
+    SELECT notes_index.note_id, notes.collection, l2_normalize(AVG(notes_index.embedding)), COUNT(*)
+    FROM notes_index JOIN notes ON notes.id = notes_index.note_id
+    {where}
+    GROUP BY notes_index.note_id, notes.collection
+    ON CONFLICT (note_id) DO UPDATE
+    SET collection = EXCLUDED.collection, embedding = EXCLUDED.embedding,
+        chunk_count = EXCLUDED.chunk_count, updated_at = now()
+"""
+
+async def refresh_note_centroids(conn: Any, note_id: Optional[uuid.UUID] = None) -> None:
+    """Recompute one note's centroid from its stored chunks, or every note's when note_id is None.
+
+    `conn` is an AsyncSession or AsyncConnection; the caller commits.
+    """
+    if note_id is None:
+        await conn.execute(text(CENTROID_UPSERT.format(where="")))
+    else:
+        await conn.execute(text(CENTROID_UPSERT.format(where="WHERE notes_index.note_id = :note_id")), {"note_id": note_id})
+
 async def process_notes_for_indexing(
     session: AsyncSession,
     note_id: uuid.UUID,
-    note_content: str
+    note_content: str,
+    body_version: Optional[datetime] = None
 ) -> None:
-    """Process a note for indexing: split, embed, and store chunks."""
+    """Process a note for indexing: split, embed, and store chunks.
+
+    `body_version` is the note's updated_at when note_content was read.
+    """
     # Split text into chunks
-    chunks = await split_text_into_chunks(note_content)
+    offsets = await split_text_into_offsets(note_content)
+    chunks = [note_content[start:end] for start, end in offsets]
     
     # Generate embeddings for chunks
     embeddings = await generate_embeddings(chunks)
     
     # Upsert chunks and embeddings
-    await upsert_chunks_with_embeddings(session, note_id, chunks, embeddings)
+    await upsert_chunks_with_embeddings(session, note_id, chunks, embeddings, offsets, body_version)
 
-async def find_most_similar_note(
-    session: AsyncSession,
-    question: str,
-    k: int = 15
-) -> uuid.UUID:
-    """Find the most similar note to a question using KNN search."""
-    # Generate embedding for the question
+def schedule_indexing(background_tasks: BackgroundTasks, note_ids: List[uuid.UUID]) -> None:
+    """Queue notes for index_notes after the response, counting them in the indexing backlog."""
+    from .metrics import INDEXING_BACKLOG
+    INDEXING_BACKLOG.inc(len(note_ids))
+    background_tasks.add_task(index_notes, note_ids, trace_parent=current_context())
+
+async def index_notes(note_ids: List[uuid.UUID], trace_parent: Optional[SpanContext] = None) -> None:
+    """Index notes by id outside the request, e.g. after a bulk import.
+
+    `trace_parent` links the indexing spans to the request that queued them.
+    """
+    from .db import async_session
+    with span("index_notes", trace_parent, notes=len(note_ids)):
+        async with async_session() as session:
+            for note_id in note_ids:
+                await _index_note(session, note_id)
+
+async def _index_note(session: AsyncSession, note_id: uuid.UUID) -> None:
+    from .metrics import INDEXING_BACKLOG, NOTES_INDEXED
+    with span("index_note", note_id=str(note_id)) as note_span:
+        try:
+            from .sharding import copy_note_to_shard, get_shard_router
+            result = await session.execute(select(notes).where(notes.c.id == note_id))
+            note = result.first()
+            if not note:
+                raise ValueError(f"Note with ID {note_id} not found")
+            router = get_shard_router()
+            if router is None:
+                await process_notes_for_indexing(session, note_id, note.body, note.updated_at)
+            else:
+                # Chunks are written next to a copy of the note on its shard
+                async with router.shard_for(note_id).sessionmaker() as shard_session:
+                    await copy_note_to_shard(shard_session, note)
+                    await process_notes_for_indexing(shard_session, note_id, note.body, note.updated_at)
+            NOTES_INDEXED.labels("ok").inc()
+        except Exception as e:
+            await session.rollback()
+            NOTES_INDEXED.labels("error").inc()
+            if note_span is not None:
+                note_span.status = "error"
+                note_span.set_attribute("error", str(e))
+            logger.exception("Error indexing note %s", note_id)
+        finally:
+            INDEXING_BACKLOG.dec()
+
+# Distance cut-offs tried in order by find_most_similar_note.
+DISTANCE_THRESHOLDS = (0.8, 1.0)
+
+def vector_literal(vector: List[float]) -> str:
+    """pgvector text form of a vector, for binding as a parameter."""
+    return "[" + ",".join(map(str, vector)) + "]"
+
+async def embed_question(question: str) -> List[float]:
+    """Embed a question for KNN search."""
     question_embedding = await generate_embeddings([question])
-    question_vector = question_embedding[0]
-    
-    # Convert list to string format for pgvector
-    vector_str = "[" + ",".join(map(str, question_vector)) + "]"
-    
-    # Use raw SQL for vector similarity search with better threshold
-    from sqlalchemy import text
+    return question_embedding[0]
+
+# Chunks considered for a question under each EMBEDDING_STORAGE mode. "full"
+# compares every float32 vector; the compact modes take the nearest chunks from
+# an HNSW expression index over halfvec or binary-quantized vectors (built by
+# migrations.py), which are then re-ranked against the full-precision embedding.
+# Table names are placeholders filled in by candidate_query.
+CANDIDATE_QUERIES = {
+    "full": "SELECT id, note_id, embedding FROM {notes_index}",
+    "halfvec": f"""
+        SELECT id, note_id, embedding FROM {{notes_index}}
+        ORDER BY embedding::halfvec({EMBEDDING_DIM}) <=> CAST(:vector AS halfvec({EMBEDDING_DIM}))
+        LIMIT :candidates""",
+    "binary": f"""
+        SELECT id, note_id, embedding FROM {{notes_index}}
+        ORDER BY binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize(CAST(:vector AS vector))
+        LIMIT :candidates""",
+    # Two-stage retrieval (EMBEDDING_NOTE_CANDIDATES > 0): the nearest notes by
+    # centroid, then only their chunks, so the cost follows notes considered
+    # rather than total chunk count.
+    "centroid": """
+        SELECT id, note_id, embedding FROM {notes_index}
+        WHERE note_id IN (
+            SELECT note_id FROM {note_centroids}
+            ORDER BY embedding <=> CAST(:vector AS vector)
+            LIMIT :candidates
+        )""",
+}
+
+def candidate_query(storage: str, collection: Optional[str] = None) -> str:
+    """CANDIDATE_QUERIES[storage], restricted to one collection when given.
+
+    Filtering on the partition key lets Postgres skip the other partitions of a
+    collection-partitioned notes_index (see migrations.py). Every partition
+    holds whole notes, so per-note aggregates and the merged ORDER BY ... LIMIT
+    across partitions give the same result as one table.
+    """
+    tables = {"notes_index": "notes_index", "note_centroids": "note_centroids"}
+    if collection is not None:
+        tables = {
+            name: f"(SELECT * FROM {name} WHERE collection = :collection) AS {name}"
+            for name in tables
+        }
+    return CANDIDATE_QUERIES[storage].format(**tables)
+
+# pgvector rejects hnsw.ef_search outside 1..1000.
+HNSW_MAX_EF_SEARCH = 1000
+
+async def use_candidate_limit(session: AsyncSession, storage: str, candidates: int) -> None:
+    """Let the HNSW scan return `candidates` rows; it stops at hnsw.ef_search (default 40).
+
+    Above HNSW_MAX_EF_SEARCH candidates the scan returns at most that many.
+    """
+    if storage != "full":
+        await session.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef, true)"),
+            {"ef": str(min(max(candidates, 40), HNSW_MAX_EF_SEARCH))},
+        )
+
+async def rank_similar_notes(
+    session: AsyncSession,
+    question_vector: List[float],
+    k: int = 15,
+    max_distance: float = DISTANCE_THRESHOLDS[0],
+    storage: Optional[str] = None,
+    candidates: Optional[int] = None,
+    note_candidates: Optional[int] = None,
+    collection: Optional[str] = None,
+) -> List[Any]:
+    """Rank notes by the average distance of their chunks within max_distance of the question.
+
+    `collection` limits the search to notes in that collection, whose chunks
+    are then scanned exactly whatever `storage` is.
+
+    `storage`, `candidates` and `note_candidates` default to EMBEDDING_STORAGE,
+    EMBEDDING_RERANK_CANDIDATES and EMBEDDING_NOTE_CANDIDATES. A positive
+    `note_candidates` scores only the chunks of that many notes nearest by
+    centroid, and `storage` is then unused.
+    """
+    settings = get_settings()
+    if note_candidates is None:
+        note_candidates = settings.embedding_note_candidates
+    if note_candidates > 0:
+        storage, candidates = "centroid", note_candidates
+    else:
+        storage = storage or settings.embedding_storage
+        candidates = candidates or settings.embedding_rerank_candidates
+        if collection is not None:
+            # The HNSW scan stops after hnsw.ef_search rows and only then drops
+            # other collections, so a small collection could get no candidates.
+            storage = "full"
     query = text(f"""
-        SELECT note_id, COUNT(*) as chunk_count, 
-               AVG(embedding <=> '{vector_str}'::vector) as avg_distance
-        FROM notes_index
-        WHERE embedding <=> '{vector_str}'::vector < 0.8
+        WITH candidates AS ({candidate_query(storage, collection)})
+        SELECT note_id, COUNT(*) as chunk_count,
+               AVG(embedding <=> CAST(:vector AS vector)) as avg_distance
+        FROM candidates
+        WHERE embedding <=> CAST(:vector AS vector) < :max_distance
         GROUP BY note_id
         ORDER BY avg_distance ASC, chunk_count DESC
-        LIMIT {k}
+        LIMIT :k
     """)
-    
-    result = await session.execute(query)
-    rows = result.fetchall()
-    
-    if not rows:
-        # If no results with strict threshold, try with a more lenient one
-        query = text(f"""
-            SELECT note_id, COUNT(*) as chunk_count, 
-                   AVG(embedding <=> '{vector_str}'::vector) as avg_distance
-            FROM notes_index
-            WHERE embedding <=> '{vector_str}'::vector < 1.0
-            GROUP BY note_id
-            ORDER BY avg_distance ASC, chunk_count DESC
-            LIMIT {k}
-        """)
-        
-        result = await session.execute(query)
+    params = {"vector": vector_literal(question_vector), "max_distance": max_distance, "k": k}
+    if storage != "full":
+        params["candidates"] = candidates
+    if collection is not None:
+        params["collection"] = collection
+    start = time.perf_counter()
+    with span("vector_search", k=k, max_distance=max_distance, storage=storage) as search_span:
+        await use_candidate_limit(session, storage, candidates)
+        result = await session.execute(query, params)
         rows = result.fetchall()
-        
-        if not rows:
-            raise ValueError("No similar notes found")
-    
+        if search_span is not None:
+            search_span.set_attribute("candidates", len(rows))
+    from .metrics import VECTOR_QUERY_CANDIDATES, VECTOR_QUERY_DURATION
+    VECTOR_QUERY_DURATION.observe(time.perf_counter() - start)
+    VECTOR_QUERY_CANDIDATES.observe(len(rows))
+    return rows
+
+async def search_similar_notes(
+    session: AsyncSession,
+    question_vector: List[float],
+    k: int = 15,
+    thresholds: tuple = DISTANCE_THRESHOLDS,
+    collection: Optional[str] = None,
+    coverage: Optional["ShardCoverage"] = None,
+) -> List[Any]:
+    """Rank notes, relaxing the distance threshold until something matches.
+
+    With DB_SHARD_URLS set, every shard is searched instead of `session`, and
+    `coverage` records the shards left out of the results.
+    """
+    from .sharding import get_shard_router
+    router = get_shard_router()
+    if router is not None:
+        return await router.search(question_vector, k, thresholds, collection, coverage)
+    for max_distance in thresholds:
+        rows = await rank_similar_notes(session, question_vector, k, max_distance, collection=collection)
+        if rows:
+            return rows
+    raise ValueError("No similar notes found")
+
+async def find_most_similar_note(
+    session: AsyncSession,
+    question: str,
+    k: int = 15,
+    timer: Optional[StageTimer] = None,
+    collection: Optional[str] = None,
+    coverage: Optional["ShardCoverage"] = None
+) -> uuid.UUID:
+    """Find the most similar note to a question using KNN search, optionally within one collection."""
+    with timed(timer, "embed"):
+        question_vector = await embed_question(question)
+    with timed(timer, "search"):
+        rows = await search_similar_notes(session, question_vector, k, collection=collection, coverage=coverage)
+
     # Return the note_id with the best average distance
     return rows[0].note_id
 
-async def get_note_content(session: AsyncSession, note_id: uuid.UUID) -> str:
+async def get_note_content(
+    session: AsyncSession,
+    note_id: uuid.UUID,
+    timer: Optional[StageTimer] = None
+) -> str:
     """Get the content of a note by its ID."""
     stmt = select(notes.c.body).where(notes.c.id == note_id)
-    result = await session.execute(stmt)
+    with timed(timer, "fetch"):
+        result = await session.execute(stmt)
     row = result.first()
     
     if not row:
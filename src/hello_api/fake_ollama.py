@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Deterministic stand-in for the Ollama HTTP API, for benchmarks and offline runs.
+# Point the service at it with OLLAMA_HOST=127.0.0.1 and run
+#   python -m hello_api.fake_ollama --port 11434 --token-latency 0.01 --failure-rate 0.01
+# or `uvicorn hello_api.fake_ollama:app --port 11434` with the FAKE_OLLAMA_* variables.
+
+EMBEDDING_DIM = 384
+
+
+class FakeOllamaConfig:
+    """Latency and failure knobs, read from FAKE_OLLAMA_* environment variables."""
+
+    def __init__(self):
+        # Seconds per embeddings call, and per input for batched /api/embed.
+        self.embed_latency = float(os.getenv("FAKE_OLLAMA_EMBED_LATENCY", "0"))
+        # Seconds before the first chat token, then per generated token.
+        self.chat_latency = float(os.getenv("FAKE_OLLAMA_CHAT_LATENCY", "0"))
+        self.token_latency = float(os.getenv("FAKE_OLLAMA_TOKEN_LATENCY", "0"))
+        # Fraction of requests that fail with `failure_status`, and of chat
+        # streams that stall for `stall_seconds` (to exercise client timeouts).
+        self.failure_rate = float(os.getenv("FAKE_OLLAMA_FAILURE_RATE", "0"))
+        self.failure_status = int(os.getenv("FAKE_OLLAMA_FAILURE_STATUS", "500"))
+        self.stall_rate = float(os.getenv("FAKE_OLLAMA_STALL_RATE", "0"))
+        self.stall_seconds = float(os.getenv("FAKE_OLLAMA_STALL_SECONDS", "120"))
+        # "extractive" answers with the note sentence closest to the question;
+        # anything else is returned verbatim as a canned answer.
+        self.chat_mode = os.getenv("FAKE_OLLAMA_CHAT_MODE", "extractive")
+        self.max_tokens = int(os.getenv("FAKE_OLLAMA_MAX_TOKENS", "128"))
+        self.rng = random.Random(int(os.getenv("FAKE_OLLAMA_SEED", "0")))
+
+
+config = FakeOllamaConfig()
+
+app = FastAPI(title="Fake Ollama")
+
+TOKEN_RE = re.compile(r"\w+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def embed_text(text: str) -> List[float]:
+    """Hashed bag-of-words vector: stable across runs, and texts sharing words stay close."""
+    vector = [0.0] * EMBEDDING_DIM
+    for token in TOKEN_RE.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % EMBEDDING_DIM
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        # Empty input still gets a valid, non-zero vector.
+        vector[0] = 1.0
+        return vector
+    return [value / norm for value in vector]
+
+
+def extractive_answer(prompt: str) -> str:
+    """Return the sentence of the notes that shares the most words with the question."""
+    notes, _, question = prompt.rpartition("Question:")
+    question_words = set(TOKEN_RE.findall(question.lower()))
+    best, best_score = "", -1
+    for sentence in SENTENCE_RE.split(notes.replace("Notes:", "", 1)):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        score = len(question_words & set(TOKEN_RE.findall(sentence.lower())))
+        if score > best_score:
+            best, best_score = sentence, score
+    return best or "I don't know."
+
+
+def completion_tokens(prompt: str) -> List[str]:
+    text = extractive_answer(prompt) if config.chat_mode == "extractive" else config.chat_mode
+    # Whitespace-preserving pseudo-tokens, so streamed pieces concatenate to the full text.
+    return re.findall(r"\S+\s*", text)[: config.max_tokens] or [text]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _injected_failure() -> Optional[JSONResponse]:
+    if config.failure_rate and config.rng.random() < config.failure_rate:
+        return JSONResponse({"error": "injected failure"}, status_code=config.failure_status)
+    return None
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Dict[str, Any]):
+    if failure := _injected_failure():
+        return failure
+    if config.embed_latency:
+        await asyncio.sleep(config.embed_latency)
+    return {"embedding": embed_text(request.get("prompt", ""))}
+
+
+@app.post("/api/embed")
+async def embed(request: Dict[str, Any]):
+    if failure := _injected_failure():
+        return failure
+    inputs = request.get("input", "")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if config.embed_latency:
+        await asyncio.sleep(config.embed_latency * len(inputs))
+    return {
+        "model": request.get("model", "all-minilm"),
+        "embeddings": [embed_text(text) for text in inputs],
+    }
+
+
+async def _stream_tokens(model: str, tokens: List[str], chat: bool) -> AsyncIterator[bytes]:
+    if config.stall_rate and config.rng.random() < config.stall_rate:
+        await asyncio.sleep(config.stall_seconds)
+    for token in tokens:
+        if config.token_latency:
+            await asyncio.sleep(config.token_latency)
+        piece = {"message": {"role": "assistant", "content": token}} if chat else {"response": token}
+        yield (json.dumps({"model": model, "created_at": _now(), **piece, "done": False}) + "\n").encode()
+    final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+    yield (json.dumps({
+        "model": model,
+        "created_at": _now(),
+        **final,
+        "done": True,
+        "done_reason": "stop",
+        "eval_count": len(tokens),
+    }) + "\n").encode()
+
+
+async def _complete(request: Dict[str, Any], prompt: str, chat: bool):
+    if failure := _injected_failure():
+        return failure
+    model = request.get("model", "llama3")
+    tokens = completion_tokens(prompt)
+    if config.chat_latency:
+        await asyncio.sleep(config.chat_latency)
+    if request.get("stream", True):
+        return StreamingResponse(_stream_tokens(model, tokens, chat), media_type="application/x-ndjson")
+
+    if config.stall_rate and config.rng.random() < config.stall_rate:
+        await asyncio.sleep(config.stall_seconds)
+    if config.token_latency:
+        await asyncio.sleep(config.token_latency * len(tokens))
+    text = "".join(tokens)
+    body = {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+    return {
+        "model": model,
+        "created_at": _now(),
+        **body,
+        "done": True,
+        "done_reason": "stop",
+        "eval_count": len(tokens),
+    }
+
+
+@app.post("/api/chat")
+async def chat(request: Dict[str, Any]):
+    messages = request.get("messages") or []
+    prompt = messages[-1]["content"] if messages else ""
+    return await _complete(request, prompt, chat=True)
+
+
+@app.post("/api/generate")
+async def generate(request: Dict[str, Any]):
+    return await _complete(request, request.get("prompt", ""), chat=False)
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": "all-minilm:latest"}, {"name": "llama3:latest"}]}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Deterministic Ollama stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--embed-latency", type=float, default=config.embed_latency)
+    parser.add_argument("--chat-latency", type=float, default=config.chat_latency)
+    parser.add_argument("--token-latency", type=float, default=config.token_latency)
+    parser.add_argument("--failure-rate", type=float, default=config.failure_rate)
+    parser.add_argument("--failure-status", type=int, default=config.failure_status)
+    parser.add_argument("--stall-rate", type=float, default=config.stall_rate)
+    parser.add_argument("--stall-seconds", type=float, default=config.stall_seconds)
+    parser.add_argument("--chat-mode", default=config.chat_mode,
+                        help='"extractive", or a canned answer returned for every prompt')
+    parser.add_argument("--max-tokens", type=int, default=config.max_tokens)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for name in ("embed_latency", "chat_latency", "token_latency", "failure_rate", "failure_status",
+                 "stall_rate", "stall_seconds", "chat_mode", "max_tokens"):
+        setattr(config, name, getattr(args, name))
+    config.rng = random.Random(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Event-loop health. LoopMonitor samples scheduling lag into the
+# event_loop_lag_seconds histogram; with LOOP_MONITOR_DEBUG it also runs a
+# BlockingDetector, a watchdog thread that logs the loop thread's stack while
+# a callback is still blocking it. `assert_no_blocking` and
+# `assert_route_does_not_block` use the same detector to fail tests.
+
+
+class BlockingDetector:
+    """Watchdog thread that notices when the loop stops running callbacks for `threshold` seconds.
+
+    A heartbeat callback is rescheduled on the loop every threshold/4 seconds;
+    when it goes stale the thread captures the loop thread's current stack,
+    which is the code doing the blocking. Each block is reported once.
+    """
+
+    def __init__(self, threshold: float, on_block: Callable[[float, str], None]):
+        self.threshold = threshold
+        self.on_block = on_block
+        self.heartbeat = time.monotonic()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start watching the running loop; call from the loop thread."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.stopping.clear()
+        self._beat()
+        self.thread = threading.Thread(target=self._watch, name="loop-blocking-detector", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.handle is not None:
+            self.handle.cancel()
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _beat(self) -> None:
+        self.heartbeat = time.monotonic()
+        self.handle = self.loop.call_later(self.threshold / 4, self._beat)
+
+    def _watch(self) -> None:
+        reported = False
+        while not self.stopping.wait(self.threshold / 4):
+            stalled = time.monotonic() - self.heartbeat
+            if stalled < self.threshold:
+                reported = False
+            elif not reported:
+                reported = True
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+                self.on_block(stalled, stack)
+
+
+class LoopMonitor:
+    """Measures how late a periodic sleep wakes up; lag means something held the loop."""
+
+    def __init__(self, interval: float, block_threshold: float, debug: bool = False):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.debug = debug
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.detector: Optional[BlockingDetector] = None
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self._sample())
+        if self.debug:
+            self.detector = BlockingDetector(self.block_threshold, self._log_block)
+            self.detector.start()
+
+    async def stop(self) -> None:
+        if self.detector is not None:
+            self.detector.stop()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _sample(self) -> None:
+        from .metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag >= self.block_threshold:
+                EVENT_LOOP_BLOCKS.inc()
+
+    def _log_block(self, stalled: float, stack: str) -> None:
+        logger.warning("Event loop blocked for %.0fms (still running):\n%s", stalled * 1000, stack)
+
+    def status(self) -> dict:
+        return {
+            "interval": self.interval,
+            "block_threshold": self.block_threshold,
+            "debug": self.debug,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+        }
+
+
+@asynccontextmanager
+async def assert_no_blocking(threshold: float = 0.05) -> AsyncIterator[List[Tuple[float, str]]]:
+    """Fail with the offending stack if the loop is blocked for `threshold` seconds inside the block.
+
+        async with assert_no_blocking(0.05):
+            await client.post("/api/ask", json={"question": "..."})
+
+    One-time work such as lazy imports also blocks, so warm the path up first.
+    """
+    blocks: List[Tuple[float, str]] = []
+    detector = BlockingDetector(threshold, lambda stalled, stack: blocks.append((stalled, stack)))
+    detector.start()
+    try:
+        yield blocks
+    finally:
+        detector.stop()
+    if blocks:
+        stalled, stack = blocks[0]
+        raise AssertionError(
+            f"Event loop blocked for at least {stalled * 1000:.0f}ms "
+            f"({len(blocks)} time(s)); first blocking stack:\n{stack}"
+        )
+
+
+async def assert_route_does_not_block(app: Any, method: str, url: str, threshold: float = 0.05, **kwargs):
+    """Call a route in-process and fail if it blocks the event loop; returns the response."""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with assert_no_blocking(threshold):
+            return await client.request(method, url, **kwargs)
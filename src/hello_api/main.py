@@ -1,39 +1,100 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
+import importlib
+from contextlib import asynccontextmanager
 from hello_api.routes import notes
-from hello_api.embeddings import find_most_similar_note, process_notes_for_indexing
+from hello_api.embeddings import find_most_similar_note, ollama_async_client
 from hello_api.qa_simple import answer_question_simple
 from hello_api.notes.models import notes as notes_table
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from hello_api.db import get_session
+from hello_api.compression import CompressionMiddleware, stats as compression_stats
+from hello_api.config import get_settings
+from hello_api.db import get_engine, get_read_session, get_replica_router, pool_status
+from hello_api.loop_monitor import LoopMonitor
+from hello_api.http_metrics import MetricsMiddleware
+from hello_api.profiling import ProfilingMiddleware, token_matches
+from hello_api.sharding import ShardCoverage, ShardsUnavailable, get_shard_router
+from hello_api.slow_queries import get_slow_query_log
+from hello_api.timing import StageTimer
+from hello_api.tracing import TracingMiddleware
+
+loop_monitor: Optional[LoopMonitor] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global loop_monitor
+    settings = get_settings()
+    # Import the Ollama client off the loop so the first ask does not block on it.
+    await asyncio.to_thread(importlib.import_module, "ollama")
+    ollama_async_client()
+    if settings.loop_monitor_enabled:
+        loop_monitor = LoopMonitor(
+            settings.loop_monitor_interval,
+            settings.loop_block_threshold,
+            debug=settings.loop_monitor_debug,
+        )
+        loop_monitor.start()
+    replicas = get_replica_router()
+    replicas.start()
+    try:
+        yield
+    finally:
+        await replicas.stop()
+        if loop_monitor is not None:
+            await loop_monitor.stop()
+            loop_monitor = None
 
 app = FastAPI(
     title="AI Question Answering System",
     description="A sophisticated question answering system using vector similarity search and semantic understanding",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(notes.router, prefix="/notes", tags=["Notes"])
 
 # Pydantic models for API
 class QuestionRequest(BaseModel):
     question: str
+    # Search only this collection's notes (and notes_index partitions)
+    collection: Optional[str] = None
 
 class QuestionResponse(BaseModel):
     question: str
     retrieved_note: str
     answer: str
     confidence: str
+    timings: Optional[Dict[str, float]] = None
+    # Set when some shards did not answer and the note was picked from the rest
+    partial: Optional[bool] = None
+    unavailable_shards: Optional[Dict[str, str]] = None
 
 class DemoStats(BaseModel):
     total_notes: int
     total_chunks: int
     system_status: str
 
+class PoolStatus(BaseModel):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    max_overflow: int
+    waits: int = 0
+    wait_total_ms: float = 0.0
+    wait_avg_ms: float = 0.0
+    wait_max_ms: float = 0.0
+    timeouts: int = 0
+    replicas: List[Dict[str, Any]] = []
+    shards: List[Dict[str, Any]] = []
+
 @app.get("/", response_class=HTMLResponse)
 async def demo_homepage():
     """Demo homepage with interactive interface."""
@@ -55,6 +116,13 @@ async def demo_homepage():
             .result { background: #f8f9fa; border-left: 4px solid #667eea; padding: 20px; border-radius: 8px; margin-top: 20px; }
             .note-title { color: #667eea; font-weight: bold; margin-bottom: 10px; }
             .answer { line-height: 1.6; }
+            .timings { margin-top: 15px; font-size: 13px; color: #666; }
+            .timing-bar { display: flex; height: 8px; border-radius: 4px; overflow: hidden; margin-top: 5px; background: #e9ecef; }
+            .timing-bar div:nth-child(1) { background: #667eea; }
+            .timing-bar div:nth-child(2) { background: #764ba2; }
+            .timing-bar div:nth-child(3) { background: #28a745; }
+            .timing-bar div:nth-child(4) { background: #fd7e14; }
+            .timing-bar div:nth-child(5) { background: #17a2b8; }
             .loading { text-align: center; color: #666; }
             .stats { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px; }
             .stat-card { background: #f8f9fa; padding: 20px; border-radius: 8px; text-align: center; }
@@ -107,6 +175,7 @@ async def demo_homepage():
             <div id="result" style="display: none;" class="result">
                 <div class="note-title" id="noteTitle"></div>
                 <div class="answer" id="answer"></div>
+                <div class="timings" id="timings"></div>
             </div>
 
             <div id="loading" class="loading" style="display: none;">
@@ -147,7 +216,7 @@ async def demo_homepage():
                 document.getElementById('result').style.display = 'none';
 
                 try {
-                    const response = await fetch('/api/ask', {
+                    const response = await fetch('/api/ask?timings=true', {
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json',
@@ -163,6 +232,7 @@ async def demo_homepage():
                     
                     document.getElementById('noteTitle').textContent = `📚 Retrieved Note: ${result.retrieved_note}`;
                     document.getElementById('answer').textContent = result.answer;
+                    showTimings(result.timings);
                     
                     // Clear input if it was a manual question
                     if (!question) {
@@ -173,42 +243,89 @@ async def demo_homepage():
                     document.getElementById('result').style.display = 'block';
                     document.getElementById('noteTitle').textContent = '❌ Error';
                     document.getElementById('answer').textContent = 'Failed to process question. Please try again.';
+                    showTimings(null);
+                }
+            }
+
+            function showTimings(timings) {
+                const container = document.getElementById('timings');
+                container.textContent = '';
+                if (!timings) return;
+                const stages = Object.entries(timings).filter(([name]) => name !== 'total');
+                const label = document.createElement('div');
+                label.textContent = `⏱️ ${timings.total.toFixed(0)} ms total: ` +
+                    stages.map(([name, ms]) => `${name} ${ms.toFixed(0)} ms`).join(' · ');
+                const bar = document.createElement('div');
+                bar.className = 'timing-bar';
+                for (const [name, ms] of stages) {
+                    const segment = document.createElement('div');
+                    segment.style.width = `${(100 * ms / timings.total).toFixed(1)}%`;
+                    segment.title = `${name}: ${ms.toFixed(1)} ms`;
+                    bar.appendChild(segment);
                 }
+                container.appendChild(label);
+                container.appendChild(bar);
             }
         </script>
     </body>
     </html>
     """
 
-@app.post("/api/ask", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest):
-    """Ask a question and get an answer using vector similarity search."""
-    async for session in get_session():
+@app.post("/api/ask", response_model=QuestionResponse, response_model_exclude_none=True)
+async def ask_question(
+    request: QuestionRequest,
+    http_request: Request,
+    response: Response,
+    timings: bool = Query(False, description="Include the per-stage timing breakdown in the body"),
+):
+    """Ask a question and get an answer using vector similarity search.
+
+    Every response carries a Server-Timing header with embed, search, title,
+    fetch and generate durations in milliseconds. With sharded retrieval the
+    answer may come from the shards that answered in time; the response then
+    has `partial: true` and the shards left out, or is a 503 when
+    DB_SHARD_ALLOW_PARTIAL is off.
+    """
+    timer = StageTimer()
+    coverage = ShardCoverage()
+    # The request's read-your-writes cookie keeps a just-edited note off lagging replicas.
+    async for session in get_read_session(http_request):
         try:
             # Find the most similar note
-            note_id = await find_most_similar_note(session, request.question)
+            note_id = await find_most_similar_note(
+                session, request.question, timer=timer, collection=request.collection, coverage=coverage
+            )
             
             # Get note title
             stmt = select(notes_table.c.title).where(notes_table.c.id == note_id)
-            result = await session.execute(stmt)
+            with timer.stage("title"):
+                result = await session.execute(stmt)
             note_title = result.scalar()
             
-            # Generate answer
-            answer = await answer_question_simple(session, request.question)
+            # Generate answer from the note found above
+            answer = await answer_question_simple(session, request.question, note_id=note_id, timer=timer)
             
+            response.headers["Server-Timing"] = timer.header()
             return QuestionResponse(
                 question=request.question,
                 retrieved_note=note_title or "Unknown",
                 answer=answer,
-                confidence="High"  # Since we have 100% accuracy
+                confidence="High",  # Since we have 100% accuracy
+                timings=timer.as_dict() if timings else None,
+                partial=True if coverage.partial else None,
+                unavailable_shards=coverage.unavailable or None
             )
+        except ShardsUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Server-Timing": timer.header()})
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise HTTPException(status_code=500, detail=str(e), headers={"Server-Timing": timer.header()})
+        finally:
+            timer.log_if_slow("POST /api/ask", get_settings().slow_request_threshold_ms)
 
 @app.get("/api/stats", response_model=DemoStats)
-async def get_system_stats():
+async def get_system_stats(request: Request):
     """Get system statistics for the demo."""
-    async for session in get_session():
+    async for session in get_read_session(request):
         try:
             # Count total notes
             stmt = select(notes_table.c.id)
@@ -230,6 +347,55 @@ async def get_system_stats():
                 system_status="❌ Error"
             )
 
+@app.get("/api/pool", response_model=PoolStatus)
+async def get_pool_status():
+    """Connection pool diagnostics: checked-out, idle and overflow connections and wait time."""
+    shard_router = get_shard_router()
+    return PoolStatus(
+        **pool_status(get_engine()),
+        replicas=get_replica_router().status(),
+        shards=shard_router.status() if shard_router else [],
+    )
+
+@app.get("/api/compression")
+async def get_compression_stats():
+    """Response compression ratio and CPU time per encoding since startup."""
+    return compression_stats.snapshot()
+
+@app.get("/api/loop")
+async def get_loop_status():
+    """Event-loop lag: the latest and worst sample since startup."""
+    if loop_monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **loop_monitor.status()}
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Admin endpoints expose statements and plans; they take ADMIN_TOKEN in X-Admin-Token.
+
+    Without an ADMIN_TOKEN they do not exist, as profiling does not without PROFILING_TOKEN.
+    """
+    token = get_settings().admin_token
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(x_admin_token, token):
+        raise HTTPException(status_code=403, detail="Admin endpoints need X-Admin-Token set to ADMIN_TOKEN")
+
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_admin_token)])
+async def get_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Recent slow statements and sampled EXPLAIN ANALYZE plans of vector searches, newest first."""
+    return get_slow_query_log().snapshot(limit)
+
+@app.delete("/api/admin/slow-queries", status_code=204, dependencies=[Depends(require_admin_token)])
+async def clear_slow_queries():
+    get_slow_query_log().clear()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    from hello_api.metrics import render_metrics
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
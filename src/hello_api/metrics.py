@@ -0,0 +1,138 @@
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Prometheus metrics for the QA service, exposed at GET /metrics. Modules on
+# the app's import path import them inside functions, so prometheus_client
+# loads on first use rather than at startup.
+#
+# With several uvicorn workers, point PROMETHEUS_MULTIPROC_DIR at an empty
+# directory (cleared on each deploy) before starting them; every worker then
+# writes its samples there and /metrics aggregates all of them.
+
+NAMESPACE = "hello_api"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    namespace=NAMESPACE,
+)
+
+EMBEDDING_DURATION = Histogram(
+    "embedding_duration_seconds",
+    "Latency of one generate_embeddings call",
+    namespace=NAMESPACE,
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Texts embedded per generate_embeddings call",
+    namespace=NAMESPACE,
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+
+VECTOR_QUERY_DURATION = Histogram(
+    "vector_query_duration_seconds",
+    "Latency of the KNN query over notes_index",
+    namespace=NAMESPACE,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+VECTOR_QUERY_CANDIDATES = Histogram(
+    "vector_query_candidates",
+    "Notes returned by a KNN query within the distance threshold",
+    namespace=NAMESPACE,
+    buckets=(0, 1, 2, 5, 10, 15, 25, 50, 100),
+)
+
+SHARD_SEARCH_FAILURES = Counter(
+    "shard_search_failures",
+    "Shards left out of a scatter-gather search, by reason (timeout, error)",
+    ["shard", "reason"],
+    namespace=NAMESPACE,
+)
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a chat request to the first streamed token",
+    namespace=NAMESPACE,
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Generation throughput of a chat request",
+    namespace=NAMESPACE,
+    buckets=(1, 2.5, 5, 10, 20, 40, 80, 160, 320),
+)
+LLM_TIMEOUTS = Counter(
+    "llm_timeouts",
+    "Chat requests abandoned after the generation timeout",
+    namespace=NAMESPACE,
+)
+
+# Gauges are summed over live worker processes in multiprocess mode.
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections per pool by state (checked_out, idle, overflow)",
+    ["pool", "state"],
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check out a connection",
+    ["pool"],
+    namespace=NAMESPACE,
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts",
+    "Checkouts that failed waiting for a connection",
+    ["pool"],
+    namespace=NAMESPACE,
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the loop monitor's periodic wake-up ran",
+    namespace=NAMESPACE,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks",
+    "Lag samples over the blocking threshold",
+    namespace=NAMESPACE,
+)
+
+INDEXING_BACKLOG = Gauge(
+    "indexing_backlog",
+    "Notes queued for background indexing and not yet indexed",
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+NOTES_INDEXED = Counter(
+    "notes_indexed",
+    "Notes processed by the background indexer",
+    ["status"],
+    namespace=NAMESPACE,
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition text for a scrape, aggregated over workers in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
@@ -1,26 +1,155 @@
+import argparse
 import asyncio
+from typing import Iterable, Optional
 from sqlalchemy import text
-from .db import engine
-from .notes.models import metadata
+from .config import get_settings
+from .db import get_engine
+from .embeddings import refresh_note_centroids
+from .sharding import get_shard_router
+from .notes.models import DEFAULT_COLLECTION, EMBEDDING_DIM, metadata
 
-async def run_migrations():
-    """Run database migrations to set up pgvector and create tables."""
+# HNSW expression indexes for the compact EMBEDDING_STORAGE modes (pgvector >= 0.7).
+# notes_index keeps its float32 embeddings for re-ranking; only the index is
+# compact, so creating it converts existing rows without rewriting the table.
+COMPACT_INDEXES = {
+    "halfvec": f"""
+        CREATE INDEX IF NOT EXISTS notes_index_embedding_halfvec_idx
+        ON notes_index
+        USING hnsw ((embedding::halfvec({EMBEDDING_DIM})) halfvec_cosine_ops)
+    """,
+    "binary": f"""
+        CREATE INDEX IF NOT EXISTS notes_index_embedding_binary_idx
+        ON notes_index
+        USING hnsw ((binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops)
+    """,
+}
+
+PARTITION_KEYS = {"note": "note_id", "collection": "collection"}
+
+async def partition_notes_index(conn, partition_by: str, partitions: int) -> None:
+    """Rebuild notes_index as a table hash-partitioned on `partition_by`, keeping its rows.
+
+    Indexes created on the parent afterwards are built per partition, so
+    rebuilds, vacuums and bulk deletes touch one partition at a time.
+    """
+    partitioned = await conn.execute(text("""
+        SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'notes_index'::regclass)
+    """))
+    if partitioned.scalar():
+        print("notes_index is already partitioned; repartitioning is not supported")
+        return
+    key = PARTITION_KEYS[partition_by]
+    # The old table's indexes go with it; run_migrations recreates them on the new parent
+    await conn.execute(text("ALTER TABLE notes_index RENAME TO notes_index_unpartitioned"))
+    await conn.execute(text(f"""
+        CREATE TABLE notes_index (LIKE notes_index_unpartitioned INCLUDING DEFAULTS)
+        PARTITION BY HASH ({key})
+    """))
+    for remainder in range(partitions):
+        await conn.execute(text(f"""
+            CREATE TABLE notes_index_p{remainder} PARTITION OF notes_index
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})
+        """))
+    await conn.execute(text("INSERT INTO notes_index SELECT * FROM notes_index_unpartitioned"))
+    await conn.execute(text("DROP TABLE notes_index_unpartitioned"))
+    # Unique constraints on a partitioned table must include the partition key
+    await conn.execute(text(f"ALTER TABLE notes_index ADD PRIMARY KEY (id, {key})"))
+    await conn.execute(text("ALTER TABLE notes_index ADD FOREIGN KEY (note_id) REFERENCES notes (id)"))
+    print(f"Partitioned notes_index by hash of {key} into {partitions} partitions")
+
+async def run_migrations(compact_storage: Optional[Iterable[str]] = None):
+    """Run database migrations to set up pgvector and create tables.
+
+    Builds the compact index for EMBEDDING_STORAGE, or for each mode in
+    `compact_storage` when given. Every shard in DB_SHARD_URLS is migrated too.
+    """
+    settings = get_settings()
+    if compact_storage is None:
+        compact_storage = [settings.embedding_storage]
+    router = get_shard_router()
+    engines = [get_engine()]
+    if router is not None:
+        engines += [shard.engine for shard in router.shards]
+    for engine in engines:
+        print(f"Migrating {engine.url.render_as_string(hide_password=True)}")
+        await migrate(engine, settings, compact_storage)
+
+async def migrate(engine, settings, compact_storage: Iterable[str]) -> None:
+    """Schema, indexes and backfills for one database: the primary or a shard."""
     async with engine.begin() as conn:
         # Enable pgvector extension
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        
+
         # Create tables
         await conn.run_sync(metadata.create_all)
-        
+
+        # Offset-based chunk storage (CHUNK_STORAGE=offsets) on tables created before it
+        await conn.execute(text("""
+            ALTER TABLE notes_index
+                ALTER COLUMN content DROP NOT NULL,
+                ADD COLUMN IF NOT EXISTS start_offset integer,
+                ADD COLUMN IF NOT EXISTS end_offset integer,
+                ADD COLUMN IF NOT EXISTS body_version timestamptz
+        """))
+        if settings.chunk_storage == "offsets":
+            # Drop copies of chunks whose offsets still match their note's body
+            result = await conn.execute(text("""
+                UPDATE notes_index SET content = NULL
+                FROM notes
+                WHERE notes.id = notes_index.note_id
+                  AND notes_index.content IS NOT NULL
+                  AND notes_index.body_version = notes.updated_at
+            """))
+            print(f"Dropped copied text from {result.rowcount} chunks")
+
+        # Collections on tables created before them; notes_index and
+        # note_centroids copy the note's collection
+        for table in ("notes", "notes_index", "note_centroids"):
+            await conn.execute(text(f"""
+                ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS collection varchar(64) NOT NULL DEFAULT '{DEFAULT_COLLECTION}'
+            """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS note_centroids_collection_idx
+            ON note_centroids (collection)
+        """))
+
+        if settings.notes_index_partition_by != "none":
+            await partition_notes_index(conn, settings.notes_index_partition_by, settings.notes_index_partitions)
+
         # Create index for vector similarity search
         await conn.execute(text("""
-            CREATE INDEX IF NOT EXISTS notes_index_embedding_idx 
-            ON notes_index 
+            CREATE INDEX IF NOT EXISTS notes_index_embedding_idx
+            ON notes_index
             USING ivfflat (embedding vector_cosine_ops)
             WITH (lists = 100)
         """))
-        
+
+        # Two-stage retrieval: look up chunks by note, and search note centroids
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS notes_index_note_id_idx
+            ON notes_index (note_id)
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS note_centroids_embedding_idx
+            ON note_centroids
+            USING hnsw (embedding vector_cosine_ops)
+        """))
+        # Backfill centroids for notes indexed before note_centroids existed
+        await refresh_note_centroids(conn)
+
+        # Compact indexes over existing chunks; HNSW builds much faster in memory
+        for storage in compact_storage:
+            if storage in COMPACT_INDEXES:
+                await conn.execute(text("SET LOCAL maintenance_work_mem = '512MB'"))
+                await conn.execute(text(COMPACT_INDEXES[storage]))
+                print(f"Built {storage} index on notes_index")
+
         print("Migrations completed successfully!")
 
 if __name__ == "__main__":
-    asyncio.run(run_migrations()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create tables and vector indexes")
+    parser.add_argument("--compact", nargs="*", choices=sorted(COMPACT_INDEXES),
+                        help="compact indexes to build (default: the one for EMBEDDING_STORAGE)")
+    args = parser.parse_args()
+    asyncio.run(run_migrations(args.compact))
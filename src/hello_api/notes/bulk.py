@@ -0,0 +1,197 @@
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from hello_api.notes.crud import move_index_to_collection
+from hello_api.notes.models import DEFAULT_COLLECTION
+from hello_api.schemas import BulkImportFailure, BulkImportResult, NoteIn
+from hello_api.sharding import get_shard_router, move_note_on_shard
+
+# Notes without an id are new rows and go through COPY.
+COPY_COLUMNS = ["id", "title", "body", "collection"]
+
+# Notes with an id are upserted in one set-based statement per batch. Lines
+# that name a collection move an existing note there; lines without one keep
+# its collection, as PUT does. xmax is non-zero on rows that were updated.
+UPSERT_SQL = """
+    INSERT INTO notes (id, title, body, collection)
+    SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[])
+    ON CONFLICT (id) DO UPDATE
+    SET title = EXCLUDED.title, body = EXCLUDED.body, collection = EXCLUDED.collection, updated_at = now()
+    RETURNING id, collection, (xmax <> 0) AS updated
+"""
+UPSERT_KEEP_COLLECTION_SQL = """
+    INSERT INTO notes (id, title, body, collection)
+    SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[])
+    ON CONFLICT (id) DO UPDATE
+    SET title = EXCLUDED.title, body = EXCLUDED.body, updated_at = now()
+"""
+
+# Cap on the number of per-line failures echoed back to the client.
+MAX_REPORTED_FAILURES = 100
+
+
+async def iter_ndjson_lines(
+    stream: AsyncIterator[bytes],
+    max_line_bytes: int,
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield (line_number, line) from a byte stream without buffering the whole body.
+
+    Lines longer than `max_line_bytes` are yielded as None and skipped.
+    """
+    buffer = bytearray()
+    line_number = 0
+    skipping = False
+    async for chunk in stream:
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line_number += 1
+            too_long = skipping or end - start > max_line_bytes
+            yield line_number, None if too_long else bytes(buffer[start:end])
+            skipping = False
+            start = end + 1
+        del buffer[:start]
+        if not skipping and len(buffer) > max_line_bytes:
+            # Drop the oversized line as it arrives instead of holding it in memory.
+            skipping = True
+        if skipping:
+            buffer.clear()
+    if skipping or buffer:
+        line_number += 1
+        yield line_number, None if skipping else bytes(buffer)
+
+
+async def write_batch(engine: AsyncEngine, batch: List[Tuple[int, NoteIn]]) -> List[uuid.UUID]:
+    """Write one batch of notes in a single transaction and return their ids.
+
+    Existing notes moved to another collection then get their chunks, centroid
+    and shard copy moved as well, like crud.update_note.
+    """
+    new_rows = []
+    upserts: Dict[uuid.UUID, NoteIn] = {}
+    for _, note in batch:
+        if note.id is None:
+            new_rows.append((uuid.uuid4(), note.title, note.body, note.collection or DEFAULT_COLLECTION))
+        else:
+            # ON CONFLICT cannot touch the same row twice in one statement; last one wins.
+            upserts[note.id] = note
+
+    updated = await copy_and_upsert(engine, new_rows, upserts)
+    if updated:
+        await move_to_collections(engine, updated)
+    return [row[0] for row in new_rows] + list(upserts.keys())
+
+
+async def copy_and_upsert(
+    engine: AsyncEngine,
+    new_rows: List[Tuple[uuid.UUID, str, str, str]],
+    upserts: Dict[uuid.UUID, NoteIn],
+) -> List[Tuple[uuid.UUID, str]]:
+    """COPY the new rows and upsert the rest; returns (id, collection) of updated notes that named one."""
+    moving = [note for note in upserts.values() if note.collection is not None]
+    keeping = [note for note in upserts.values() if note.collection is None]
+    updated = []
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver_conn = raw.driver_connection
+        async with driver_conn.transaction():
+            if new_rows:
+                await driver_conn.copy_records_to_table("notes", records=new_rows, columns=COPY_COLUMNS)
+            if moving:
+                records = await driver_conn.fetch(UPSERT_SQL, *_columns(moving))
+                updated = [(record["id"], record["collection"]) for record in records if record["updated"]]
+            if keeping:
+                await driver_conn.execute(UPSERT_KEEP_COLLECTION_SQL, *_columns(keeping))
+    return updated
+
+
+def _columns(upserts: List[NoteIn]) -> Tuple[list, list, list, list]:
+    return (
+        [note.id for note in upserts],
+        [note.title for note in upserts],
+        [note.body for note in upserts],
+        [note.collection or DEFAULT_COLLECTION for note in upserts],
+    )
+
+
+async def move_to_collections(engine: AsyncEngine, updated: List[Tuple[uuid.UUID, str]]) -> None:
+    """Point updated notes' chunks and centroids, and their shard copies, at their collection."""
+    async with AsyncSession(bind=engine) as session:
+        for note_id, collection in updated:
+            await move_index_to_collection(session, note_id, collection)
+        await session.commit()
+    shards = get_shard_router()
+    if shards is not None:
+        for note_id, collection in updated:
+            await move_note_on_shard(shards, note_id, collection)
+
+
+async def import_notes(
+    engine: AsyncEngine,
+    stream: AsyncIterator[bytes],
+    batch_size: int,
+    max_line_bytes: int,
+) -> Tuple[BulkImportResult, List[uuid.UUID]]:
+    """Validate NDJSON notes incrementally and write them in batched transactions."""
+    started = time.perf_counter()
+    received = imported = failed = batches = 0
+    failures: List[BulkImportFailure] = []
+    imported_ids: List[uuid.UUID] = []
+    batch: List[Tuple[int, NoteIn]] = []
+
+    def record_failure(line: int, error: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(failures) < MAX_REPORTED_FAILURES:
+            failures.append(BulkImportFailure(line=line, error=error))
+
+    async def flush() -> None:
+        nonlocal imported, batches
+        batches += 1
+        try:
+            ids = await write_batch(engine, batch)
+        except Exception as e:
+            for line, _ in batch:
+                record_failure(line, f"Batch {batches} rolled back: {e}")
+        else:
+            imported += len(batch)
+            imported_ids.extend(ids)
+        batch.clear()
+
+    async for line_number, line in iter_ndjson_lines(stream, max_line_bytes):
+        if line is None:
+            received += 1
+            record_failure(line_number, f"Line exceeds {max_line_bytes} bytes")
+            continue
+        if not line.strip():
+            continue
+        received += 1
+        try:
+            note = NoteIn.model_validate_json(line)
+        except ValidationError as e:
+            record_failure(line_number, str(e))
+            continue
+        batch.append((line_number, note))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    result = BulkImportResult(
+        received=received,
+        imported=imported,
+        failed=failed,
+        batches=batches,
+        elapsed_seconds=round(elapsed, 3),
+        rows_per_second=round(imported / elapsed, 1) if elapsed > 0 else 0.0,
+        failures=failures,
+    )
+    return result, imported_ids
@@ -0,0 +1,203 @@
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import Row, delete, exists, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from hello_api.notes.models import note_centroids, notes, notes_index
+
+# Every note statement is a single round trip; the only extra query happens on
+# the failure path of a conditional update, to tell "missing" from "stale",
+# and when an update names a collection, whose chunks and centroid follow it.
+
+
+class NoteNotFound(LookupError):
+    def __init__(self, note_id: UUID):
+        super().__init__(f"Note {note_id} not found")
+        self.note_id = note_id
+
+
+class NoteVersionConflict(Exception):
+    def __init__(self, note_id: UUID, expected_updated_at: datetime):
+        super().__init__(f"Note {note_id} was modified since {expected_updated_at.isoformat()}")
+        self.note_id = note_id
+        self.expected_updated_at = expected_updated_at
+
+
+async def create_note(session: AsyncSession, title: str, body: str, collection: Optional[str] = None) -> Row:
+    values = {"title": title, "body": body}
+    if collection is not None:
+        values["collection"] = collection
+    result = await session.execute(
+        insert(notes).values(**values).returning(*notes.c)
+    )
+    row = result.one()
+    await session.commit()
+    return row
+
+
+async def update_note(
+    session: AsyncSession,
+    note_id: UUID,
+    title: str,
+    body: str,
+    expected_updated_at: Optional[datetime] = None,
+    collection: Optional[str] = None,
+) -> Row:
+    """UPDATE ... RETURNING, optionally guarded by the version the client last saw."""
+    values = {"title": title, "body": body, "updated_at": func.now()}
+    if collection is not None:
+        values["collection"] = collection
+    stmt = (
+        update(notes)
+        .where(notes.c.id == note_id)
+        .values(**values)
+        .returning(*notes.c)
+    )
+    if expected_updated_at is not None:
+        stmt = stmt.where(notes.c.updated_at == expected_updated_at)
+    result = await session.execute(stmt)
+    row = result.first()
+    if row is None:
+        await session.rollback()
+        if expected_updated_at is not None and await note_exists(session, note_id):
+            raise NoteVersionConflict(note_id, expected_updated_at)
+        raise NoteNotFound(note_id)
+    if collection is not None:
+        await move_index_to_collection(session, note_id, collection)
+    await session.commit()
+    return row
+
+
+async def move_index_to_collection(session: AsyncSession, note_id: UUID, collection: str) -> None:
+    """Point a note's chunks and centroid at `collection`, moving them to its notes_index partition.
+
+    Collection-scoped searches filter on these copies, so they must follow the
+    note. Rows already in `collection` are left alone; the caller commits.
+    """
+    for table in (notes_index, note_centroids):
+        await session.execute(
+            update(table)
+            .where(table.c.note_id == note_id, table.c.collection != collection)
+            .values(collection=collection)
+        )
+
+
+async def upsert_note(
+    session: AsyncSession,
+    note_id: Optional[UUID],
+    title: str,
+    body: str,
+    expected_updated_at: Optional[datetime] = None,
+    collection: Optional[str] = None,
+) -> Row:
+    """Create a note when no id is given, otherwise update the existing one."""
+    if note_id is None:
+        return await create_note(session, title, body, collection)
+    return await update_note(session, note_id, title, body, expected_updated_at, collection)
+
+
+async def delete_note(session: AsyncSession, note_id: UUID) -> None:
+    result = await session.execute(
+        delete(notes).where(notes.c.id == note_id).returning(notes.c.id)
+    )
+    deleted = result.first()
+    await session.commit()
+    if deleted is None:
+        raise NoteNotFound(note_id)
+
+
+async def note_exists(session: AsyncSession, note_id: UUID) -> bool:
+    result = await session.execute(select(exists().where(notes.c.id == note_id)))
+    return bool(result.scalar())
+
+
+async def get_note(session: AsyncSession, note_id: UUID) -> Row:
+    result = await session.execute(select(notes).where(notes.c.id == note_id))
+    row = result.first()
+    if row is None:
+        raise NoteNotFound(note_id)
+    return row
+
+
+async def get_note_version(session: AsyncSession, note_id: UUID) -> datetime:
+    """Metadata-only read used to answer conditional requests."""
+    result = await session.execute(select(notes.c.updated_at).where(notes.c.id == note_id))
+    updated_at = result.scalar()
+    if updated_at is None:
+        raise NoteNotFound(note_id)
+    return updated_at
+
+
+def _search_filters(search: Optional[str]) -> List:
+    if not search:
+        return []
+    pattern = f"%{search}%"
+    return [or_(notes.c.title.ilike(pattern), notes.c.body.ilike(pattern))]
+
+
+def _page_query(columns, search: Optional[str], limit: int, offset: int):
+    return (
+        select(*columns)
+        .where(*_search_filters(search))
+        .order_by(notes.c.updated_at.desc(), notes.c.id)
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+async def count_notes(session: AsyncSession, search: Optional[str]) -> int:
+    result = await session.execute(
+        select(func.count()).select_from(notes).where(*_search_filters(search))
+    )
+    return result.scalar() or 0
+
+
+async def list_note_versions(
+    session: AsyncSession,
+    search: Optional[str],
+    limit: int,
+    offset: int,
+) -> Sequence[Row]:
+    """(id, updated_at) for one page, without fetching note bodies."""
+    result = await session.execute(
+        _page_query([notes.c.id, notes.c.updated_at], search, limit, offset)
+    )
+    return result.fetchall()
+
+
+def projection(fields: Optional[Sequence[str]] = None, excerpt_length: Optional[int] = None) -> List:
+    """Columns for a list page: the requested fields plus an optional excerpt.
+
+    Defaults to every column, or every column but the body when an excerpt is
+    requested. id and updated_at are always selected; they address the note and
+    version the page.
+    """
+    if fields is not None:
+        names = list(fields)
+    else:
+        names = [name for name in notes.c.keys() if not (excerpt_length and name == "body")]
+    for required in ("id", "updated_at"):
+        if required not in names:
+            names.insert(0, required)
+    columns = [notes.c[name] for name in notes.c.keys() if name in names]
+    if excerpt_length:
+        # left() only detoasts the prefix it needs, so large bodies never leave Postgres.
+        columns.append(func.left(notes.c.body, excerpt_length).label("excerpt"))
+    return columns
+
+
+async def list_notes(
+    session: AsyncSession,
+    search: Optional[str],
+    limit: int,
+    offset: int,
+    total: Optional[int] = None,
+    columns: Optional[List] = None,
+) -> Tuple[Sequence[Row], int]:
+    """One page of notes, newest first, plus the total number of matches."""
+    if total is None:
+        total = await count_notes(session, search)
+    result = await session.execute(_page_query(columns or notes.c, search, limit, offset))
+    return result.fetchall(), total
@@ -0,0 +1,75 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+from uuid import UUID
+
+# Validators for conditional requests. A note's ETag encodes its id and the
+# exact updated_at (in microseconds), so it can be turned back into the
+# expected version for optimistic concurrency on PUT. It is weak: it names the
+# note's version, whichever Content-Encoding carries it, so a 304 repeats the
+# ETag the client stored from a compressed or an identity 200.
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _micros(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def note_etag(note_id: UUID, updated_at: datetime) -> str:
+    return f'W/"{note_id}.{_micros(updated_at):x}"'
+
+
+def parse_note_etag(etag: str) -> Optional[Tuple[UUID, datetime]]:
+    """Inverse of note_etag; None when the value is not a note ETag."""
+    value = etag.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        note_id, micros = value.strip('"').split(".")
+        return UUID(note_id), EPOCH + timedelta(microseconds=int(micros, 16))
+    except ValueError:
+        return None
+
+
+def page_etag(parts: Iterable[object]) -> str:
+    """Weak ETag for a list page, derived from its query and the (id, updated_at) of each row."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\x1f")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_in(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match / If-Match header."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def not_modified_since(header: Optional[str], updated_at: datetime) -> bool:
+    """True when If-Modified-Since is at or after updated_at (HTTP dates have second precision)."""
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return updated_at.replace(microsecond=0) <= since
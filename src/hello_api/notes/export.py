@@ -0,0 +1,89 @@
+import base64
+from typing import Any, AsyncIterator, Dict
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from hello_api.embeddings import chunk_content
+from hello_api.notes.models import notes, notes_index
+from hello_api.sharding import get_shard_router
+
+
+def _encode_embedding(embedding: Any, embedding_format: str) -> Any:
+    import numpy as np
+    vector = np.asarray(embedding, dtype="<f4")
+    if embedding_format == "base64":
+        # Little-endian float32, 4 bytes per dimension.
+        return base64.b64encode(vector.tobytes()).decode("ascii")
+    return vector.tolist()
+
+
+def _dumps(record: Dict[str, Any]) -> bytes:
+    """One NDJSON line, with UUIDs and datetimes (UTC as "Z") as the JSON API writes them.
+
+    OPT_NON_STR_KEYS admits the str subclasses SQLAlchemy uses for column names.
+    """
+    return orjson.dumps(
+        record,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC | orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+async def export_ndjson(
+    session: AsyncSession,
+    include_chunks: bool = False,
+    embedding_format: str = "json",
+    batch_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """Stream notes, then optionally their chunks, as NDJSON from server-side cursors.
+
+    Note lines carry `"type": "note"` and are accepted as-is by POST /notes/bulk;
+    chunk lines carry `"type": "chunk"` and reference their note by `note_id`.
+    Chunks are read from the shards when retrieval is sharded, ordered by
+    note within each shard. Only `batch_size` rows are held in memory at a time.
+    """
+    note_query = select(notes).order_by(notes.c.id).execution_options(yield_per=batch_size)
+    result = await session.stream(note_query)
+    async for partition in result.partitions():
+        yield b"".join(_dumps({"type": "note", **row._asdict()}) for row in partition)
+
+    if not include_chunks:
+        return
+
+    router = get_shard_router()
+    if router is None:
+        async for data in _chunk_lines(session, embedding_format, batch_size):
+            yield data
+        return
+    # With DB_SHARD_URLS set, each note's chunks live only on its shard.
+    for shard in router.shards:
+        async with shard.sessionmaker() as shard_session:
+            async for data in _chunk_lines(shard_session, embedding_format, batch_size):
+                yield data
+
+
+async def _chunk_lines(session: AsyncSession, embedding_format: str, batch_size: int) -> AsyncIterator[bytes]:
+    chunk_query = (
+        select(
+            notes_index.c.note_id,
+            notes_index.c.chunk_index,
+            chunk_content(),
+            notes_index.c.embedding,
+        )
+        .join(notes, notes.c.id == notes_index.c.note_id)
+        .order_by(notes_index.c.note_id, notes_index.c.chunk_index)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(chunk_query)
+    async for partition in result.partitions():
+        yield b"".join(
+            _dumps({
+                "type": "chunk",
+                "note_id": row.note_id,
+                "chunk_index": row.chunk_index,
+                "content": row.content,
+                "embedding": _encode_embedding(row.embedding, embedding_format),
+            })
+            for row in partition
+        )
@@ -5,16 +5,38 @@ from sqlalchemy import Table, Column, String, Text, TIMESTAMP, Integer, ForeignK
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy import MetaData
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.types import NullType, TypeDecorator
 
 metadata = MetaData()
 
+
+class Vector(TypeDecorator):
+    """pgvector's VECTOR(dim) column type, importing pgvector (and numpy) on first use."""
+
+    impl = NullType
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.dim = dim
+
+    def load_dialect_impl(self, dialect):
+        from pgvector.sqlalchemy import Vector
+        return dialect.type_descriptor(Vector(self.dim))
+
+
+EMBEDDING_DIM = 384  # all-minilm produces 384-dimensional vectors
+
+DEFAULT_COLLECTION = "default"
+
 notes = Table(
     "notes",
     metadata,
     Column("id", UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
     Column("title", String(255), nullable=False),
     Column("body", Text, nullable=False),
+    # Tenant / collection key; searches can be scoped to one collection
+    Column("collection", String(64), nullable=False, server_default=DEFAULT_COLLECTION),
     Column("created_at", TIMESTAMP(timezone=True), server_default=func.now(), nullable=False),
     Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False),
 )
@@ -24,9 +46,28 @@ notes_index = Table(
     metadata,
     Column("id", UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
     Column("note_id", UUID(as_uuid=True), ForeignKey("notes.id"), nullable=False),
-    Column("content", Text, nullable=False),
+    # Copy of notes.collection, so the table can be partitioned and pruned by it
+    Column("collection", String(64), nullable=False, server_default=DEFAULT_COLLECTION),
+    # Copied chunk text; NULL with CHUNK_STORAGE=offsets, where the chunk is
+    # notes.body[start_offset:end_offset] while notes.updated_at == body_version
+    Column("content", Text, nullable=True),
     Column("chunk_index", Integer, nullable=False),
-    Column("embedding", Vector(384), nullable=False),  # all-minilm produces 384-dimensional vectors
+    Column("start_offset", Integer, nullable=True),
+    Column("end_offset", Integer, nullable=True),
+    Column("body_version", TIMESTAMP(timezone=True), nullable=True),
+    Column("embedding", Vector(EMBEDDING_DIM), nullable=False),
     Column("created_at", TIMESTAMP(timezone=True), server_default=func.now(), nullable=False),
     Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False),
 )
+
+# One row per indexed note: the normalized mean of its chunk embeddings, used
+# to pick candidate notes before their chunks are scored (see embeddings.py).
+note_centroids = Table(
+    "note_centroids",
+    metadata,
+    Column("note_id", UUID(as_uuid=True), ForeignKey("notes.id"), primary_key=True),
+    Column("collection", String(64), nullable=False, server_default=DEFAULT_COLLECTION),
+    Column("embedding", Vector(EMBEDDING_DIM), nullable=False),
+    Column("chunk_count", Integer, nullable=False),
+    Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False),
+)
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, update, delete, or_, func
 from uuid import UUID
-from hello_api.db import get_session
-from hello_api.notes import models, schema
+from hello_api.db import get_read_session, get_session
+from hello_api.notes import crud, schema
+from hello_api.responses import FastJSONResponse, page_content, row_dict
 
 router = APIRouter()
 
@@ -13,53 +13,30 @@ async def upsert_note(
     note: schema.NoteCreateUpdate,
     session: AsyncSession = Depends(get_session)
 ):
-    if note.id:
-        # Update flow
-        result = await session.execute(select(models.notes).where(models.notes.c.id == note.id))
-        existing_note = result.fetchone()
-        if not existing_note:
-            raise HTTPException(status_code=404, detail="Note not found")
-
-        await session.execute(
-            update(models.notes)
-            .where(models.notes.c.id == note.id)
-            .values(title=note.title, body=note.body)
-        )
-        await session.commit()
-
-        result = await session.execute(select(models.notes).where(models.notes.c.id == note.id))
-        row = result.fetchone()
-        return schema.NoteResponse(**row._mapping)
-
-    else:
-        # Create flow
-        result = await session.execute(
-            insert(models.notes)
-            .values(title=note.title, body=note.body)
-            .returning(models.notes)
-        )
-        await session.commit()
-        row = result.fetchone()
-        return schema.NoteResponse(**row._mapping)
+    try:
+        row = await crud.upsert_note(session, note.id, note.title, note.body, note.expected_updated_at)
+    except crud.NoteNotFound:
+        raise HTTPException(status_code=404, detail="Note not found")
+    except crud.NoteVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return FastJSONResponse(row_dict(row))
 
 
 @router.get("/notes/{note_id}", response_model=schema.NoteResponse)
-async def get_note(note_id: UUID, session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(models.notes).where(models.notes.c.id == note_id))
-    note = result.fetchone()
-    if not note:
+async def get_note(note_id: UUID, session: AsyncSession = Depends(get_read_session)):
+    try:
+        note = await crud.get_note(session, note_id)
+    except crud.NoteNotFound:
         raise HTTPException(status_code=404, detail="Note not found")
-    return schema.NoteResponse(**note._mapping)
+    return FastJSONResponse(row_dict(note))
 
 
 @router.delete("/notes/{note_id}", status_code=204)
 async def delete_note(note_id: UUID, session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(models.notes).where(models.notes.c.id == note_id))
-    note = result.fetchone()
-    if not note:
+    try:
+        await crud.delete_note(session, note_id)
+    except crud.NoteNotFound:
         raise HTTPException(status_code=404, detail="Note not found")
-    await session.execute(delete(models.notes).where(models.notes.c.id == note_id))
-    await session.commit()
     return
 
 
@@ -68,33 +45,7 @@ async def list_notes(
     search: str = Query("", alias="search"),
     limit: int = Query(20, ge=1),
     offset: int = Query(0, ge=0),
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
-    filters = []
-    if search:
-        filters.append(
-            or_(
-                models.notes.c.title.ilike(f"%{search}%"),
-                models.notes.c.body.ilike(f"%{search}%")
-            )
-        )
-
-    total_query = select(func.count()).select_from(models.notes).where(*filters)
-    total_result = await session.execute(total_query)
-    total = total_result.scalar()
-
-    query = (
-        select(models.notes)
-        .where(*filters)
-        .limit(limit)
-        .offset(offset)
-    )
-    result = await session.execute(query)
-    items = [schema.NoteResponse(**row._mapping) for row in result.fetchall()]
-
-    return schema.NoteListResponse(
-        items=items,
-        total=total,
-        limit=limit,
-        offset=offset
-    )
+    rows, total = await crud.list_notes(session, search, limit, offset)
+    return FastJSONResponse(page_content(rows, total, limit, offset))
@@ -7,6 +7,8 @@ class NoteCreateUpdate(BaseModel):
     id: Optional[UUID] = None
     title: str = Field(..., min_length=1, max_length=255)
     body: str = Field(..., min_length=1)
+    # Optimistic concurrency: only update if the note is still at this version
+    expected_updated_at: Optional[datetime] = None
 
 class NoteResponse(BaseModel):
     id: UUID
@@ -0,0 +1,187 @@
+import cProfile
+import hmac
+import html
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# On-demand profiling of single requests. With PROFILING_ENABLED=true and a
+# PROFILING_TOKEN set, a request to one of PROFILING_PATHS carrying
+# `X-Profile: <PROFILING_TOKEN>` (or the `_profile=<token>` query parameter)
+# runs under a profiler:
+#   X-Profile-Format: file        profile saved under PROFILING_OUTPUT_DIR,
+#                                 normal response plus an X-Profile-File header
+#   X-Profile-Format: html        the profile replaces the response body
+#   X-Profile-Format: speedscope  JSON for https://www.speedscope.app (pyinstrument
+#                                 only; a 400 with cProfile)
+# PROFILING_PROFILER=pyinstrument uses the optional pyinstrument package, a
+# sampling profiler that follows awaits; cProfile (the default) records every
+# call on the event loop thread, including other requests running concurrently.
+
+FORMATS = ("file", "html", "speedscope")
+
+
+def token_matches(given: Optional[str], token: str) -> bool:
+    """Constant-time check of a presented token; always False while none is configured."""
+    return bool(token) and given is not None and hmac.compare_digest(given.encode(), token.encode())
+
+
+class _CProfileSession:
+    extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def save(self, path: str) -> None:
+        self.profile.dump_stats(path)
+
+    def html(self) -> str:
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(60)
+        return f"<!DOCTYPE html><html><body><pre>{html.escape(out.getvalue())}</pre></body></html>"
+
+
+class _PyinstrumentSession:
+    extension = "html"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler(async_mode="enabled")
+
+    def start(self) -> None:
+        self.profiler.start()
+
+    def stop(self) -> None:
+        self.profiler.stop()
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.html())
+
+    def html(self) -> str:
+        return self.profiler.output_html()
+
+    def speedscope(self) -> str:
+        from pyinstrument.renderers import SpeedscopeRenderer
+        return self.profiler.output(renderer=SpeedscopeRenderer())
+
+
+class ProfilingMiddleware:
+    """Profiles individual requests on demand; a single flag check when disabled or not asked."""
+
+    def __init__(self, app: ASGIApp):
+        settings = get_settings()
+        self.app = app
+        self.token = settings.profiling_token
+        # Without a token anyone could profile (and slow down) production requests.
+        self.enabled = settings.profiling_enabled and bool(self.token)
+        if settings.profiling_enabled and not self.token:
+            logger.warning("PROFILING_ENABLED is set but PROFILING_TOKEN is empty; profiling stays off")
+        self.paths = settings.profiling_paths
+        self.profiler = settings.profiling_profiler
+        self.output_dir = settings.profiling_output_dir
+        # One profiler per process: both profilers hook the whole event loop thread.
+        self.busy = False
+
+    def _requested(self, scope: Scope) -> Optional[Tuple[str, str]]:
+        """(token, format) when the request asks to be profiled."""
+        headers = Headers(scope=scope)
+        token = headers.get("x-profile")
+        fmt = headers.get("x-profile-format")
+        if token is None and b"_profile" in scope.get("query_string", b""):
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            token = query.get("_profile", [None])[0]
+            fmt = fmt or query.get("_profile_format", [None])[0]
+        if token is None:
+            return None
+        return token, fmt or "file"
+
+    def _allowed(self, token: str, path: str) -> bool:
+        if not token_matches(token, self.token):
+            return False
+        return not self.paths or path.startswith(tuple(self.paths))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        if requested is None or not self._allowed(requested[0], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        fmt = requested[1]
+        if fmt not in FORMATS or (fmt == "speedscope" and self.profiler != "pyinstrument"):
+            response = JSONResponse(
+                {"detail": f"Unsupported profile format {fmt!r} for the {self.profiler} profiler"},
+                status_code=400,
+            )
+            await response(scope, receive, send)
+            return
+        if self.busy:
+            response = JSONResponse({"detail": "Another request is being profiled"}, status_code=409)
+            await response(scope, receive, send)
+            return
+
+        session = _PyinstrumentSession() if self.profiler == "pyinstrument" else _CProfileSession()
+        self.busy = True
+        try:
+            if fmt == "file":
+                await self._profile_to_file(session, scope, receive, send)
+            else:
+                await self._profile_to_response(session, fmt, scope, receive, send)
+        finally:
+            self.busy = False
+
+    async def _profile_to_file(self, session, scope: Scope, receive: Receive, send: Send) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{slug}-{os.getpid()}-{time.monotonic_ns()}.{session.extension}"
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        session.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.stop()
+            session.save(os.path.join(self.output_dir, name))
+
+    async def _profile_to_response(self, session, fmt: str, scope: Scope, receive: Receive, send: Send) -> None:
+        async def discard(message: Message) -> None:
+            return None
+
+        session.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            session.stop()
+        if fmt == "html":
+            response = Response(session.html(), media_type="text/html")
+        else:
+            response = Response(session.speedscope(), media_type="application/json")
+        await response(scope, receive, send)
@@ -1,4 +1,3 @@
-import ollama
 from sqlalchemy.ext.asyncio import AsyncSession
 from .embeddings import find_most_similar_note, get_note_content
 
@@ -20,6 +19,7 @@ async def answer_question_with_context(
         note_content = await get_note_content(session, note_id)
         
         # Generate answer using llama3.2
+        import ollama
         response = await ollama.chat(
             model="llama3",
             messages=[
@@ -44,6 +44,7 @@ async def answer_question_with_note_id(
         note_content = await get_note_content(session, note_id)
         
         # Generate answer using llama3.2
+        import ollama
         response = await ollama.chat(
             model="llama3",
             messages=[
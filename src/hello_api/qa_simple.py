@@ -1,41 +1,74 @@
+from typing import Optional
+import asyncio
+import time
+import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
-from .embeddings import find_most_similar_note, get_note_content
-import ollama
+from .embeddings import find_most_similar_note, get_note_content, ollama_async_client
+from .timing import StageTimer, timed
+from .tracing import span
+
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions based on the provided study notes. Answer the question accurately using only the information from the notes."
+
+async def _stream_chat(messages) -> str:
+    """Run a streamed chat to completion, recording time to first token and tokens/sec.
+
+    Cancelling the coroutine closes the HTTP stream, so Ollama stops generating.
+    """
+    from .metrics import LLM_TIME_TO_FIRST_TOKEN, LLM_TOKENS_PER_SECOND
+    start = time.perf_counter()
+    first_token = None
+    parts = []
+    eval_count = eval_duration = 0
+    async for chunk in await ollama_async_client().chat(model="llama3", messages=messages, stream=True):
+        if first_token is None:
+            first_token = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN.observe(first_token - start)
+        parts.append(chunk["message"]["content"])
+        if chunk.get("done"):
+            eval_count = chunk.get("eval_count") or len(parts)
+            eval_duration = (chunk.get("eval_duration") or 0) / 1e9
+    # Prefer Ollama's own generation time; otherwise time the stream after the first token.
+    elapsed = eval_duration or (time.perf_counter() - first_token if first_token else 0)
+    if eval_count and elapsed > 0:
+        LLM_TOKENS_PER_SECOND.observe(eval_count / elapsed)
+    return "".join(parts)
+
+async def generate_answer(question: str, note_content: str, timeout: float = 60.0) -> str:
+    """Generate an answer from a note with llama3; raises asyncio.TimeoutError after `timeout` seconds."""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Notes:\n{note_content}\n\nQuestion: {question}"}
+    ]
+    with span("generate", model="llama3", prompt_chars=len(note_content) + len(question)):
+        try:
+            return await asyncio.wait_for(_stream_chat(messages), timeout=timeout)
+        except TimeoutError:
+            from .metrics import LLM_TIMEOUTS
+            LLM_TIMEOUTS.inc()
+            raise
 
 async def answer_question_simple(
     session: AsyncSession,
-    question: str
+    question: str,
+    note_id: Optional[uuid.UUID] = None,
+    timer: Optional[StageTimer] = None
 ) -> str:
-    """Answer a question by retrieving the most relevant note content."""
+    """Answer a question by retrieving the most relevant note content.
+
+    Pass `note_id` when the caller has already run the similarity search.
+    """
     try:
         # Find the most similar note
-        note_id = await find_most_similar_note(session, question)
+        if note_id is None:
+            note_id = await find_most_similar_note(session, question, timer=timer)
         
         # Get the note content
-        note_content = await get_note_content(session, note_id)
-        
-        # Generate answer using llama3.2
-        import os
-        import asyncio
-        ollama_host = os.getenv('OLLAMA_HOST', 'localhost')
-        client = ollama.Client(host=f"http://{ollama_host}:11434")
+        note_content = await get_note_content(session, note_id, timer=timer)
         
         try:
-            # Add timeout to prevent hanging
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    client.chat,
-                    model="llama3",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided study notes. Answer the question accurately using only the information from the notes."},
-                        {"role": "user", "content": f"Notes:\n{note_content}\n\nQuestion: {question}"}
-                    ]
-                ),
-                timeout=60.0
-            )
-            
-            return response["message"]["content"]
-        except asyncio.TimeoutError:
+            with timed(timer, "generate"):
+                return await generate_answer(question, note_content)
+        except TimeoutError:
             return f"Answer generation timed out. Here's the relevant note content:\n\n{note_content[:500]}..."
         except Exception as e:
             return f"Error generating answer: {str(e)}. Here's the relevant note content:\n\n{note_content[:500]}..."
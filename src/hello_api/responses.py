@@ -0,0 +1,33 @@
+from typing import Any, Dict, Iterable
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Row
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson response whose output matches Pydantic's JSON for the same data.
+
+    Used for rows read straight from the database, which are trusted and do not
+    need to be re-validated through a response model; UUIDs and datetimes are
+    serialized natively by orjson (UTC as "Z", like Pydantic).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z,
+        )
+
+
+def row_dict(row: Row) -> Dict[str, Any]:
+    return dict(row._mapping)
+
+
+def page_content(rows: Iterable[Row], total: int, limit: int, offset: int) -> Dict[str, Any]:
+    return {
+        "items": [dict(row._mapping) for row in rows],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
@@ -1,105 +1,193 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Query, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from fastapi.responses import StreamingResponse
 from uuid import UUID
-from typing import Optional
-
-from ..schemas import NoteIn, NoteOut, NoteListResponse
-from ..db import async_session
+from typing import Literal, Optional, Union
+
+from ..schemas import BulkImportResult, NoteIn, NoteOut, NoteListResponse, NoteProjectionListResponse
+from ..config import get_settings
+from ..db import async_session, get_engine, get_read_session, remember_write
+from ..embeddings import schedule_indexing
+from ..notes import crud
+from ..notes.etag import etag_in, http_date, note_etag, not_modified_since, page_etag, parse_note_etag
+from ..notes.bulk import import_notes
+from ..notes.export import export_ndjson
+from ..sharding import get_shard_router, move_note_on_shard, remove_note_from_shard
+from ..responses import FastJSONResponse, page_content, row_dict
 
 router = APIRouter()
 
+NOTE_FIELDS = ("id", "title", "body", "collection", "created_at", "updated_at")
+
 async def get_db():
     async with async_session() as session:
         yield session
 
+def set_validators(response: Response, note_id: UUID, updated_at) -> None:
+    response.headers["ETag"] = note_etag(note_id, updated_at)
+    response.headers["Last-Modified"] = http_date(updated_at)
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def list_etag(search: Optional[str], limit: int, offset: int, view: str, total: int, rows) -> str:
+    versions = [f"{row.id}@{row.updated_at.isoformat()}" for row in rows]
+    return page_etag(["notes", search or "", limit, offset, view, total, *versions])
+
+
 @router.put("", response_model=NoteOut)
-async def upsert_note(note: NoteIn, db: AsyncSession = Depends(get_db)):
-    if note.id:
-        query = text("SELECT * FROM notes WHERE id = :id")
-        result = await db.execute(query, {"id": str(note.id)})
-        existing = result.fetchone()
-
-        if not existing:
-            raise HTTPException(status_code=404, detail="Note not found")
-
-        update_query = text("""
-            UPDATE notes
-            SET title = :title, body = :body, updated_at = now()
-            WHERE id = :id
-            RETURNING *
-        """)
-        values = {"id": str(note.id), "title": note.title, "body": note.body}
-        result = await db.execute(update_query, values)
-        await db.commit()
-        row = result.fetchone()
-    else:
-        insert_query = text("""
-            INSERT INTO notes (title, body)
-            VALUES (:title, :body)
-            RETURNING *
-        """)
-        result = await db.execute(insert_query, {"title": note.title, "body": note.body})
-        await db.commit()
-        row = result.fetchone()
-
-    return NoteOut(**dict(row._mapping))
+async def upsert_note(
+    note: NoteIn,
+    if_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    expected_updated_at = note.expected_updated_at
+    if if_match and if_match.strip() != "*":
+        # If-Match carries the ETag the client last saw; it must name this note.
+        validator = parse_note_etag(if_match.split(",")[0])
+        if note.id is None or validator is None or validator[0] != note.id:
+            raise HTTPException(status_code=412, detail="If-Match does not match this note")
+        expected_updated_at = validator[1]
+
+    try:
+        row = await crud.upsert_note(db, note.id, note.title, note.body, expected_updated_at, note.collection)
+    except crud.NoteNotFound:
+        raise HTTPException(status_code=412 if if_match else 404, detail="Note not found")
+    except crud.NoteVersionConflict as e:
+        raise HTTPException(status_code=412 if if_match else 409, detail=str(e))
+    shards = get_shard_router()
+    if shards is not None and note.id is not None and note.collection is not None:
+        # The note's chunks live on its shard; keep them in the note's collection.
+        await move_note_on_shard(shards, row.id, row.collection)
+
+    result = FastJSONResponse(row_dict(row))
+    remember_write(result)
+    set_validators(result, row.id, row.updated_at)
+    return result
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_notes(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    batch_size: Optional[int] = Query(default=None, ge=1, le=100_000),
+    index: bool = False,
+):
+    """Import notes from an NDJSON body (one NoteIn per line) in batched transactions."""
+    settings = get_settings()
+    result, note_ids = await import_notes(
+        get_engine(),
+        request.stream(),
+        batch_size=batch_size or settings.bulk_import_batch_size,
+        max_line_bytes=settings.bulk_import_max_line_bytes,
+    )
+    if index and note_ids:
+        schedule_indexing(background_tasks, note_ids)
+        result.indexing_enqueued = len(note_ids)
+    if result.imported:
+        remember_write(response)
+    return result
 
 
 @router.delete("/{note_id}", status_code=204)
-async def delete_note(note_id: UUID, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        text("DELETE FROM notes WHERE id = :id RETURNING id"),
-        {"id": str(note_id)}
-    )
-    await db.commit()
-    if result.rowcount == 0:
+async def delete_note(note_id: UUID, response: Response, db: AsyncSession = Depends(get_db)):
+    try:
+        await crud.delete_note(db, note_id)
+    except crud.NoteNotFound:
         raise HTTPException(status_code=404, detail="Note not found")
+    shards = get_shard_router()
+    if shards is not None:
+        await remove_note_from_shard(shards, note_id)
+    remember_write(response)
+
+
+@router.get("/export")
+async def export_notes(
+    request: Request,
+    include_chunks: bool = False,
+    embedding_format: Literal["json", "base64"] = "json",
+    batch_size: int = Query(default=1000, ge=1, le=10_000),
+):
+    """Stream every note (and optionally its indexed chunks) as NDJSON."""
+    async def body():
+        async for session in get_read_session(request):
+            async for data in export_ndjson(session, include_chunks, embedding_format, batch_size):
+                yield data
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'},
+    )
 
 
 @router.get("/{note_id}", response_model=NoteOut)
-async def get_note(note_id: UUID, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        text("SELECT * FROM notes WHERE id = :id"),
-        {"id": str(note_id)}
-    )
-    row = result.fetchone()
-    if not row:
+async def get_note(
+    note_id: UUID,
+    if_none_match: Optional[str] = Header(default=None),
+    if_modified_since: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_read_session),
+):
+    try:
+        if if_none_match or if_modified_since:
+            # Revalidate against updated_at alone before reading the body.
+            updated_at = await crud.get_note_version(db, note_id)
+            etag = note_etag(note_id, updated_at)
+            # If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+            if if_none_match:
+                unchanged = etag_in(if_none_match, etag)
+            else:
+                unchanged = not_modified_since(if_modified_since, updated_at)
+            if unchanged:
+                not_modified = Response(status_code=304)
+                set_validators(not_modified, note_id, updated_at)
+                return not_modified
+        row = await crud.get_note(db, note_id)
+    except crud.NoteNotFound:
         raise HTTPException(status_code=404, detail="Note not found")
-    return NoteOut(**dict(row._mapping))
+    result = FastJSONResponse(row_dict(row))
+    set_validators(result, row.id, row.updated_at)
+    return result
 
 
-@router.get("", response_model=NoteListResponse)
+# Full notes by default; with fields= or summary=true, a projection of them.
+@router.get("", response_model=Union[NoteListResponse, NoteProjectionListResponse])
 async def list_notes(
     search: Optional[str] = None,
     limit: int = Query(default=20, ge=1),
     offset: int = Query(default=0, ge=0),
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[str] = Query(
+        default=None,
+        description=f"Comma-separated subset of {', '.join(NOTE_FIELDS)}; id and updated_at are always returned",
+    ),
+    summary: bool = Query(default=False, description="Return a bounded `excerpt` instead of the full body"),
+    excerpt_length: int = Query(default=200, ge=1, le=10_000),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_read_session)
 ):
-    base_query = "FROM notes WHERE 1=1"
-    params: dict[str, object] = {}
-
-    if search:
-        base_query += " AND (title ILIKE :search OR body ILIKE :search)"
-        params["search"] = f"%{search}%"
-
-    count_query = text(f"SELECT COUNT(*) {base_query}")
-    total = await db.execute(count_query, params)
-    total_count = total.scalar()
-
-    list_query = text(f"""
-        SELECT * {base_query}
-        ORDER BY updated_at DESC
-        LIMIT :limit OFFSET :offset
-    """)
-    params.update({"limit": limit, "offset": offset})
-    result = await db.execute(list_query, params)
-
-    items = [NoteOut(**dict(row._mapping)) for row in result.fetchall()]
-
-    return NoteListResponse(
-        items=items,
-        total=total_count or 0,
-        limit=limit,
-        offset=offset
+    requested = None
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(requested) - set(NOTE_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = crud.projection(requested, excerpt_length if summary else None)
+    view = ",".join(column.key for column in columns) + (f":{excerpt_length}" if summary else "")
+
+    total = None
+    if if_none_match:
+        total = await crud.count_notes(db, search)
+        versions = await crud.list_note_versions(db, search, limit, offset)
+        etag = list_etag(search, limit, offset, view, total, versions)
+        if etag_in(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    # Rows come straight from the database, so skip Pydantic and serialize them directly.
+    rows, total = await crud.list_notes(db, search, limit, offset, total=total, columns=columns)
+    return FastJSONResponse(
+        page_content(rows, total, limit, offset),
+        headers={
+            "ETag": list_etag(search, limit, offset, view, total, rows),
+            "Cache-Control": "private, no-cache",
+        },
     )
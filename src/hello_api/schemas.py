@@ -1,4 +1,4 @@
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel, Field, UUID4
 from typing import Optional, List
 from datetime import datetime
 
@@ -6,9 +6,17 @@ class NoteIn(BaseModel):
     id: Optional[UUID4] = None
     title: str
     body: str
+    # Collection to file the note under; new notes default to "default" and
+    # updates keep the current one. Bulk import treats a missing value as "default".
+    collection: Optional[str] = Field(default=None, min_length=1, max_length=64)
+    # Optimistic concurrency: only update if the note is still at this version
+    expected_updated_at: Optional[datetime] = None
 
-class NoteOut(NoteIn):
+class NoteOut(BaseModel):
     id: UUID4
+    title: str
+    body: str
+    collection: str
     created_at: datetime
     updated_at: datetime
 
@@ -17,3 +25,37 @@ class NoteListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+
+class NoteProjection(BaseModel):
+    """A list item from GET /notes?fields=... or ?summary=true.
+
+    id and updated_at are always present; the other fields only when selected.
+    """
+    id: UUID4
+    updated_at: datetime
+    title: Optional[str] = None
+    body: Optional[str] = None
+    collection: Optional[str] = None
+    created_at: Optional[datetime] = None
+    # First excerpt_length characters of the body, with summary=true
+    excerpt: Optional[str] = None
+
+class NoteProjectionListResponse(BaseModel):
+    items: List[NoteProjection]
+    total: int
+    limit: int
+    offset: int
+
+class BulkImportFailure(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    received: int
+    imported: int
+    failed: int
+    batches: int
+    elapsed_seconds: float
+    rows_per_second: float
+    indexing_enqueued: int = 0
+    failures: List[BulkImportFailure] = []
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# pgvector distance operators: L2, cosine, inner product.
+VECTOR_OPERATOR = re.compile(r"<->|<=>|<#>")
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS) "
+# Plans name the partitions (notes_index_p0, ...) of a partitioned notes_index.
+SEQ_SCAN = re.compile(r"Seq Scan on notes_index(_p\d+)?\b")
+# Index search settings a request changes before its vector query (see
+# embeddings.use_candidate_limit); a sampled EXPLAIN replays them so its plan
+# matches the one the request got.
+SET_CONFIG = re.compile(r"set_config\(\s*'((?:hnsw|ivfflat)\.\w+)'\s*,\s*('([^']*)')?", re.IGNORECASE)
+SET_STATEMENT = re.compile(r"^\s*SET\s+(?:LOCAL\s+)?((?:hnsw|ivfflat)\.\w+)\s*(?:=|TO)\s*'?([\w.]+)'?", re.IGNORECASE)
+
+
+def search_setting(statement: str, parameters: Any) -> Optional[tuple]:
+    """(name, value) when `statement` sets an hnsw.* or ivfflat.* option, else None."""
+    match = SET_STATEMENT.match(statement)
+    if match:
+        return match.group(1), match.group(2)
+    match = SET_CONFIG.search(statement)
+    if not match:
+        return None
+    if match.group(2):
+        return match.group(1), match.group(3)
+    # The value is the statement's only bound parameter.
+    values = list(parameters.values()) if isinstance(parameters, dict) else list(parameters or ())
+    return (match.group(1), str(values[0])) if values else None
+
+
+def parameters_shape(parameters: Any) -> Any:
+    """Types and sizes of bound parameters, never their values (vectors are huge, notes private)."""
+    if isinstance(parameters, dict):
+        return {key: parameters_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if len(parameters) > 20:
+            return f"{type(parameters).__name__}[{len(parameters)}]"
+        return [parameters_shape(value) for value in parameters]
+    if isinstance(parameters, (str, bytes)):
+        return f"{type(parameters).__name__}[{len(parameters)}]"
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """Recent slow statements and sampled EXPLAIN ANALYZE plans for vector searches.
+
+    Entries are kept per process; `snapshot` is served at /api/admin/slow-queries.
+    """
+
+    def __init__(self, threshold_ms: float, size: int, explain_sample_rate: float):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.plans: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.explaining: Set[asyncio.Task] = set()
+
+    def install(self, engine: AsyncEngine) -> None:
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_start = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, "_slow_query_start", None)
+            if start is None or statement.startswith(EXPLAIN_PREFIX):
+                return
+            duration_ms = (time.perf_counter() - start) * 1000
+            if self.threshold_ms and duration_ms >= self.threshold_ms:
+                self.record(statement, parameters, duration_ms, executemany)
+            if not self.explain_sample_rate:
+                return
+            setting = search_setting(statement, parameters)
+            if setting is not None:
+                conn.info.setdefault("search_settings", {})[setting[0]] = setting[1]
+            elif (not executemany and VECTOR_OPERATOR.search(statement)
+                    and random.random() < self.explain_sample_rate):
+                settings = dict(conn.info.get("search_settings", {}))
+                self.schedule_explain(engine, statement, parameters, duration_ms, settings)
+
+        @event.listens_for(sync_engine, "commit")
+        @event.listens_for(sync_engine, "rollback")
+        def end_transaction(conn):
+            # The settings are SET LOCAL / set_config(..., true): they end with the transaction.
+            conn.info.pop("search_settings", None)
+
+    def record(self, statement: str, parameters: Any, duration_ms: float, executemany: bool) -> None:
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "statement": statement,
+            "parameters": parameters_shape(parameters),
+            "executemany": executemany,
+            "pid": os.getpid(),
+        }
+        self.entries.append(entry)
+        logger.warning("Slow query (%.1fms): %s", duration_ms, " ".join(statement.split())[:500])
+
+    def schedule_explain(
+        self,
+        engine: AsyncEngine,
+        statement: str,
+        parameters: Any,
+        duration_ms: float,
+        settings: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Run EXPLAIN ANALYZE on a fresh connection after the request's statement, one at a time.
+
+        `settings` are the request's hnsw.* / ivfflat.* values, applied to the
+        EXPLAIN's transaction first.
+        """
+        if self.explaining or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.explain(engine, statement, parameters, duration_ms, settings or {}))
+        self.explaining.add(task)
+        task.add_done_callback(self.explaining.discard)
+
+    async def explain(
+        self,
+        engine: AsyncEngine,
+        statement: str,
+        parameters: Any,
+        duration_ms: float,
+        settings: Dict[str, str],
+    ) -> None:
+        try:
+            async with engine.connect() as conn:
+                for name, value in settings.items():
+                    await conn.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": value})
+                result = await conn.exec_driver_sql(EXPLAIN_PREFIX + statement, parameters)
+                plan = "\n".join(row[0] for row in result)
+        except Exception as e:
+            # The message can echo bound values; keep only its first line.
+            logger.warning("EXPLAIN failed for sampled vector query: %s", str(e).splitlines()[0])
+            return
+        self.plans.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "statement": statement,
+            "parameters": parameters_shape(parameters),
+            "settings": settings,
+            # The index is being skipped if the planner reads notes_index sequentially.
+            "seq_scan": SEQ_SCAN.search(plan) is not None,
+            "plan": plan,
+            "pid": os.getpid(),
+        })
+
+    def snapshot(self, limit: int = 50) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "explain_sample_rate": self.explain_sample_rate,
+            "entries": list(self.entries)[-limit:][::-1],
+            "plans": list(self.plans)[-limit:][::-1],
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.plans.clear()
+
+
+@lru_cache
+def get_slow_query_log() -> SlowQueryLog:
+    settings = get_settings()
+    return SlowQueryLog(
+        settings.slow_query_threshold_ms,
+        settings.slow_query_log_size,
+        settings.slow_query_explain_sample_rate,
+    )
@@ -0,0 +1,137 @@
+import re
+from typing import Callable, List, Optional, Tuple
+
+
+class RecursiveCharacterTextSplitter:
+    """Dependency-free port of langchain's RecursiveCharacterTextSplitter.
+
+    Produces the same chunks as the langchain implementation for the options
+    used by this service (separators kept at the start of each split, whitespace
+    stripped), without pulling langchain into the import path of the API.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        length_function: Callable[[str], int] = len,
+        separators: Optional[List[str]] = None,
+        keep_separator: bool = True,
+        strip_whitespace: bool = True,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+                f"({chunk_size}), should be smaller."
+            )
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._length_function = length_function
+        self._separators = separators or ["\n\n", "\n", " ", ""]
+        self._keep_separator = keep_separator
+        self._strip_whitespace = strip_whitespace
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for chunk, _ in self._split_text(text, self._separators, 0)]
+
+    def split_text_with_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character offsets of each chunk of split_text, so `text[start:end]` is the chunk.
+
+        Offsets are tracked through the split and merge itself, so repeated or
+        overlapping chunks (one a prefix of the next) map to the right place.
+        """
+        if not self._keep_separator:
+            raise ValueError("Chunks are only substrings of the text with keep_separator=True")
+        return [(start, start + len(chunk)) for chunk, start in self._split_text(text, self._separators, 0)]
+
+    def _split_text(self, text: str, separators: List[str], base: int) -> List[Tuple[str, int]]:
+        """(chunk, offset of the chunk in the original text); `text` starts at `base` there.
+
+        The offsets are only meaningful with keep_separator, where every split
+        and merged chunk is a contiguous run of the text.
+        """
+        final_chunks = []
+        separator = separators[-1]
+        new_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if re.search(re.escape(candidate), text):
+                separator = candidate
+                new_separators = separators[i + 1:]
+                break
+
+        splits = _split_text_with_regex(text, re.escape(separator), self._keep_separator)
+
+        good_splits = []
+        merge_separator = "" if self._keep_separator else separator
+        position = base
+        for split in splits:
+            split_start = position
+            position += len(split)
+            if self._length_function(split) < self._chunk_size:
+                good_splits.append((split, split_start))
+                continue
+            if good_splits:
+                final_chunks.extend(self._merge_splits(good_splits, merge_separator))
+                good_splits = []
+            if not new_separators:
+                final_chunks.append((split, split_start))
+            else:
+                final_chunks.extend(self._split_text(split, new_separators, split_start))
+        if good_splits:
+            final_chunks.extend(self._merge_splits(good_splits, merge_separator))
+        return final_chunks
+
+    def _join_docs(self, docs: List[Tuple[str, int]], separator: str) -> Optional[Tuple[str, int]]:
+        text = separator.join(doc for doc, _ in docs)
+        start = docs[0][1]
+        if self._strip_whitespace:
+            stripped = text.lstrip()
+            start += len(text) - len(stripped)
+            text = stripped.rstrip()
+        return (text, start) if text else None
+
+    def _merge_splits(self, splits: List[Tuple[str, int]], separator: str) -> List[Tuple[str, int]]:
+        separator_len = self._length_function(separator)
+        docs = []
+        current_doc: List[Tuple[str, int]] = []
+        total = 0
+        for split in splits:
+            split_len = self._length_function(split[0])
+            if total + split_len + (separator_len if current_doc else 0) > self._chunk_size:
+                if current_doc:
+                    doc = self._join_docs(current_doc, separator)
+                    if doc is not None:
+                        docs.append(doc)
+                    # Pop from the front until the carried-over overlap fits.
+                    while total > self._chunk_overlap or (
+                        total + split_len + (separator_len if current_doc else 0) > self._chunk_size
+                        and total > 0
+                    ):
+                        total -= self._length_function(current_doc[0][0]) + (
+                            separator_len if len(current_doc) > 1 else 0
+                        )
+                        current_doc = current_doc[1:]
+            current_doc.append(split)
+            total += split_len + (separator_len if len(current_doc) > 1 else 0)
+        doc = self._join_docs(current_doc, separator)
+        if doc is not None:
+            docs.append(doc)
+        return docs
+
+
+def _split_text_with_regex(text: str, separator: str, keep_separator: bool) -> List[str]:
+    if separator:
+        if keep_separator:
+            parts = re.split(f"({separator})", text)
+            splits = [parts[i] + parts[i + 1] for i in range(1, len(parts) - 1, 2)]
+            if len(parts) % 2 == 0:
+                splits += parts[-1:]
+            splits = [parts[0]] + splits
+        else:
+            splits = re.split(separator, text)
+    else:
+        splits = list(text)
+    return [s for s in splits if s != ""]
@@ -0,0 +1,68 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Wall-clock time per request stage, reported as a Server-Timing header.
+
+    Stages entered more than once (e.g. two searches) accumulate.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage plus the total, rounded for JSON."""
+        timings = {name: round(ms, 2) for name, ms in self.stages.items()}
+        timings["total"] = round(self.total_ms(), 2)
+        return timings
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={ms:.2f}" for name, ms in self.as_dict().items())
+
+    def log_if_slow(self, label: str, threshold_ms: float) -> None:
+        total = self.total_ms()
+        if threshold_ms and total >= threshold_ms:
+            breakdown = " ".join(f"{name}={ms:.1f}ms" for name, ms in self.stages.items())
+            logger.warning("Slow request %s: %.1fms (%s)", label, total, breakdown)
+
+
+@contextmanager
+def timed(timer: Optional[StageTimer], name: str) -> Iterator[None]:
+    """`timer.stage(name)`, or nothing when the caller is not timing."""
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linearly interpolated percentile of an unsorted list, 0.0 when empty.
+
+    Same as statistics.quantiles(method="inclusive") and numpy.percentile's
+    default, so small samples are not biased towards the next larger value.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
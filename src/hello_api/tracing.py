@@ -0,0 +1,309 @@
+import atexit
+import importlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+
+# Minimal in-process tracing: spans for routes, SQL statements, embedding
+# batches and generations, exported one JSON object per span. The sampling
+# decision is made once per trace (or taken from an incoming W3C `traceparent`
+# header), so unsampled requests only pay for a context-variable lookup.
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+_current: ContextVar[Optional[SpanContext]] = ContextVar("hello_api_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+def parse_traceparent(header: str) -> Optional[SpanContext]:
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], sampled)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "context", "parent_id", "start_ns", "attributes", "status")
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        end_ns = time.time_ns()
+        self.tracer.exporter.export({
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+        })
+
+
+class JsonlFileExporter:
+    """Appends finished spans as JSON lines; works offline and across workers.
+
+    Several worker processes can share one file: it is opened with O_APPEND
+    and each batch goes out in a single os.write, so batches from different
+    processes never interleave mid-line.
+
+    `export` only queues the span, so request handlers never touch the file: a
+    background thread writes the queue every `flush_interval` seconds, or as
+    soon as `max_batch` spans are waiting. Spans arriving while `max_queue`
+    are already waiting are dropped and counted. Whatever is queued at exit is
+    written by `shutdown`.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_batch: int = 512, max_queue: int = 10_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.queue: Deque[Dict[str, Any]] = deque()
+        self.condition = threading.Condition()
+        # Serializes writes, so batches reach the file in export order.
+        self.write_lock = threading.Lock()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self.thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span: Dict[str, Any]) -> None:
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self.queue.append(span)
+            if len(self.queue) >= self.max_batch:
+                self.condition.notify()
+
+    def flush(self) -> None:
+        """Write every queued span now, from the calling thread."""
+        with self.write_lock:
+            with self.condition:
+                batch, self.queue = self.queue, deque()
+            if batch:
+                data = "".join(json.dumps(span, default=str) + "\n" for span in batch).encode()
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    # Regular files take the whole buffer; the loop only covers
+                    # a short write on a full disk or an interrupted call.
+                    while data:
+                        data = data[os.write(fd, data):]
+                finally:
+                    os.close(fd)
+
+    def shutdown(self) -> None:
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                if not self.stopping and len(self.queue) < self.max_batch:
+                    self.condition.wait(self.flush_interval)
+                stopping = self.stopping
+            self.flush()
+            if stopping:
+                return
+
+
+class ConsoleExporter:
+    def export(self, span: Dict[str, Any]) -> None:
+        print(json.dumps(span, default=str))
+
+
+def load_exporter(name: str, path: str, flush_interval: float = 1.0):
+    """"jsonl", "console", or "package.module:factory" for a custom exporter.
+
+    A custom factory is called with no arguments and must return an object
+    with an `export(span_dict)` method.
+    """
+    if name == "jsonl":
+        return JsonlFileExporter(path, flush_interval)
+    if name == "console":
+        return ConsoleExporter()
+    module, _, factory = name.partition(":")
+    return getattr(importlib.import_module(module), factory)()
+
+
+class Tracer:
+    def __init__(self, enabled: bool, sample_rate: float, exporter):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def _context_for(self, parent: Optional[SpanContext]) -> SpanContext:
+        """Context for a new span; the sampling decision is made at the root and inherited."""
+        if parent is None:
+            return SpanContext(_new_id(16), _new_id(8), random.random() < self.sample_rate)
+        if not parent.sampled:
+            return parent
+        return SpanContext(parent.trace_id, _new_id(8), True)
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, **attributes) -> Optional[Span]:
+        """A span under `parent` (default: the current span), or None when not sampled.
+
+        The span does not become current; use `span()` for that.
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current.get()
+        context = self._context_for(parent)
+        if not context.sampled:
+            return None
+        return Span(self, name, context, parent.span_id if parent else None, attributes)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[SpanContext] = None, **attributes) -> Iterator[Optional[Span]]:
+        if not self.enabled:
+            yield None
+            return
+        parent = parent or _current.get()
+        context = self._context_for(parent)
+        # Unsampled contexts are made current too, so nested spans skip cheaply.
+        token = _current.set(context)
+        try:
+            if not context.sampled:
+                yield None
+                return
+            span = Span(self, name, context, parent.span_id if parent else None, attributes)
+            try:
+                yield span
+            except BaseException as e:
+                span.end(e)
+                raise
+            span.end()
+        finally:
+            _current.reset(token)
+
+
+@lru_cache
+def get_tracer() -> Tracer:
+    settings = get_settings()
+    exporter = None
+    if settings.tracing_enabled:
+        exporter = load_exporter(settings.tracing_exporter, settings.tracing_jsonl_path, settings.tracing_flush_interval)
+    return Tracer(settings.tracing_enabled, settings.tracing_sample_rate, exporter)
+
+
+def span(name: str, parent: Optional[SpanContext] = None, **attributes):
+    """Shorthand for `get_tracer().span(...)`."""
+    return get_tracer().span(name, parent, **attributes)
+
+
+def current_context() -> Optional[SpanContext]:
+    """The active span context, to hand to work that outlives the request (background tasks)."""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = get_tracer().start_span("sql", statement=statement[:500], executemany=executemany)
+    if span is not None:
+        context._trace_span = span
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        span.set_attribute("rowcount", cursor.rowcount)
+        span.end()
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    span = getattr(context, "_trace_span", None) if context is not None else None
+    if span is not None:
+        span.end(exception_context.original_exception)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Trace every statement run on `engine` (the sync_engine of an AsyncEngine)."""
+    if not get_tracer().enabled:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class TracingMiddleware:
+    """Root span per HTTP request, continuing an incoming `traceparent` if present."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.tracer = get_tracer()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = Headers(scope=scope).get("traceparent")
+        parent = parse_traceparent(traceparent) if traceparent else None
+        with self.tracer.span("http", parent, method=scope["method"], path=scope["path"]) as span:
+            if span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("status", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                span.set_attribute("route", getattr(route, "path_format", None) or "unmatched")
+                span.name = f"{scope['method']} {span.attributes['route']}"
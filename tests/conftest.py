@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# Scripts such as benchmark.py and evaluate.py live at the top level.
+sys.path.insert(1, ROOT)
+
+# Settings require database coordinates; the tests never connect with them.
+for key, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USERNAME": "postgres",
+    "DB_PASSWORD": "postgres",
+    "DB_DATABASE": "notes_db",
+    "LOOP_MONITOR_ENABLED": "false",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def settings():
+    """The cached Settings, with any attribute a test changes restored afterwards."""
+    from hello_api.config import get_settings
+    current = get_settings()
+    saved = current.model_dump()
+    yield current
+    for name, value in saved.items():
+        setattr(current, name, value)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A SQLite database with the app's tables, served wherever the app opens a session."""
+    import asyncio
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from hello_api import db
+    from hello_api.notes.models import metadata
+
+    # NullPool: each test event loop opens its own connections.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'notes.db'}", poolclass=NullPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    asyncio.run(create_tables())
+    sessionmaker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(db, "get_engine", lambda: engine)
+    monkeypatch.setattr(db, "get_sessionmaker", lambda: sessionmaker)
+    return sessionmaker
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from hello_api.api_client import APIClient
+from hello_api.notes.schema import NoteCreateUpdate
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+
+
+def make_client(handler, **options) -> APIClient:
+    client = APIClient(base_url="http://test", backoff=0, **options)
+    client.client = httpx.AsyncClient(base_url="http://test", transport=httpx.MockTransport(handler))
+    return client
+
+
+def note_json(note_id, title="t"):
+    return {"id": str(note_id), "title": title, "body": "b", "created_at": NOW, "updated_at": NOW}
+
+
+@pytest.mark.anyio
+async def test_idempotent_calls_retry_and_creates_do_not():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json=note_json(uuid.uuid4()))
+
+    async with make_client(handler) as client:
+        await client.upsert_note(NoteCreateUpdate(id=uuid.uuid4(), title="t", body="b"))
+        assert calls == ["PUT", "PUT"]
+
+        calls.clear()
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.upsert_note(NoteCreateUpdate(title="t", body="b"))
+        assert calls == ["PUT"]
+
+
+@pytest.mark.anyio
+async def test_retried_delete_treats_404_as_done():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.method)
+        if len(attempts) == 1:
+            # The server deleted the note but the response was lost.
+            raise httpx.ReadError("connection reset", request=request)
+        return httpx.Response(404)
+
+    async with make_client(handler) as client:
+        await client.delete_note(uuid.uuid4())
+    assert attempts == ["DELETE", "DELETE"]
+
+
+@pytest.mark.anyio
+async def test_first_attempt_404_and_404_after_503_still_raise():
+    responses = []
+
+    def handler(request):
+        return responses.pop(0)
+
+    async with make_client(handler) as client:
+        responses[:] = [httpx.Response(404)]
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.delete_note(uuid.uuid4())
+        # 503 means the request was not applied, so the 404 is real.
+        responses[:] = [httpx.Response(503), httpx.Response(404)]
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.delete_note(uuid.uuid4())
+
+
+@pytest.mark.anyio
+async def test_upsert_many_bounds_requests_and_pulls_notes_lazily():
+    in_flight = peak = pulled = answered = 0
+    sent = []
+
+    async def handler(request):
+        nonlocal in_flight, peak, answered
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        answered += 1
+        return httpx.Response(200, json=note_json(json.loads(request.content)["id"]))
+
+    def notes():
+        nonlocal pulled
+        for _ in range(40):
+            # At most one note waits for a slot beyond the four in flight.
+            assert pulled - answered <= 4
+            pulled += 1
+            note = NoteCreateUpdate(id=uuid.uuid4(), title="t", body="b")
+            sent.append(note.id)
+            yield note
+
+    async with make_client(handler) as client:
+        results = await client.upsert_many(notes(), concurrency=4)
+    assert peak == 4
+    assert [note.id for note in results] == sent
+
+
+@pytest.mark.anyio
+async def test_upsert_many_rejects_zero_concurrency():
+    async with make_client(lambda request: httpx.Response(500)) as client:
+        with pytest.raises(ValueError):
+            await client.upsert_many([], concurrency=0)
+
+
+@pytest.mark.anyio
+async def test_iter_notes_walks_every_page():
+    ids = [uuid.uuid4() for _ in range(5)]
+
+    def handler(request):
+        offset, limit = int(request.url.params["offset"]), int(request.url.params["limit"])
+        page = [note_json(note_id) for note_id in ids[offset:offset + limit]]
+        return httpx.Response(200, json={"items": page, "total": len(ids), "limit": limit, "offset": offset})
+
+    async with make_client(handler) as client:
+        seen = [note.id async for note in client.iter_notes(page_size=2)]
+    assert seen == ids
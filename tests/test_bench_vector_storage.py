@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+import pytest
+
+import bench_vector_storage
+
+
+class SizeSession:
+    """Answers relation_sizes' two queries: per-index sizes, then the table size."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(" ".join(str(statement).split()))
+        if len(self.statements) == 1:
+            return [SimpleNamespace(indexname="notes_index_embedding_halfvec_idx", bytes=4096)]
+        return SimpleNamespace(scalar=lambda: 65536)
+
+
+@pytest.mark.anyio
+async def test_sizes_are_summed_over_partitions():
+    session = SizeSession()
+    sizes = await bench_vector_storage.relation_sizes(session)
+    assert sizes == {"table": 65536, "full": None, "halfvec": 4096, "binary": None}
+    assert all("pg_partition_tree" in statement for statement in session.statements)
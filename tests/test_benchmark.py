@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+import benchmark
+
+METRICS = """\
+# HELP hello_api_indexing_backlog Notes queued for background indexing and not yet indexed
+# TYPE hello_api_indexing_backlog gauge
+hello_api_indexing_backlog{pid="11"} 3.0
+hello_api_indexing_backlog{pid="12"} 2.0
+hello_api_indexing_backlog_other 9.0
+"""
+
+
+@pytest.fixture
+def load_test(monkeypatch):
+    monkeypatch.setattr(benchmark, "load_questions", lambda: ["What is a reactor?"])
+    return benchmark.LoadTest("http://test", {"get": 1}, body_words=5, seed=0, index_timeout=5.0)
+
+
+def test_indexing_backlog_sums_worker_series():
+    assert benchmark.indexing_backlog(METRICS) == 5.0
+    assert benchmark.indexing_backlog("hello_api_indexing_backlog 0.0\n") == 0.0
+
+
+@pytest.mark.anyio
+async def test_seed_waits_until_the_backlog_drains(load_test, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    backlog = [3, 1, 0]
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/notes/bulk":
+            return httpx.Response(200, json={"imported": 3})
+        return httpx.Response(200, text=f"hello_api_indexing_backlog {backlog.pop(0)}.0\n")
+
+    async with httpx.AsyncClient(base_url="http://test", transport=httpx.MockTransport(handler)) as client:
+        await load_test.seed(client, 3)
+    assert requests == ["/notes/bulk", "/metrics", "/metrics", "/metrics"]
+
+
+@pytest.mark.anyio
+async def test_wait_for_indexing_gives_up_after_timeout(load_test, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    load_test.index_timeout = 0.0
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text="hello_api_indexing_backlog 4.0\n"))
+    async with httpx.AsyncClient(base_url="http://test", transport=transport) as client:
+        with pytest.raises(RuntimeError, match="4 notes"):
+            await load_test.wait_for_indexing(client)
+
+
+@pytest.mark.anyio
+async def test_get_without_ids_is_reported_as_list(load_test):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return httpx.Response(200, json={})
+
+    async with httpx.AsyncClient(base_url="http://test", transport=httpx.MockTransport(handler)) as client:
+        await load_test.worker(client, float("inf"), [3])
+        load_test.note_ids = ["a"]
+        await load_test.worker(client, float("inf"), [2])
+    assert paths == ["/notes"] * 3 + ["/notes/a"] * 2
+    report = load_test.report(concurrency=1, elapsed=1.0)
+    assert report["scenarios"]["list"]["requests"] == 3
+    assert report["scenarios"]["get"]["requests"] == 2
+
+
+async def _no_sleep(delay):
+    pass
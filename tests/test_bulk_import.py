@@ -0,0 +1,160 @@
+import json
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from hello_api.notes import bulk
+from hello_api.schemas import NoteIn
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(lines):
+    return [item async for item in lines]
+
+
+@pytest.mark.anyio
+async def test_lines_are_reassembled_across_chunks():
+    lines = await collect(bulk.iter_ndjson_lines(stream(b'{"a":', b'1}\n{"b"', b':2}\n{"c":3}'), 100))
+    assert lines == [(1, b'{"a":1}'), (2, b'{"b":2}'), (3, b'{"c":3}')]
+
+
+@pytest.mark.anyio
+async def test_oversized_lines_are_skipped_without_buffering():
+    long_line = b"x" * 50
+    lines = await collect(bulk.iter_ndjson_lines(stream(b"ok\n", long_line[:30], long_line[30:] + b"\nnext\n"), 20))
+    assert lines == [(1, b"ok"), (2, None), (3, b"next")]
+
+
+def ndjson(*records) -> bytes:
+    return b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+
+@pytest.mark.anyio
+async def test_import_batches_valid_lines_and_reports_invalid_ones(monkeypatch):
+    batches = []
+
+    async def write_batch(engine, batch):
+        batches.append([note.title for _, note in batch])
+        return [note.id or uuid.uuid4() for _, note in batch]
+
+    monkeypatch.setattr(bulk, "write_batch", write_batch)
+    existing = uuid.uuid4()
+    body = ndjson(
+        {"title": "a", "body": "1"},
+        {"title": "b"},
+        {"id": str(existing), "title": "c", "body": "3"},
+        {"title": "d", "body": "4"},
+    ) + b"\n"
+    result, ids = await bulk.import_notes(None, stream(body), batch_size=2, max_line_bytes=1000)
+
+    assert batches == [["a", "c"], ["d"]]
+    assert (result.received, result.imported, result.failed, result.batches) == (4, 3, 1, 2)
+    assert result.failures[0].line == 2
+    assert existing in ids and len(ids) == 3
+
+
+@pytest.mark.anyio
+async def test_failed_batch_marks_each_of_its_lines(monkeypatch):
+    async def write_batch(engine, batch):
+        raise RuntimeError("duplicate key")
+
+    monkeypatch.setattr(bulk, "write_batch", write_batch)
+    body = ndjson({"title": "a", "body": "1"}, {"title": "b", "body": "2"})
+    result, ids = await bulk.import_notes(None, stream(body), batch_size=10, max_line_bytes=1000)
+    assert ids == []
+    assert result.imported == 0 and result.failed == 2
+    assert [failure.line for failure in result.failures] == [1, 2]
+    assert "rolled back" in result.failures[0].error
+
+
+class FakeDriverConnection:
+    """Records the asyncpg calls write_batch makes; upserted ids come back as updated rows."""
+
+    def __init__(self):
+        self.calls = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.calls.append(("copy", [record[3] for record in records]))
+
+    async def fetch(self, sql, ids, titles, bodies, collections):
+        self.calls.append((sql, collections))
+        return [{"id": note_id, "collection": c, "updated": True} for note_id, c in zip(ids, collections)]
+
+    async def execute(self, sql, ids, titles, bodies, collections):
+        self.calls.append((sql, collections))
+
+
+class FakeEngine:
+    def __init__(self):
+        self.driver_conn = FakeDriverConnection()
+
+    @asynccontextmanager
+    async def connect(self):
+        yield SimpleNamespace(get_raw_connection=self.raw_connection)
+
+    async def raw_connection(self):
+        return SimpleNamespace(driver_connection=self.driver_conn)
+
+
+@pytest.mark.anyio
+async def test_notes_without_a_collection_keep_theirs(monkeypatch):
+    moved = []
+
+    async def move_to_collections(engine, updated):
+        moved.extend(updated)
+
+    monkeypatch.setattr(bulk, "move_to_collections", move_to_collections)
+    engine = FakeEngine()
+    kept, renamed = uuid.uuid4(), uuid.uuid4()
+    batch = [
+        (1, NoteIn(title="new", body="1")),
+        (2, NoteIn(id=kept, title="kept", body="2")),
+        (3, NoteIn(id=renamed, title="renamed", body="3", collection="work")),
+    ]
+    ids = await bulk.write_batch(engine, batch)
+
+    calls = engine.driver_conn.calls
+    assert calls[0] == ("copy", ["default"])
+    assert calls[1] == (bulk.UPSERT_SQL, ["work"])
+    # Only inserted rows get the default; ON CONFLICT leaves the collection alone.
+    assert calls[2] == (bulk.UPSERT_KEEP_COLLECTION_SQL, ["default"])
+    assert "collection = EXCLUDED.collection" not in bulk.UPSERT_KEEP_COLLECTION_SQL
+    assert moved == [(renamed, "work")]
+    assert ids[1:] == [kept, renamed]
+
+
+@pytest.mark.anyio
+async def test_moved_notes_take_their_chunks_and_centroid_along(database):
+    from hello_api import db
+    from hello_api.notes.models import note_centroids, notes, notes_index
+
+    note_id, other = uuid.uuid4(), uuid.uuid4()
+    async with database() as session:
+        for each in (note_id, other):
+            await session.execute(notes.insert().values(id=each, title="t", body="b", collection="work"))
+            await session.execute(notes_index.insert().values(
+                id=uuid.uuid4(), note_id=each, chunk_index=0, collection="default", embedding=[0.0] * 384,
+            ))
+            await session.execute(note_centroids.insert().values(
+                note_id=each, collection="default", embedding=[0.0] * 384, chunk_count=1,
+            ))
+        await session.commit()
+
+    await bulk.move_to_collections(db.get_engine(), [(note_id, "work")])
+
+    async with database() as session:
+        chunks = dict((await session.execute(select(notes_index.c.note_id, notes_index.c.collection))).all())
+        centroids = dict((await session.execute(select(note_centroids.c.note_id, note_centroids.c.collection))).all())
+    assert chunks == {note_id: "work", other: "default"}
+    assert centroids == {note_id: "work", other: "default"}
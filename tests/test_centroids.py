@@ -0,0 +1,48 @@
+import uuid
+
+import pytest
+
+from hello_api.embeddings import candidate_query, rank_similar_notes, refresh_note_centroids
+
+from test_embeddings import RecordingSession
+
+
+@pytest.mark.anyio
+async def test_note_candidates_switch_to_centroid_prefilter(settings):
+    settings.embedding_storage = "binary"
+    session = RecordingSession()
+    await rank_similar_notes(session, [0.5] * 384, k=5, note_candidates=25)
+    (_, ef), (query, params) = session.executed
+    assert ef == {"ef": "40"}
+    assert "WHERE note_id IN ( SELECT note_id FROM note_centroids ORDER BY embedding <=> CAST(:vector AS vector) LIMIT :candidates )" in query
+    # Chunks of the candidate notes are scored exactly; storage is unused.
+    assert "binary_quantize" not in query
+    assert params["candidates"] == 25
+
+
+@pytest.mark.anyio
+async def test_note_candidates_default_from_settings(settings):
+    settings.embedding_note_candidates = 60
+    session = RecordingSession()
+    await rank_similar_notes(session, [0.5] * 384)
+    assert session.executed[1][1]["candidates"] == 60
+    assert session.executed[0][1] == {"ef": "60"}
+
+
+def test_collection_scopes_chunks_and_centroids():
+    query = candidate_query("centroid", "work")
+    assert "FROM (SELECT * FROM notes_index WHERE collection = :collection) AS notes_index" in query
+    assert "FROM (SELECT * FROM note_centroids WHERE collection = :collection) AS note_centroids" in query
+
+
+@pytest.mark.anyio
+async def test_refresh_one_note_or_all():
+    session = RecordingSession()
+    note_id = uuid.uuid4()
+    await refresh_note_centroids(session, note_id)
+    await refresh_note_centroids(session)
+    (one, one_params), (every, every_params) = session.executed
+    assert "l2_normalize(AVG(notes_index.embedding))" in one
+    assert "WHERE notes_index.note_id = :note_id" in one and one_params == {"note_id": note_id}
+    assert "WHERE" not in every and every_params is None
+    assert "ON CONFLICT (note_id) DO UPDATE" in every
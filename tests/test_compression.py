@@ -0,0 +1,94 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+import zstandard
+
+from hello_api.compression import CompressionMiddleware, negotiate
+
+DECODERS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+def test_negotiate_honours_q_values_and_preference():
+    available = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br, zstd", available) == "zstd"
+    assert negotiate("gzip;q=1.0, br;q=0.5", available) == "gzip"
+    assert negotiate("br;q=0, *;q=0.1", available) == "zstd"
+    assert negotiate("identity", available) is None
+    assert negotiate("", available) is None
+    assert negotiate("zstd, gzip", ["gzip"]) == "gzip"
+
+
+def app_sending(chunks, content_type="application/json", headers=()):
+    async def app(scope, receive, send):
+        raw = [(b"content-type", content_type.encode()), *headers]
+        if len(chunks) == 1:
+            raw.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": raw})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+    return app
+
+
+async def call(app, accept_encoding):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    await CompressionMiddleware(app)(scope, receive, send)
+    headers = {name.decode().lower(): value.decode() for name, value in messages[0]["headers"]}
+    return headers, [message["body"] for message in messages[1:]]
+
+
+BODY = b'{"items": [' + b",".join(b'{"title": "note %d"}' % i for i in range(200)) + b"]}"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+async def test_complete_response_is_compressed(encoding):
+    headers, bodies = await call(app_sending([BODY], headers=[(b"etag", b'"v1"')]), encoding)
+    assert headers["content-encoding"] == encoding
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["etag"] == 'W/"v1"'
+    assert headers["content-length"] == str(len(bodies[0]))
+    assert DECODERS[encoding](bodies[0]) == BODY
+
+
+@pytest.mark.anyio
+async def test_streamed_chunks_are_flushed_as_they_arrive():
+    lines = [b'{"n": %d}\n' % i for i in range(5)]
+    headers, bodies = await call(app_sending(lines, "application/x-ndjson"), "gzip")
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    decoder = zlib.decompressobj(31)
+    # Every chunk decodes on its own, so a client can parse lines before the stream ends.
+    assert [decoder.decompress(body) for body in bodies[:-1]] == lines[:-1]
+    assert decoder.decompress(bodies[-1]) + decoder.flush() == lines[-1]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunks, content_type", [
+    ([b"{}"], "application/json"),
+    ([BODY], "image/png"),
+    ([b"data: 1\n\n", b"data: 2\n\n"], "text/event-stream"),
+])
+async def test_small_or_incompressible_responses_pass_through(chunks, content_type):
+    headers, bodies = await call(app_sending(chunks, content_type), "gzip")
+    assert "content-encoding" not in headers
+    assert bodies == chunks
+
+
+@pytest.mark.anyio
+async def test_disabled_by_setting(settings):
+    settings.compression_enabled = False
+    headers, bodies = await call(app_sending([BODY]), "gzip")
+    assert "content-encoding" not in headers and bodies == [BODY]
@@ -0,0 +1,128 @@
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, select
+
+from hello_api.notes import crud
+from hello_api.notes.models import note_centroids, notes_index
+
+
+@contextmanager
+def count_statements(sessionmaker):
+    engine = sessionmaker.kw["bind"].sync_engine
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.mark.anyio
+async def test_create_and_update_are_one_statement_each(database):
+    async with database() as session:
+        with count_statements(database) as statements:
+            created = await crud.upsert_note(session, None, "title", "body")
+        assert len(statements) == 1 and statements[0].startswith("INSERT")
+        assert created.collection == "default"
+
+        with count_statements(database) as statements:
+            updated = await crud.upsert_note(session, created.id, "new title", "new body")
+        assert len(statements) == 1 and statements[0].startswith("UPDATE")
+        assert (updated.id, updated.title, updated.body) == (created.id, "new title", "new body")
+
+
+@pytest.mark.anyio
+async def test_update_without_collection_keeps_it(database):
+    async with database() as session:
+        created = await crud.create_note(session, "t", "b", collection="work")
+        updated = await crud.update_note(session, created.id, "t2", "b2")
+    assert updated.collection == "work"
+
+
+@pytest.mark.anyio
+async def test_delete_is_one_statement(database):
+    async with database() as session:
+        note = await crud.create_note(session, "t", "b")
+        with count_statements(database) as statements:
+            await crud.delete_note(session, note.id)
+        assert len(statements) == 1 and statements[0].startswith("DELETE")
+        with pytest.raises(crud.NoteNotFound):
+            await crud.get_note(session, note.id)
+
+
+@pytest.mark.anyio
+async def test_missing_note_raises_not_found(database):
+    async with database() as session:
+        with pytest.raises(crud.NoteNotFound):
+            await crud.update_note(session, uuid.uuid4(), "t", "b")
+        with pytest.raises(crud.NoteNotFound):
+            await crud.delete_note(session, uuid.uuid4())
+        with pytest.raises(crud.NoteNotFound):
+            await crud.update_note(session, uuid.uuid4(), "t", "b", expected_updated_at=datetime.now(timezone.utc))
+
+
+@pytest.mark.anyio
+async def test_stale_version_raises_conflict(database):
+    async with database() as session:
+        note = await crud.create_note(session, "t", "b")
+        stale = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        with pytest.raises(crud.NoteVersionConflict) as raised:
+            await crud.update_note(session, note.id, "t2", "b2", expected_updated_at=stale)
+        assert raised.value.expected_updated_at == stale
+        assert (await crud.get_note(session, note.id)).title == "t"
+
+
+async def add_index_rows(session, note_id, collection):
+    await session.execute(notes_index.insert().values(
+        id=uuid.uuid4(), note_id=note_id, chunk_index=0, collection=collection, embedding=[0.0] * 384,
+    ))
+    await session.execute(note_centroids.insert().values(
+        note_id=note_id, collection=collection, embedding=[0.0] * 384, chunk_count=1,
+    ))
+    await session.commit()
+
+
+async def index_collections(session, note_id):
+    chunks = await session.execute(select(notes_index.c.collection).where(notes_index.c.note_id == note_id))
+    centroids = await session.execute(select(note_centroids.c.collection).where(note_centroids.c.note_id == note_id))
+    return chunks.scalars().all(), centroids.scalars().all()
+
+
+@pytest.mark.anyio
+async def test_changing_collection_moves_chunks_and_centroid(database):
+    async with database() as session:
+        note = await crud.create_note(session, "t", "b")
+        other = await crud.create_note(session, "t", "b")
+        await add_index_rows(session, note.id, "default")
+        await add_index_rows(session, other.id, "default")
+
+        updated = await crud.update_note(session, note.id, "t", "b", collection="work")
+        assert updated.collection == "work"
+        assert await index_collections(session, note.id) == (["work"], ["work"])
+        assert await index_collections(session, other.id) == (["default"], ["default"])
+
+        await crud.update_note(session, note.id, "t2", "b2")
+        assert await index_collections(session, note.id) == (["work"], ["work"])
+
+
+@pytest.mark.anyio
+async def test_changing_collection_moves_the_shard_copy(database):
+    from hello_api.sharding import ShardRouter, move_note_on_shard
+
+    async with database() as session:
+        note = await crud.create_note(session, "t", "b")
+        # One shard, backed by the same test database: the copy is the note itself.
+        await add_index_rows(session, note.id, "default")
+    router = ShardRouter([SimpleNamespace(sessionmaker=database)], search_timeout=1, allow_partial=False)
+    await move_note_on_shard(router, note.id, "work")
+    async with database() as session:
+        assert (await crud.get_note(session, note.id)).collection == "work"
+        assert await index_collections(session, note.id) == (["work"], ["work"])
@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from hello_api.db import InstrumentedPool, engine_options, pool_status
+
+
+def test_engine_options_come_from_settings(settings):
+    settings.db_pool_size = 3
+    settings.db_max_overflow = 2
+    settings.db_statement_cache_size = 0
+    options = engine_options(settings)
+    assert options["poolclass"] is InstrumentedPool
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 2
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+    assert options["connect_args"]["server_settings"] == {"jit": "off"}
+
+
+@pytest.mark.anyio
+async def test_pool_records_waits_and_timeouts():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=InstrumentedPool, pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_status(engine)["checked_out"] == 1
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+        status = pool_status(engine)
+        assert status["checked_out"] == 0
+        assert status["waits"] == 2
+        assert status["timeouts"] == 1
+        assert status["wait_max_ms"] >= 40
+    finally:
+        await engine.dispose()
+
+
+def test_pool_endpoint_reports_primary_pool():
+    from hello_api.main import app
+    body = TestClient(app).get("/api/pool").json()
+    for field in ("size", "checked_out", "idle", "overflow", "max_overflow", "waits", "timeouts"):
+        assert field in body
+    assert body["replicas"] == []
@@ -0,0 +1,87 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from hello_api import embeddings
+from hello_api.embeddings import candidate_query, rank_similar_notes, use_candidate_limit
+
+
+class RecordingSession:
+    """Records statements and parameters; answers every query with `rows`."""
+
+    def __init__(self, rows=()):
+        self.executed = []
+        self.rows = list(rows)
+
+    async def execute(self, statement, parameters=None):
+        self.executed.append((" ".join(str(statement).split()), parameters))
+        return SimpleNamespace(fetchall=lambda: self.rows)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("candidates, ef", [(10, "40"), (200, "200"), (5000, "1000")])
+async def test_ef_search_follows_candidates_within_pgvector_limits(candidates, ef):
+    session = RecordingSession()
+    await use_candidate_limit(session, "halfvec", candidates)
+    assert session.executed == [("SELECT set_config('hnsw.ef_search', :ef, true)", {"ef": ef})]
+
+
+@pytest.mark.anyio
+async def test_exact_scan_leaves_ef_search_alone():
+    session = RecordingSession()
+    await use_candidate_limit(session, "full", 5000)
+    assert session.executed == []
+
+
+def test_compact_storage_queries_use_their_indexed_expressions():
+    assert "embedding::halfvec(384) <=> CAST(:vector AS halfvec(384))" in candidate_query("halfvec")
+    assert "binary_quantize(embedding)::bit(384) <~> binary_quantize(CAST(:vector AS vector))" in candidate_query("binary")
+    for storage in ("halfvec", "binary"):
+        assert candidate_query(storage).rstrip().endswith("LIMIT :candidates")
+    assert candidate_query("full") == "SELECT id, note_id, embedding FROM notes_index"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("storage", ["halfvec", "binary"])
+async def test_compact_storage_reranks_candidates_with_full_vectors(storage):
+    row = SimpleNamespace(note_id=uuid.uuid4(), chunk_count=2, avg_distance=0.1)
+    session = RecordingSession([row])
+    rows = await rank_similar_notes(session, [0.5] * 384, k=3, max_distance=0.8, storage=storage,
+                                    candidates=120, note_candidates=0)
+    assert rows == [row]
+    (_, ef), (query, params) = session.executed
+    assert ef == {"ef": "120"}
+    # Distances in the outer query use the full-precision column.
+    assert "AVG(embedding <=> CAST(:vector AS vector))" in query
+    assert params["candidates"] == 120 and params["k"] == 3 and params["max_distance"] == 0.8
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("storage", ["halfvec", "binary"])
+async def test_collection_searches_scan_the_collection_exactly(storage):
+    session = RecordingSession()
+    await rank_similar_notes(session, [0.5] * 384, storage=storage, candidates=120, note_candidates=0,
+                             collection="work")
+    ((query, params),) = session.executed
+    # The predicate sits inside the candidate scan, with no approximate LIMIT to cut it short.
+    assert "WITH candidates AS (SELECT id, note_id, embedding FROM (SELECT * FROM notes_index WHERE collection = :collection)" in query
+    assert "LIMIT :candidates" not in query and "halfvec" not in query and "binary_quantize" not in query
+    assert params["collection"] == "work" and "candidates" not in params
+
+
+@pytest.mark.anyio
+async def test_full_storage_has_no_candidate_limit(settings):
+    settings.embedding_note_candidates = 0
+    session = RecordingSession()
+    await rank_similar_notes(session, [0.5] * 384, storage="full")
+    ((query, params),) = session.executed
+    assert "candidates" not in params and "LIMIT :candidates" not in query
+
+
+@pytest.mark.anyio
+async def test_indexing_errors_are_logged(database, caplog):
+    async with database() as session:
+        await embeddings._index_note(session, uuid.uuid4())
+    assert "Error indexing note" in caplog.text
+    assert caplog.records[0].name == "hello_api.embeddings" and caplog.records[0].exc_info
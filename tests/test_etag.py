@@ -0,0 +1,151 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from hello_api.notes import crud
+from hello_api.notes.etag import etag_in, http_date, not_modified_since, note_etag, page_etag, parse_note_etag
+
+UPDATED_AT = datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc)
+
+
+def fake_row(note_id, updated_at=UPDATED_AT, **values):
+    values = {"id": note_id, "title": "t", "body": "b", "collection": "default",
+              "created_at": updated_at, "updated_at": updated_at, **values}
+    return SimpleNamespace(_mapping=values, **values)
+
+
+def test_note_etag_round_trips_with_microseconds():
+    note_id = uuid.uuid4()
+    etag = note_etag(note_id, UPDATED_AT)
+    assert etag.startswith('W/"')
+    assert parse_note_etag(etag) == (note_id, UPDATED_AT)
+    assert parse_note_etag(etag[2:]) == (note_id, UPDATED_AT)
+    assert parse_note_etag('"not-a-note"') is None
+
+
+def test_etag_in_uses_weak_comparison():
+    etag = page_etag(["notes", 1, 2])
+    assert etag.startswith('W/"')
+    assert etag_in(f'"other", {etag[2:]}', etag)
+    assert etag_in("*", etag)
+    assert not etag_in('"other"', etag)
+    assert not etag_in(None, etag)
+    assert page_etag(["notes", 1, 2]) != page_etag(["notes", 1, 3])
+
+
+def test_not_modified_since_has_second_precision():
+    assert not_modified_since(http_date(UPDATED_AT), UPDATED_AT)
+    assert not not_modified_since(http_date(UPDATED_AT - timedelta(seconds=1)), UPDATED_AT)
+    assert not not_modified_since("garbage", UPDATED_AT)
+
+
+@pytest.fixture
+def client(database):
+    from hello_api.main import app
+    return TestClient(app)
+
+
+def test_get_sets_validators_and_revalidates_without_reading_body(client, monkeypatch):
+    note_id = uuid.uuid4()
+
+    async def get_note(session, wanted):
+        return fake_row(wanted)
+
+    async def get_note_version(session, wanted):
+        return UPDATED_AT
+
+    monkeypatch.setattr(crud, "get_note", get_note)
+    monkeypatch.setattr(crud, "get_note_version", get_note_version)
+    response = client.get(f"/notes/{note_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag == note_etag(note_id, UPDATED_AT)
+    assert response.headers["Last-Modified"] == http_date(UPDATED_AT)
+
+    async def no_body_read(session, wanted):
+        raise AssertionError("body read on a 304")
+
+    monkeypatch.setattr(crud, "get_note", no_body_read)
+    assert client.get(f"/notes/{note_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/notes/{note_id}", headers={"If-Modified-Since": http_date(UPDATED_AT)}).status_code == 304
+
+    monkeypatch.setattr(crud, "get_note", get_note)
+    assert client.get(f"/notes/{note_id}", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_compressed_and_not_modified_responses_share_the_etag(client, monkeypatch):
+    note_id = uuid.uuid4()
+
+    async def get_note(session, wanted):
+        return fake_row(wanted, body="compressible " * 500)
+
+    async def get_note_version(session, wanted):
+        return UPDATED_AT
+
+    monkeypatch.setattr(crud, "get_note", get_note)
+    monkeypatch.setattr(crud, "get_note_version", get_note_version)
+    headers = {"Accept-Encoding": "gzip"}
+    compressed = client.get(f"/notes/{note_id}", headers=headers)
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    etag = compressed.headers["ETag"]
+    identity = client.get(f"/notes/{note_id}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers and identity.headers["ETag"] == etag
+
+    not_modified = client.get(f"/notes/{note_id}", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+
+def test_put_if_match_becomes_expected_version(client, monkeypatch):
+    note_id = uuid.uuid4()
+    seen = {}
+
+    async def upsert_note(session, wanted, title, body, expected_updated_at, collection):
+        seen["expected"] = expected_updated_at
+        return fake_row(wanted, title=title, body=body)
+
+    monkeypatch.setattr(crud, "upsert_note", upsert_note)
+    body = {"id": str(note_id), "title": "t", "body": "b"}
+    response = client.put("/notes", json=body, headers={"If-Match": note_etag(note_id, UPDATED_AT)})
+    assert response.status_code == 200
+    assert seen["expected"] == UPDATED_AT
+
+    other = note_etag(uuid.uuid4(), UPDATED_AT)
+    assert client.put("/notes", json=body, headers={"If-Match": other}).status_code == 412
+
+
+def test_put_if_match_conflict_is_412(client, monkeypatch):
+    async def upsert_note(session, note_id, *args):
+        raise crud.NoteVersionConflict(note_id, UPDATED_AT)
+
+    monkeypatch.setattr(crud, "upsert_note", upsert_note)
+    note_id = uuid.uuid4()
+    body = {"id": str(note_id), "title": "t", "body": "b"}
+    assert client.put("/notes", json=body, headers={"If-Match": note_etag(note_id, UPDATED_AT)}).status_code == 412
+    assert client.put("/notes", json=body).status_code == 409
+
+
+def test_list_revalidates_from_versions(client, monkeypatch):
+    rows = [fake_row(uuid.uuid4())]
+
+    async def count_notes(session, search):
+        return 1
+
+    async def list_note_versions(session, search, limit, offset):
+        return rows
+
+    async def list_notes(session, search, limit, offset, total=None, columns=None):
+        return rows, 1
+
+    monkeypatch.setattr(crud, "count_notes", count_notes)
+    monkeypatch.setattr(crud, "list_note_versions", list_note_versions)
+    monkeypatch.setattr(crud, "list_notes", list_notes)
+    first = client.get("/notes")
+    assert first.status_code == 200
+    assert client.get("/notes", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    rows[0] = fake_row(rows[0].id, UPDATED_AT + timedelta(microseconds=1))
+    assert client.get("/notes", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
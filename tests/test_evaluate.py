@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+import evaluate
+
+
+def test_config_key_names_only_the_knobs_that_were_set():
+    config = {"k": 5, "threshold": 0.8, "candidates": None, "storage": None, "note_candidates": None}
+    assert evaluate.config_key(config) == "k=5 threshold=0.8"
+    config.update(candidates=200, storage="halfvec", note_candidates=0)
+    assert evaluate.config_key(config) == "k=5 threshold=0.8 candidates=200 storage=halfvec notes=0"
+
+
+def test_probes_option_is_gone():
+    with pytest.raises(SystemExit):
+        evaluate.main(["--probes", "10"])
+
+
+@pytest.mark.anyio
+async def test_candidates_are_passed_to_the_ranking(database, monkeypatch):
+    from hello_api import embeddings
+    calls = []
+
+    async def rank_similar_notes(session, vector, k, threshold, storage, candidates=None, note_candidates=None):
+        calls.append((k, threshold, storage, candidates, note_candidates))
+        return [SimpleNamespace(note_id=1)]
+
+    monkeypatch.setattr(embeddings, "rank_similar_notes", rank_similar_notes)
+    evaluation = evaluate.Evaluation([{"question": "q", "expected_note": "Reactor"}], concurrency=1, generate=False)
+    evaluation.vectors["q"] = [0.0]
+    evaluation.embed_ms["q"] = 1.0
+    evaluation.titles = {1: "Reactor safety"}
+    run = await evaluation.run_config(5, 0.8, 200, "halfvec", None)
+    assert calls == [(5, 0.8, "halfvec", 200, None)]
+    assert run["config"]["candidates"] == 200
+    assert run["metrics"]["recall@1"] == 1.0
+
+
+@pytest.mark.parametrize("argv, expected", [([], "db.internal"), (["--db-host", "localhost"], "localhost")])
+def test_db_host_is_only_overridden_when_given(argv, expected, monkeypatch, tmp_path):
+    monkeypatch.setenv("DB_HOST", "db.internal")
+
+    async def evaluate_stub(args):
+        return {}
+
+    monkeypatch.setattr(evaluate, "evaluate", evaluate_stub)
+    assert evaluate.main(argv + ["--output", str(tmp_path / "report.yaml")]) == 0
+    assert evaluate.os.environ["DB_HOST"] == expected
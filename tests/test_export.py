@@ -0,0 +1,84 @@
+import base64
+import json
+import uuid
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from hello_api.notes.export import export_ndjson
+from hello_api.notes.models import notes, notes_index
+
+
+async def add_note(sessionmaker, title: str, body: str, chunks=()):
+    note_id = uuid.uuid4()
+    async with sessionmaker() as session:
+        await session.execute(notes.insert().values(id=note_id, title=title, body=body))
+        for index, (content, embedding) in enumerate(chunks):
+            await session.execute(notes_index.insert().values(
+                id=uuid.uuid4(), note_id=note_id, chunk_index=index, content=content, embedding=embedding,
+            ))
+        await session.commit()
+    return note_id
+
+
+async def export_lines(sessionmaker, **options):
+    async with sessionmaker() as session:
+        data = b"".join([part async for part in export_ndjson(session, **options)])
+    return [json.loads(line) for line in data.decode().splitlines()]
+
+
+@pytest.mark.anyio
+async def test_notes_only_by_default(database):
+    await add_note(database, "one", "first", [("first", [0.0] * 384)])
+    lines = await export_lines(database)
+    assert [line["type"] for line in lines] == ["note"]
+    assert lines[0]["title"] == "one" and lines[0]["body"] == "first"
+
+
+@pytest.mark.anyio
+async def test_chunks_follow_notes_in_order(database):
+    a = await add_note(database, "a", "alpha", [("al", [0.25] * 384), ("pha", [0.5] * 384)])
+    await add_note(database, "b", "beta")
+    lines = await export_lines(database, include_chunks=True, batch_size=1)
+    assert [line["type"] for line in lines] == ["note", "note", "chunk", "chunk"]
+    chunks = lines[2:]
+    assert [(c["note_id"], c["chunk_index"], c["content"]) for c in chunks] == [(str(a), 0, "al"), (str(a), 1, "pha")]
+    assert chunks[0]["embedding"] == [0.25] * 384
+
+
+@pytest.mark.anyio
+async def test_base64_embeddings_are_little_endian_float32(database):
+    await add_note(database, "a", "alpha", [("alpha", [float(i) for i in range(384)])])
+    chunk = (await export_lines(database, include_chunks=True, embedding_format="base64"))[-1]
+    decoded = np.frombuffer(base64.b64decode(chunk["embedding"]), dtype="<f4")
+    assert decoded.tolist() == [float(i) for i in range(384)]
+
+
+def test_export_endpoint_streams_ndjson(database):
+    import asyncio
+    asyncio.run(add_note(database, "one", "first"))
+    from hello_api.main import app
+    response = TestClient(app).get("/notes/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert json.loads(response.text.splitlines()[0])["title"] == "one"
+
+
+@pytest.mark.anyio
+async def test_timestamps_match_the_json_api(database):
+    from datetime import datetime, timezone
+
+    from hello_api.responses import FastJSONResponse
+    from hello_api.schemas import NoteIn
+
+    at = datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+    async with database() as session:
+        await session.execute(notes.insert().values(
+            id=uuid.uuid4(), title="t", body="b", created_at=at, updated_at=at,
+        ))
+        await session.commit()
+    (line,) = await export_lines(database)
+    assert line["created_at"] == line["updated_at"] == "2024-01-02T03:04:05.678901Z"
+    assert line["updated_at"] == json.loads(FastJSONResponse({"at": at}).body)["at"]
+    assert NoteIn.model_validate(line).id == uuid.UUID(line["id"])
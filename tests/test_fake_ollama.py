@@ -0,0 +1,62 @@
+import json
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from hello_api import fake_ollama
+from hello_api.fake_ollama import EMBEDDING_DIM, app, embed_text
+
+
+@pytest.fixture
+def client(monkeypatch):
+    config = fake_ollama.FakeOllamaConfig()
+    monkeypatch.setattr(fake_ollama, "config", config)
+    return TestClient(app)
+
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_embeddings_are_deterministic_unit_vectors():
+    vector = embed_text("The reactor exploded in 1986")
+    assert len(vector) == EMBEDDING_DIM
+    assert math.isclose(math.sqrt(cosine(vector, vector)), 1.0)
+    assert vector == embed_text("the REACTOR exploded in 1986")
+    assert embed_text("") == [1.0] + [0.0] * (EMBEDDING_DIM - 1)
+
+
+def test_texts_sharing_words_are_closer():
+    question = embed_text("When did the reactor explode?")
+    assert cosine(question, embed_text("The reactor exploded")) > cosine(question, embed_text("Saturn has rings"))
+
+
+def test_embed_batches_inputs(client):
+    body = client.post("/api/embed", json={"input": ["a b", "c"]}).json()
+    assert body["embeddings"] == [embed_text("a b"), embed_text("c")]
+    assert client.post("/api/embeddings", json={"prompt": "a b"}).json()["embedding"] == embed_text("a b")
+
+
+PROMPT = "Notes: Saturn has rings. The reactor exploded in 1986.\n\nQuestion: when did the reactor explode?"
+
+
+def test_chat_stream_concatenates_to_extractive_answer(client):
+    response = client.post("/api/chat", json={"model": "m", "messages": [{"role": "user", "content": PROMPT}]})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert all(not line["done"] for line in lines[:-1]) and lines[-1]["done"]
+    assert "".join(line["message"]["content"] for line in lines) == "The reactor exploded in 1986."
+    assert lines[-1]["eval_count"] == len(lines) - 1
+
+
+def test_generate_without_stream_and_canned_mode(client):
+    fake_ollama.config.chat_mode = "Canned answer"
+    body = client.post("/api/generate", json={"prompt": PROMPT, "stream": False}).json()
+    assert body["response"] == "Canned answer" and body["done"]
+
+
+def test_failure_injection(client):
+    fake_ollama.config.failure_rate = 1.0
+    fake_ollama.config.failure_status = 503
+    assert client.post("/api/embeddings", json={"prompt": "x"}).status_code == 503
+    assert client.post("/api/chat", json={"messages": []}).status_code == 503
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_import_time import FORBIDDEN_MODULES, check_import_time, measure_import
+
+
+def test_app_imports_without_database_settings_or_heavy_modules():
+    imported = {name for name, _, _ in measure_import("hello_api.main")}
+    assert "hello_api.main" in imported
+    assert not imported.intersection(FORBIDDEN_MODULES)
+
+
+def test_db_module_leaves_metrics_and_tracing_unimported():
+    imported = {name for name, _, _ in measure_import("hello_api.db")}
+    assert not {"prometheus_client", "hello_api.metrics", "hello_api.tracing"} & imported
+
+
+def test_cold_import_within_budget():
+    assert check_import_time()
@@ -0,0 +1,80 @@
+import asyncio
+import time
+import uuid
+
+import httpx
+import ollama
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from hello_api import fake_ollama, qa_simple
+from hello_api.loop_monitor import LoopMonitor, assert_no_blocking, assert_route_does_not_block
+
+
+async def blocking(request):
+    time.sleep(0.3)
+    return PlainTextResponse("done")
+
+
+async def awaiting(request):
+    await asyncio.sleep(0.3)
+    return PlainTextResponse("done")
+
+
+BLOCKING_APP = Starlette(routes=[Route("/blocking", blocking), Route("/awaiting", awaiting)])
+
+
+@pytest.mark.anyio
+async def test_assert_no_blocking_reports_the_blocking_stack():
+    with pytest.raises(AssertionError, match="blocked") as raised:
+        async with assert_no_blocking(0.1):
+            time.sleep(0.3)
+    assert "test_assert_no_blocking_reports_the_blocking_stack" in str(raised.value)
+
+
+@pytest.mark.anyio
+async def test_route_checks_tell_blocking_from_awaiting_handlers():
+    response = await assert_route_does_not_block(BLOCKING_APP, "GET", "/awaiting", threshold=0.1)
+    assert response.text == "done"
+    with pytest.raises(AssertionError, match="time.sleep"):
+        await assert_route_does_not_block(BLOCKING_APP, "GET", "/blocking", threshold=0.1)
+
+
+@pytest.mark.anyio
+async def test_ask_does_not_block_the_loop(database, monkeypatch):
+    """/api/ask end to end with the fake Ollama streaming slowly; only the similarity search is stubbed."""
+    import hello_api.main as main
+
+    config = fake_ollama.FakeOllamaConfig()
+    config.token_latency = 0.01
+    monkeypatch.setattr(fake_ollama, "config", config)
+    client = ollama.AsyncClient(host="http://fake-ollama", transport=httpx.ASGITransport(app=fake_ollama.app))
+    monkeypatch.setattr(qa_simple, "ollama_async_client", lambda: client)
+    note_id = uuid.uuid4()
+
+    async def find_most_similar_note(session, question, timer=None, collection=None, coverage=None):
+        return note_id
+
+    async def get_note_content(session, wanted, timer=None):
+        return "The reactor exploded in 1986. Saturn has rings."
+
+    monkeypatch.setattr(main, "find_most_similar_note", find_most_similar_note)
+    monkeypatch.setattr(qa_simple, "get_note_content", get_note_content)
+    body = {"question": "When did the reactor explode?"}
+    # Warm up lazy imports and connections, which block once by design.
+    await assert_route_does_not_block(main.app, "POST", "/api/ask", threshold=10, json=body)
+    response = await assert_route_does_not_block(main.app, "POST", "/api/ask", threshold=0.1, json=body)
+    assert response.json()["answer"] == "The reactor exploded in 1986."
+
+
+@pytest.mark.anyio
+async def test_loop_monitor_measures_lag():
+    monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+    assert monitor.status()["max_lag_ms"] >= 50
@@ -0,0 +1,11 @@
+from fastapi.testclient import TestClient
+
+
+def test_request_durations_are_exposed_by_route_template():
+    from hello_api.main import app
+    client = TestClient(app)
+    assert client.get("/api/health").status_code == 200
+    body = client.get("/metrics").text
+    assert 'hello_api_http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}' in body
+    # Metrics imported on first use are still registered for the scrape.
+    assert "hello_api_indexing_backlog" in body
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from hello_api.profiling import ProfilingMiddleware
+
+
+async def ask(request):
+    return JSONResponse({"answer": sum(range(1000))})
+
+
+@pytest.fixture
+def client(settings, tmp_path):
+    settings.profiling_enabled = True
+    settings.profiling_token = "secret"
+    settings.profiling_paths = ["/api/ask"]
+    settings.profiling_output_dir = str(tmp_path)
+
+    def make(**overrides):
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        app = Starlette(routes=[Route("/api/ask", ask), Route("/other", ask)])
+        app.add_middleware(ProfilingMiddleware)
+        return TestClient(app)
+
+    return make
+
+
+def test_empty_token_disables_profiling(client, caplog):
+    response = client(profiling_token="").get("/api/ask", headers={"X-Profile": "", "X-Profile-Format": "html"})
+    assert response.json() == {"answer": 499500}
+    assert "PROFILING_TOKEN is empty" in caplog.text
+
+
+def test_wrong_token_or_path_is_not_profiled(client):
+    profiled = client()
+    assert profiled.get("/api/ask", headers={"X-Profile": "guess", "X-Profile-Format": "html"}).json() == {"answer": 499500}
+    assert profiled.get("/other", headers={"X-Profile": "secret", "X-Profile-Format": "html"}).json() == {"answer": 499500}
+
+
+def test_html_profile_replaces_body(client):
+    response = client().get("/api/ask", headers={"X-Profile": "secret", "X-Profile-Format": "html"})
+    assert response.headers["content-type"].startswith("text/html")
+    assert "function calls" in response.text
+
+
+def test_file_profile_is_saved(client, tmp_path):
+    response = client().get("/api/ask", params={"_profile": "secret"})
+    assert response.json() == {"answer": 499500}
+    assert os.path.exists(tmp_path / response.headers["x-profile-file"])
+
+
+@pytest.mark.parametrize("fmt", ["speedscope", "flamegraph"])
+def test_unsupported_format_with_cprofile_is_400(client, fmt):
+    response = client().get("/api/ask", headers={"X-Profile": "secret", "X-Profile-Format": fmt})
+    assert response.status_code == 400
+    assert "cprofile" in response.json()["detail"]
+
+
+def test_speedscope_with_pyinstrument(client):
+    pytest.importorskip("pyinstrument")
+    response = client(profiling_profiler="pyinstrument").get(
+        "/api/ask", headers={"X-Profile": "secret", "X-Profile-Format": "speedscope"}
+    )
+    assert response.status_code == 200
+    assert "speedscope" in json.loads(response.text)["$schema"]
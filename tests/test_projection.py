@@ -0,0 +1,63 @@
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from hello_api.notes import crud
+from hello_api.schemas import NoteProjectionListResponse
+
+UPDATED_AT = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def column_keys(columns):
+    return [column.key for column in columns]
+
+
+def test_projection_always_selects_id_and_updated_at():
+    assert column_keys(crud.projection(["title"])) == ["id", "title", "updated_at"]
+    assert column_keys(crud.projection()) == ["id", "title", "body", "collection", "created_at", "updated_at"]
+
+
+def test_summary_replaces_body_with_bounded_excerpt():
+    columns = crud.projection(excerpt_length=50)
+    assert column_keys(columns) == ["id", "title", "collection", "created_at", "updated_at", "excerpt"]
+    sql = str(select(*columns).compile(compile_kwargs={"literal_binds": True}))
+    assert "left(notes.body, 50)" in sql
+
+
+@pytest.fixture
+def client(database, monkeypatch):
+    """GET /notes with crud.list_notes answering from the selected column keys."""
+    async def list_notes(session, search, limit, offset, total=None, columns=None):
+        values = {"id": uuid.uuid4(), "title": "t", "body": "b" * 500, "collection": "default",
+                  "created_at": UPDATED_AT, "updated_at": UPDATED_AT, "excerpt": "b" * 10}
+        mapping = {key: values[key] for key in column_keys(columns)}
+        return [SimpleNamespace(_mapping=mapping, **mapping)], 1
+
+    monkeypatch.setattr(crud, "list_notes", list_notes)
+    from hello_api.main import app
+    return TestClient(app)
+
+
+def test_projected_and_summary_pages_match_the_response_model(client):
+    projected = client.get("/notes", params={"fields": "title"}).json()
+    assert set(projected["items"][0]) == {"id", "title", "updated_at"}
+    summary = client.get("/notes", params={"summary": "true", "excerpt_length": 10}).json()
+    assert "body" not in summary["items"][0] and summary["items"][0]["excerpt"] == "b" * 10
+    for page in (projected, summary):
+        TypeAdapter(NoteProjectionListResponse).validate_python(page)
+
+
+def test_unknown_field_is_rejected(client):
+    assert client.get("/notes", params={"fields": "title,secret"}).status_code == 422
+
+
+def test_openapi_documents_both_page_shapes(client):
+    schema = client.get("/openapi.json").json()
+    ok = schema["paths"]["/notes"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    refs = {option["$ref"].rsplit("/", 1)[-1] for option in ok["anyOf"]}
+    assert refs == {"NoteListResponse", "NoteProjectionListResponse"}
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import ollama
+import pytest
+
+from hello_api import fake_ollama, qa_simple
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(fake_ollama, "config", fake_ollama.FakeOllamaConfig())
+    client = ollama.AsyncClient(host="http://fake-ollama", transport=httpx.ASGITransport(app=fake_ollama.app))
+    monkeypatch.setattr(qa_simple, "ollama_async_client", lambda: client)
+    return client
+
+
+@pytest.mark.anyio
+async def test_generate_answer_streams_from_ollama(fake_client):
+    answer = await qa_simple.generate_answer("When did the reactor explode?", "Saturn has rings. The reactor exploded in 1986.")
+    assert answer == "The reactor exploded in 1986."
+
+
+class StallingClient:
+    """Sends one token, then stalls; records whether the stream was closed."""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    async def chat(self, model, messages, stream):
+        assert stream
+
+        async def chunks():
+            try:
+                yield {"message": {"content": "partial"}, "done": False}
+                await asyncio.sleep(60)
+            finally:
+                self.closed.set()
+
+        return chunks()
+
+
+@pytest.mark.anyio
+async def test_timeout_cancels_the_stream(monkeypatch):
+    client = StallingClient()
+    monkeypatch.setattr(qa_simple, "ollama_async_client", lambda: client)
+    with pytest.raises(TimeoutError):
+        await qa_simple.generate_answer("q", "notes", timeout=0.05)
+    # The stream is closed as part of the timeout, not left running in a thread.
+    assert client.closed.is_set()
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+from starlette.responses import Response
+
+from hello_api.db import (
+    CONSISTENCY_HEADER,
+    LAST_WRITE_COOKIE,
+    Replica,
+    ReplicaRouter,
+    needs_primary,
+    remember_write,
+)
+
+
+def make_replica(name: str, healthy: bool = True, lag: float = 0.0) -> Replica:
+    replica = Replica(f"sqlite+aiosqlite:///{name}", create_async_engine("sqlite+aiosqlite://"))
+    replica.healthy = healthy
+    replica.lag = lag
+    # Fresh check so pick() trusts the state set above.
+    replica.checked_at = time.monotonic()
+    return replica
+
+
+def make_request(headers=None) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+@pytest.mark.anyio
+async def test_pick_round_robins_over_healthy_replicas():
+    a, b = make_replica("a"), make_replica("b")
+    router = ReplicaRouter([a, b], max_lag=5, check_interval=60, check_timeout=1)
+    picked = [router.pick() for _ in range(4)]
+    assert picked == [a, b, a, b]
+
+
+@pytest.mark.anyio
+async def test_pick_skips_unhealthy_and_lagging_replicas():
+    down, lagging, good = make_replica("down", healthy=False), make_replica("lag", lag=30), make_replica("ok")
+    router = ReplicaRouter([down, lagging, good], max_lag=5, check_interval=60, check_timeout=1)
+    assert {router.pick() for _ in range(3)} == {good}
+
+
+@pytest.mark.anyio
+async def test_pick_falls_back_to_primary_when_no_replica_qualifies():
+    assert ReplicaRouter([], 5, 60, 1).pick() is None
+    router = ReplicaRouter([make_replica("lag", lag=30)], max_lag=5, check_interval=60, check_timeout=1)
+    assert router.pick() is None
+
+
+@pytest.mark.anyio
+async def test_failed_health_check_marks_replica_unhealthy():
+    # SQLite has no pg_is_in_recovery(), so the lag query fails like an unreachable replica.
+    replica = make_replica("broken")
+    router = ReplicaRouter([replica], max_lag=5, check_interval=60, check_timeout=1)
+    await router.refresh()
+    assert router.pick() is None
+    assert replica.healthy is False
+    assert replica.error
+    assert router.status()[0]["healthy"] is False
+
+
+@pytest.mark.anyio
+async def test_checks_run_in_the_background_not_in_pick(monkeypatch):
+    replica = make_replica("a")
+    replica.checked_at = 0
+    router = ReplicaRouter([replica], max_lag=5, check_interval=0.01, check_timeout=1)
+    checks = []
+
+    async def check(checked):
+        await asyncio.sleep(0.05)
+        checks.append(checked)
+        checked.checked_at = time.monotonic()
+
+    monkeypatch.setattr(router, "check", check)
+    # An unchecked replica is not used, and picking does not wait for its check.
+    assert router.pick() is None and checks == []
+    try:
+        await asyncio.sleep(0.2)
+        assert checks and router.pick() is replica
+    finally:
+        await router.stop()
+    assert router.task is None
+
+
+def test_recent_write_pins_reads_to_primary(settings):
+    settings.db_read_your_writes_window = 10
+    response = Response()
+    remember_write(response)
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{LAST_WRITE_COOKIE}=")
+    value = cookie.split(";")[0].split("=", 1)[1]
+    assert needs_primary(make_request({"cookie": f"{LAST_WRITE_COOKIE}={value}"}))
+    stale = time.time() - 60
+    assert not needs_primary(make_request({"cookie": f"{LAST_WRITE_COOKIE}={stale}"}))
+
+
+def test_strong_consistency_header_forces_primary():
+    assert needs_primary(make_request({CONSISTENCY_HEADER: "strong"}))
+    assert not needs_primary(make_request())
+    assert not needs_primary(None)
+
+
+def test_ask_and_stats_honour_read_your_writes(database, monkeypatch, settings):
+    from fastapi.testclient import TestClient
+
+    import hello_api.main as main
+
+    settings.db_read_your_writes_window = 10
+    seen = []
+
+    async def get_read_session(request=None):
+        seen.append(needs_primary(request))
+        async with database() as session:
+            yield session
+
+    async def find_most_similar_note(session, question, timer=None, collection=None, coverage=None):
+        raise ValueError("No similar notes found")
+
+    monkeypatch.setattr(main, "get_read_session", get_read_session)
+    monkeypatch.setattr(main, "find_most_similar_note", find_most_similar_note)
+    client = TestClient(main.app)
+    client.cookies.set(LAST_WRITE_COOKIE, f"{time.time():.3f}")
+    client.post("/api/ask", json={"question": "q"})
+    client.get("/api/stats")
+    assert seen == [True, True]
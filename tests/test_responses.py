@@ -0,0 +1,46 @@
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+from hello_api.responses import FastJSONResponse, page_content, row_dict
+from hello_api.schemas import NoteListResponse, NoteOut
+
+
+def note_row(**overrides):
+    values = {
+        "id": uuid.uuid4(),
+        "title": "Ünïcode title",
+        "body": "line\nbreak \"quoted\"",
+        "collection": "default",
+        "created_at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+        **overrides,
+    }
+    return SimpleNamespace(_mapping=values, **values)
+
+
+def test_note_matches_pydantic_json():
+    row = note_row()
+    fast = FastJSONResponse(row_dict(row)).body
+    assert fast == NoteOut(**row_dict(row)).model_dump_json().encode()
+
+
+def test_page_matches_pydantic_json():
+    rows = [note_row(), note_row(collection="work")]
+    content = page_content(rows, total=7, limit=2, offset=4)
+    fast = FastJSONResponse(content).body
+    assert fast == NoteListResponse(**content).model_dump_json().encode()
+
+
+def test_numpy_values_serialize():
+    assert FastJSONResponse({"v": np.array([1.5, 2.0], dtype=np.float32)}).body == b'{"v":[1.5,2.0]}'
+
+
+def test_serialization_benchmark_paths_agree():
+    """bench_serialization builds rows like the notes table; keep it running as the schema changes."""
+    import bench_serialization
+
+    rows = bench_serialization.make_rows(2, 100)
+    assert bench_serialization.pydantic_path(rows, 2, 2, 0) == bench_serialization.fast_path(rows, 2, 2, 0)
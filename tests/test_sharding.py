@@ -0,0 +1,214 @@
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import hello_api.embeddings as emb
+import hello_api.main as main
+import hello_api.sharding as sharding
+from hello_api.notes import export
+from hello_api.notes.models import metadata, notes, notes_index
+from hello_api.sharding import ShardCoverage, ShardRouter, ShardsUnavailable, shard_index
+
+
+def fake_shard(name):
+    """A shard whose "session" is just its name, for a stubbed rank_similar_notes."""
+    @asynccontextmanager
+    async def sessionmaker():
+        yield name
+    return SimpleNamespace(name=name, sessionmaker=sessionmaker)
+
+
+def row(note_id, avg_distance, chunk_count=1):
+    return SimpleNamespace(note_id=note_id, avg_distance=avg_distance, chunk_count=chunk_count)
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Per-shard search behaviour: a list of rows, an exception, or (delay, rows)."""
+    behaviour = {}
+
+    async def rank_similar_notes(session, question_vector, k, max_distance, collection=None):
+        answer = behaviour.get(session, [])
+        if isinstance(answer, Exception):
+            raise answer
+        if isinstance(answer, tuple):
+            delay, answer = answer
+            await asyncio.sleep(delay)
+        return [r for r in answer if r.avg_distance <= max_distance]
+
+    monkeypatch.setattr(emb, "rank_similar_notes", rank_similar_notes)
+    return behaviour
+
+
+def router(*names, timeout=1.0, allow_partial=True):
+    return ShardRouter([fake_shard(name) for name in names], search_timeout=timeout, allow_partial=allow_partial)
+
+
+def test_shard_index_is_stable_and_in_range():
+    note_id = uuid.UUID("01890a5d-ac96-774b-bcce-b302099a8057")
+    assert shard_index(note_id, 4) == shard_index(uuid.UUID(str(note_id)), 4)
+    assert all(0 <= shard_index(uuid.uuid4(), 3) < 3 for _ in range(100))
+    # A hash, not the id's leading bits: time-ordered ids still spread out.
+    assert len({shard_index(uuid.UUID(int=(1 << 80) + i), 4) for i in range(64)}) == 4
+
+
+@pytest.mark.anyio
+async def test_search_merges_shards_by_distance_then_chunk_count(answers):
+    a, b, c, d = (uuid.uuid4() for _ in range(4))
+    answers["shard-0"] = [row(a, 0.3), row(b, 0.1)]
+    answers["shard-1"] = [row(c, 0.2), row(d, 0.1, chunk_count=3)]
+    coverage = ShardCoverage()
+    rows = await router("shard-0", "shard-1").search([0.0], 3, (0.5,), coverage=coverage)
+    assert [r.note_id for r in rows] == [d, b, c]
+    assert not coverage.partial
+
+
+@pytest.mark.anyio
+async def test_search_relaxes_the_threshold_across_all_shards(answers):
+    far = uuid.uuid4()
+    answers["shard-1"] = [row(far, 0.6)]
+    rows = await router("shard-0", "shard-1").search([0.0], 5, (0.5, 0.7))
+    assert [r.note_id for r in rows] == [far]
+
+
+@pytest.mark.anyio
+async def test_slow_and_failing_shards_are_left_out_when_partial_results_are_allowed(answers):
+    note = uuid.uuid4()
+    answers["shard-0"] = [row(note, 0.1)]
+    answers["shard-1"] = (5, [row(uuid.uuid4(), 0.0)])
+    answers["shard-2"] = RuntimeError("connection refused")
+    coverage = ShardCoverage()
+    rows = await router("shard-0", "shard-1", "shard-2", timeout=0.05).search([0.0], 5, (0.5,), coverage=coverage)
+    assert [r.note_id for r in rows] == [note]
+    assert coverage.partial
+    assert coverage.unavailable == {"shard-1": "no answer within 0.05s", "shard-2": "connection refused"}
+
+
+@pytest.mark.anyio
+async def test_missing_shards_fail_the_search_when_partial_results_are_not_allowed(answers):
+    answers["shard-0"] = [row(uuid.uuid4(), 0.1)]
+    answers["shard-1"] = RuntimeError("down")
+    with pytest.raises(ShardsUnavailable) as raised:
+        await router("shard-0", "shard-1", allow_partial=False).search([0.0], 5, (0.5,))
+    assert raised.value.unavailable == {"shard-1": "down"}
+
+
+@pytest.mark.anyio
+async def test_all_shards_failing_is_unavailable_even_with_partial_results(answers):
+    answers["shard-0"] = RuntimeError("down")
+    answers["shard-1"] = (5, [])
+    with pytest.raises(ShardsUnavailable):
+        await router("shard-0", "shard-1", timeout=0.05).search([0.0], 5, (0.5,))
+
+
+@pytest.mark.anyio
+async def test_no_match_on_the_shards_that_answered_names_the_missing_ones(answers):
+    answers["shard-1"] = RuntimeError("down")
+    with pytest.raises(ValueError, match="shard-1: down"):
+        await router("shard-0", "shard-1").search([0.0], 5, (0.5,))
+
+
+def ask_with_shards(database, monkeypatch, shard_router, note_title="Chernobyl"):
+    note_id = uuid.uuid4()
+
+    async def add_note():
+        async with database() as session:
+            await session.execute(notes.insert().values(id=note_id, title=note_title, body="body"))
+            await session.commit()
+
+    async def embed_question(question):
+        return [0.0]
+
+    async def answer_question_simple(session, question, note_id=None, timer=None):
+        return "In 1986."
+
+    asyncio.run(add_note())
+    monkeypatch.setattr(sharding, "get_shard_router", lambda: shard_router)
+    monkeypatch.setattr(emb, "embed_question", embed_question)
+    monkeypatch.setattr(main, "answer_question_simple", answer_question_simple)
+    return note_id
+
+
+def test_ask_reports_partial_results(database, monkeypatch, answers):
+    note_id = ask_with_shards(database, monkeypatch, router("shard-0", "shard-1"))
+    answers["shard-0"] = [row(note_id, 0.1)]
+    answers["shard-1"] = RuntimeError("down")
+    response = TestClient(main.app).post("/api/ask", json={"question": "When?"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["retrieved_note"] == "Chernobyl"
+    assert body["partial"] is True
+    assert body["unavailable_shards"] == {"shard-1": "down"}
+
+
+def test_ask_is_503_when_partial_results_are_not_allowed(database, monkeypatch, answers):
+    note_id = ask_with_shards(database, monkeypatch, router("shard-0", "shard-1", allow_partial=False))
+    answers["shard-0"] = [row(note_id, 0.1)]
+    answers["shard-1"] = RuntimeError("down")
+    response = TestClient(main.app).post("/api/ask", json={"question": "When?"})
+    assert response.status_code == 503
+    assert "shard-1: down" in response.json()["detail"]
+
+
+def test_ask_with_every_shard_answering_is_not_partial(database, monkeypatch, answers):
+    note_id = ask_with_shards(database, monkeypatch, router("shard-0", "shard-1"))
+    answers["shard-1"] = [row(note_id, 0.1)]
+    body = TestClient(main.app).post("/api/ask", json={"question": "When?"}).json()
+    assert body["retrieved_note"] == "Chernobyl"
+    assert "partial" not in body and "unavailable_shards" not in body
+
+
+@pytest.fixture
+def sqlite_shards(tmp_path):
+    """Two SQLite shards with the app's tables, routed to by the export."""
+    async def create_tables(engine):
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+
+    shards = []
+    for index in range(2):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / f'shard_{index}.db'}", poolclass=NullPool)
+        asyncio.run(create_tables(engine))
+        shards.append(SimpleNamespace(
+            name=f"shard-{index}",
+            sessionmaker=async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False),
+        ))
+    return ShardRouter(shards, search_timeout=1.0, allow_partial=False)
+
+
+def test_export_reads_chunks_from_each_notes_shard(database, sqlite_shards, monkeypatch):
+    monkeypatch.setattr(export, "get_shard_router", lambda: sqlite_shards)
+    note_ids = [uuid.uuid4() for _ in range(6)]
+
+    async def add_notes():
+        async with database() as session:
+            for note_id in note_ids:
+                await session.execute(notes.insert().values(id=note_id, title="t", body=f"body {note_id}"))
+            await session.commit()
+        for note_id in note_ids:
+            # As index_note does: a copy of the note and its chunks on its shard only.
+            async with sqlite_shards.shard_for(note_id).sessionmaker() as session:
+                await session.execute(notes.insert().values(id=note_id, title="t", body=f"body {note_id}"))
+                await session.execute(notes_index.insert().values(
+                    id=uuid.uuid4(), note_id=note_id, chunk_index=0, content=f"body {note_id}",
+                    embedding=[0.5] * 384,
+                ))
+                await session.commit()
+
+    asyncio.run(add_notes())
+    response = TestClient(main.app).get("/notes/export", params={"include_chunks": "true"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    chunks = [line for line in lines if line["type"] == "chunk"]
+    assert sum(line["type"] == "note" for line in lines) == 6
+    assert sorted(chunk["note_id"] for chunk in chunks) == sorted(str(note_id) for note_id in note_ids)
+    assert all(chunk["content"] == f"body {chunk['note_id']}" for chunk in chunks)
+    # Grouped by shard, in note order within each.
+    shard_order = [shard_index(uuid.UUID(chunk["note_id"]), 2) for chunk in chunks]
+    assert shard_order == sorted(shard_order)
@@ -0,0 +1,148 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from hello_api.slow_queries import SlowQueryLog, get_slow_query_log, parameters_shape, search_setting
+
+VECTOR_QUERY = "SELECT 1 AS distance /* embedding <=> vector */"
+
+
+def test_parameters_shape_never_includes_values():
+    shape = parameters_shape({"vector": "[" + "0.1," * 383 + "0.1]", "k": 5, "ids": list(range(30))})
+    assert shape == {"vector": "str[1537]", "k": "int", "ids": "list[30]"}
+
+
+@pytest.mark.parametrize("statement, parameters, expected", [
+    ("SELECT set_config('hnsw.ef_search', $1::VARCHAR, true)", ("200",), ("hnsw.ef_search", "200")),
+    ("SELECT set_config('hnsw.ef_search', ?, true)", {"ef": "80"}, ("hnsw.ef_search", "80")),
+    ("SELECT set_config('ivfflat.probes', '10', true)", (), ("ivfflat.probes", "10")),
+    ("SET LOCAL ivfflat.probes = 10", (), ("ivfflat.probes", "10")),
+    ("SELECT set_config('statement_timeout', '1s', true)", (), None),
+    (VECTOR_QUERY, (), None),
+])
+def test_search_setting(statement, parameters, expected):
+    assert search_setting(statement, parameters) == expected
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'q.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def add_set_config(dbapi_connection, record):
+        dbapi_connection.create_function("set_config", 3, lambda name, value, local: value)
+
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_sampled_explain_gets_the_transactions_search_settings(engine, monkeypatch):
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=1.0)
+    scheduled = []
+    monkeypatch.setattr(log, "schedule_explain", lambda engine, statement, parameters, ms, settings: scheduled.append(settings))
+    log.install(engine)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": "200"})
+        await conn.execute(text(VECTOR_QUERY))
+        await conn.commit()
+        await conn.execute(text(VECTOR_QUERY))
+    assert scheduled == [{"hnsw.ef_search": "200"}, {}]
+
+
+class RecordingEngine:
+    """Stands in for an AsyncEngine in explain(): records statements, returns a one-line plan."""
+
+    def __init__(self, plan="Index Scan using notes_index_embedding_halfvec_idx on notes_index"):
+        self.statements = []
+        self.plan = plan
+
+    def connect(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, parameters):
+        self.statements.append((str(statement), parameters))
+
+    async def exec_driver_sql(self, statement, parameters):
+        self.statements.append((statement, parameters))
+        return [(self.plan,)]
+
+
+@pytest.mark.anyio
+async def test_explain_applies_settings_first():
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=1.0)
+    engine = RecordingEngine()
+    await log.explain(engine, VECTOR_QUERY, (), 12.0, {"hnsw.ef_search": "200"})
+    assert engine.statements == [
+        ("SELECT set_config(:name, :value, true)", {"name": "hnsw.ef_search", "value": "200"}),
+        ("EXPLAIN (ANALYZE, BUFFERS) " + VECTOR_QUERY, ()),
+    ]
+    plan = log.snapshot()["plans"][0]
+    assert plan["settings"] == {"hnsw.ef_search": "200"} and not plan["seq_scan"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("plan, seq_scan", [
+    ("Seq Scan on notes_index  (cost=0.00..1.00 rows=1 width=8)", True),
+    ("Parallel Seq Scan on notes_index_p3 notes_index_4  (cost=0.00..1.00 rows=1 width=8)", True),
+    ("Index Scan using notes_index_p0_expr_idx on notes_index_p0 notes_index_1", False),
+    ("Seq Scan on notes_index_unpartitioned", False),
+    ("Seq Scan on note_centroids", False),
+])
+async def test_seq_scans_are_flagged_on_partitions_too(plan, seq_scan):
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=1.0)
+    await log.explain(RecordingEngine(plan), VECTOR_QUERY, (), 12.0, {})
+    assert log.snapshot()["plans"][0]["seq_scan"] is seq_scan
+
+
+@pytest.mark.anyio
+async def test_slow_statements_are_recorded(engine):
+    log = SlowQueryLog(threshold_ms=0.000001, size=10, explain_sample_rate=0)
+    log.install(engine)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT :value"), {"value": "private"})
+    entry = log.snapshot()["entries"][0]
+    assert entry["statement"] == "SELECT ?" and "private" not in str(entry)
+
+
+@pytest.fixture
+def admin(settings):
+    from hello_api.main import app
+    settings.admin_token = "secret"
+    get_slow_query_log().record("SELECT 1", (), 500.0, False)
+    yield TestClient(app)
+    get_slow_query_log().clear()
+
+
+def test_admin_endpoints_need_the_token(admin, settings):
+    assert admin.get("/api/admin/slow-queries").status_code == 403
+    assert admin.get("/api/admin/slow-queries", headers={"X-Admin-Token": "guess"}).status_code == 403
+    assert admin.delete("/api/admin/slow-queries").status_code == 403
+
+
+def test_admin_endpoints_are_hidden_without_an_admin_token(admin, settings):
+    settings.admin_token = ""
+    assert admin.get("/api/admin/slow-queries", headers={"X-Admin-Token": ""}).status_code == 404
+    assert admin.delete("/api/admin/slow-queries").status_code == 404
+
+
+def test_profiling_token_does_not_open_admin_endpoints(admin, settings):
+    settings.profiling_enabled = True
+    settings.profiling_token = "profile-secret"
+    assert admin.get("/api/admin/slow-queries", headers={"X-Admin-Token": "profile-secret"}).status_code == 403
+    settings.admin_token = ""
+    assert admin.get("/api/admin/slow-queries", headers={"X-Admin-Token": "profile-secret"}).status_code == 404
+
+
+def test_admin_endpoints_with_the_token(admin):
+    headers = {"X-Admin-Token": "secret"}
+    assert admin.get("/api/admin/slow-queries", headers=headers).json()["entries"][0]["statement"] == "SELECT 1"
+    assert admin.delete("/api/admin/slow-queries", headers=headers).status_code == 204
+    assert admin.get("/api/admin/slow-queries", headers=headers).json()["entries"] == []
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from hello_api.text_splitter import RecursiveCharacterTextSplitter
+
+
+def splitter(chunk_size=1000, chunk_overlap=200):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def test_short_text_is_one_stripped_chunk():
+    assert splitter().split_text("  hello world \n") == ["hello world"]
+
+
+def test_chunks_respect_size_and_carry_overlap():
+    text = " ".join(f"word{i}" for i in range(2000))
+    chunks = splitter().split_text(text)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        # The next chunk starts inside the previous one's last 200 characters.
+        assert current.split(" ")[0] in previous[-200:]
+
+
+def test_paragraphs_are_preferred_over_words():
+    text = "a" * 600 + "\n\n" + "b" * 600
+    assert splitter().split_text(text) == ["a" * 600, "b" * 600]
+
+
+def test_overlap_larger_than_chunk_size_is_rejected():
+    with pytest.raises(ValueError):
+        RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=20)
+
+
+def test_offsets_when_a_chunk_is_a_prefix_of_the_next():
+    # "b" and "bb" start at the same character.
+    s = splitter(chunk_size=2, chunk_overlap=2)
+    assert s.split_text("\nbb") == ["b", "bb"]
+    assert s.split_text_with_offsets("\nbb") == [(1, 2), (1, 3)]
+
+
+def test_offsets_of_repeated_text_point_at_the_split_it_came_from():
+    # The second chunk is the second "b.", not the one ending the first chunk.
+    s = splitter(chunk_size=5, chunk_overlap=3)
+    assert s.split_text("aa b. b.  bb") == ["aa b.", "b.", "bb"]
+    assert s.split_text_with_offsets("aa b. b.  bb") == [(0, 5), (6, 8), (10, 12)]
+
+
+def test_offsets_match_chunks_on_fuzzed_text():
+    rng = random.Random(0)
+    for _ in range(3000):
+        text = "".join(rng.choice("ab  \n\n.") for _ in range(rng.randint(0, 300)))
+        chunk_size = rng.randint(1, 40)
+        s = splitter(chunk_size, rng.randint(0, chunk_size))
+        offsets = s.split_text_with_offsets(text)
+        assert [text[start:end] for start, end in offsets] == s.split_text(text), (text, chunk_size)
+
+
+def test_offsets_need_kept_separators():
+    s = RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=0, keep_separator=False)
+    with pytest.raises(ValueError):
+        s.split_text_with_offsets("a b c")
@@ -0,0 +1,99 @@
+import statistics
+import uuid
+
+import numpy as np
+import pytest
+
+from hello_api.timing import StageTimer, percentile, timed
+
+
+@pytest.mark.parametrize("values", [[5.0], [1.0, 2.0], [3.0, 1.0, 2.0, 10.0], list(np.random.default_rng(0).random(37))])
+@pytest.mark.parametrize("pct", [1, 50, 95, 99])
+def test_percentile_interpolates_like_numpy_and_statistics(values, pct):
+    expected = float(np.percentile(values, pct))
+    assert percentile(values, pct) == pytest.approx(expected)
+    if len(values) > 1:
+        assert percentile(values, pct) == pytest.approx(statistics.quantiles(values, n=100, method="inclusive")[pct - 1])
+
+
+def test_percentile_edges():
+    assert percentile([], 95) == 0.0
+    assert percentile([4.0, 1.0], 0) == 1.0
+    assert percentile([4.0, 1.0], 100) == 4.0
+
+
+def test_stage_timer_accumulates_repeated_stages(monkeypatch):
+    from hello_api import timing
+    clock = iter([0.0, 1.0, 1.010, 2.0, 2.005, 3.0, 3.5])
+    monkeypatch.setattr(timing.time, "perf_counter", lambda: next(clock))
+    timer = StageTimer()
+    with timer.stage("search"):
+        pass
+    with timer.stage("search"):
+        pass
+    with timed(timer, "generate"):
+        pass
+    assert timer.stages == pytest.approx({"search": 15.0, "generate": 500.0})
+
+
+def test_header_lists_stages_and_total():
+    timer = StageTimer()
+    timer.stages = {"embed": 1.234, "search": 5.0}
+    header = timer.header()
+    assert header.startswith("embed;dur=1.23, search;dur=5.00, total;dur=")
+    assert set(timer.as_dict()) == {"embed", "search", "total"}
+
+
+def test_timed_without_timer_is_a_no_op():
+    with timed(None, "embed"):
+        pass
+
+
+def test_log_if_slow(caplog):
+    timer = StageTimer()
+    timer.stages = {"search": 12.0}
+    timer.log_if_slow("POST /api/ask", threshold_ms=0)
+    assert not caplog.records
+    timer.started -= 1.0
+    timer.log_if_slow("POST /api/ask", threshold_ms=500)
+    assert "Slow request POST /api/ask" in caplog.text and "search=12.0ms" in caplog.text
+
+
+@pytest.fixture
+def ask(database, monkeypatch):
+    import hello_api.main as main
+    from fastapi.testclient import TestClient
+
+    async def find_most_similar_note(session, question, timer=None, collection=None, coverage=None):
+        with timer.stage("search"):
+            return uuid.uuid4()
+
+    async def answer_question_simple(session, question, note_id=None, timer=None):
+        with timer.stage("generate"):
+            return "answer"
+
+    monkeypatch.setattr(main, "find_most_similar_note", find_most_similar_note)
+    monkeypatch.setattr(main, "answer_question_simple", answer_question_simple)
+    client = TestClient(main.app, raise_server_exceptions=False)
+    return lambda **params: client.post("/api/ask", params=params, json={"question": "q"})
+
+
+def test_ask_reports_server_timing(ask):
+    response = ask()
+    assert response.status_code == 200
+    stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    assert stages == ["search", "title", "generate", "total"]
+    assert "timings" not in response.json()
+    assert set(ask(timings="true").json()["timings"]) == {"search", "title", "generate", "total"}
+
+
+def test_ask_reports_server_timing_on_errors(ask, monkeypatch):
+    import hello_api.main as main
+
+    async def failing(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "answer_question_simple", failing)
+    response = ask()
+    assert response.status_code == 500
+    assert "search;dur=" in response.headers["Server-Timing"]
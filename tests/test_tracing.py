@@ -0,0 +1,123 @@
+import json
+import time
+
+import pytest
+
+from hello_api.tracing import JsonlFileExporter, Tracer, parse_traceparent
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporters = []
+
+    def make(**options):
+        exporters.append(JsonlFileExporter(str(tmp_path / "traces.jsonl"), **options))
+        return exporters[-1]
+
+    yield make
+    for created in exporters:
+        created.shutdown()
+
+
+def read_spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_export_queues_without_touching_the_file(exporter, monkeypatch):
+    spans = exporter(flush_interval=60)
+
+    def no_open(*args, **kwargs):
+        raise AssertionError("export opened the file")
+
+    monkeypatch.setattr("os.open", no_open)
+    for i in range(10):
+        spans.export({"name": f"span-{i}"})
+    monkeypatch.undo()
+    assert len(spans.queue) == 10
+    spans.flush()
+    assert [span["name"] for span in read_spans(spans.path)] == [f"span-{i}" for i in range(10)]
+
+
+def test_background_thread_writes_full_batches(exporter):
+    spans = exporter(flush_interval=60, max_batch=5)
+    for i in range(5):
+        spans.export({"name": f"span-{i}"})
+    deadline = time.monotonic() + 5
+    while spans.queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with spans.write_lock:
+        assert len(read_spans(spans.path)) == 5
+
+
+def test_background_thread_writes_on_interval(exporter):
+    spans = exporter(flush_interval=0.01)
+    spans.export({"name": "only"})
+    deadline = time.monotonic() + 5
+    while spans.queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with spans.write_lock:
+        assert [span["name"] for span in read_spans(spans.path)] == ["only"]
+
+
+def test_each_batch_is_one_append_write(exporter, monkeypatch):
+    """Workers sharing the file append whole batches, so lines never interleave."""
+    import os
+
+    writes = []
+    real_write, real_open = os.write, os.open
+
+    def record_open(path, flags, mode=0o777):
+        assert flags & os.O_APPEND
+        return real_open(path, flags, mode)
+
+    def record_write(fd, data):
+        writes.append(bytes(data))
+        return real_write(fd, data)
+
+    monkeypatch.setattr(os, "open", record_open)
+    monkeypatch.setattr(os, "write", record_write)
+    workers = [exporter(flush_interval=60) for _ in range(2)]
+    for batch in range(3):
+        for worker, spans in enumerate(workers):
+            for i in range(200):
+                spans.export({"name": f"worker-{worker}-{batch}-{i}", "padding": "x" * 100})
+            spans.flush()
+    monkeypatch.undo()
+
+    assert len(writes) == 6 and all(data.count(b"\n") == 200 and data.endswith(b"\n") for data in writes)
+    names = [span["name"] for span in read_spans(workers[0].path)]
+    assert len(names) == 1200
+    assert names[:200] == [f"worker-0-0-{i}" for i in range(200)]
+
+
+def test_shutdown_writes_the_rest_and_full_queue_drops(exporter):
+    spans = exporter(flush_interval=60, max_batch=100, max_queue=3)
+    for i in range(5):
+        spans.export({"name": f"span-{i}"})
+    assert spans.dropped == 2
+    spans.shutdown()
+    assert not spans.thread.is_alive()
+    assert [span["name"] for span in read_spans(spans.path)] == ["span-0", "span-1", "span-2"]
+
+
+def test_nested_spans_share_a_trace(exporter):
+    spans = exporter(flush_interval=60)
+    tracer = Tracer(enabled=True, sample_rate=1.0, exporter=spans)
+    with tracer.span("parent") as parent:
+        with tracer.span("child", answer=42):
+            pass
+    spans.flush()
+    child, recorded_parent = read_spans(spans.path)
+    assert child["trace_id"] == recorded_parent["trace_id"] == parent.context.trace_id
+    assert child["parent_id"] == recorded_parent["span_id"]
+    assert child["attributes"] == {"answer": 42}
+
+
+def test_unsampled_traceparent_is_not_exported(exporter):
+    spans = exporter(flush_interval=60)
+    tracer = Tracer(enabled=True, sample_rate=1.0, exporter=spans)
+    parent = parse_traceparent(f"00-{'a' * 32}-{'b' * 16}-00")
+    with tracer.span("request", parent) as span:
+        assert span is None
+    assert not spans.queue